@@ -1,10 +1,16 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load shared .env.local from root
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.env.local'))
 load_dotenv(dotenv_path=env_path)
 
+# Make agents/shared importable as `shared`
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if AGENTS_DIR not in sys.path:
+    sys.path.append(AGENTS_DIR)
+
 PROJECT_ID = os.getenv("VERTEX_PROJECT_ID") or os.environ.get("VERTEX_PROJECT_ID") or os.environ.get("PROJECT_ID")
 LOCATION = os.getenv("VERTEX_LOCATION") or os.environ.get("VERTEX_LOCATION") or "us-central1"
 CICD_SUBSCRIPTION_ID = os.getenv("CICD_SUBSCRIPTION_ID") or os.environ.get("CICD_SUBSCRIPTION_ID", "cicd_listener_sub")
@@ -14,5 +20,13 @@ GITHUB_TOKEN = os.getenv("MY_PAT_TOKEN") or os.environ.get("MY_PAT_TOKEN")
 GITHUB_REPO = os.getenv("REPO_NAME") or os.environ.get("REPO_NAME")
 GITHUB_BRANCH = os.getenv("REPO_BRANCH" , "main") or os.environ.get("REPO_BRANCH", "main")
 
+# Test summaries are generated once per failure signature and cached across runs (0 disables the disk cache)
+SUMMARY_CACHE_ENABLED = os.getenv("CICD_SUMMARY_CACHE_ENABLED", "1") != "0"
+SUMMARY_CACHE_DIR = os.getenv("CICD_SUMMARY_CACHE_DIR")
+SUMMARY_CACHE_MAX_AGE_DAYS = float(os.getenv("CICD_SUMMARY_CACHE_MAX_AGE_DAYS", "14"))
+
+# Test output is compacted (repeated tracebacks collapsed, head and tail kept) to fit this many prompt tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("CICD_PROMPT_TOKENS", "2000"))
+
 if not PROJECT_ID:
     raise EnvironmentError("❌ PROJECT_ID is not set. Check your .env.local file.")
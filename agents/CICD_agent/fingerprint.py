@@ -0,0 +1,124 @@
+import hashlib
+import re
+import threading
+from concurrent.futures import Future
+
+from shared.cache import make_key
+
+# Path candidates: slash-separated segments not inside a word, URL or longer path
+_PATH_CANDIDATE = re.compile(r"(?<![\w:/\\.~-])(?:[A-Za-z]:)?(?:[\w.~-]*[\\/])+([\w.-]+)")
+_PATH_ANCHOR = re.compile(r"(?:[A-Za-z]:)?[\\/]|~[\\/]|\.{1,2}[\\/]")
+_FILE_NAME = re.compile(r"[A-Za-z_][\w-]*\.[A-Za-z]\w*$")
+
+
+def _strip_directories(match) -> str:
+    """Keep only the file name of a real path; ratios ("3/4") and "a/b" in messages stay as they are."""
+    path = match.group(0)
+    if _PATH_ANCHOR.match(path) or any(_FILE_NAME.match(part) for part in re.split(r"[\\/]", path)):
+        return match.group(1)
+    return path
+
+
+# Run-specific noise that would otherwise make identical failures look different
+_NORMALIZERS = [
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "0x?"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<time>"),
+    (_PATH_CANDIDATE, _strip_directories),  # directories of paths, keep the file name
+    (re.compile(r"\bline \d+"), "line N"),
+    (re.compile(r"(\.py):\d+(?::\d+)?"), r"\1:N"),
+    (re.compile(r"\b\d+(?:\.\d+)?\s?(?:ms|s|sec|seconds)\b"), "<duration>"),
+    (re.compile(r"[ \t]+"), " "),
+]
+# Last line of a traceback, e.g. "ModuleNotFoundError: No module named 'foo'"
+_EXCEPTION_LINE = re.compile(r"^(?:[\w.]+\.)?\w*(?:Error|Exception|Failure|Exit|Interrupt)\b.*$", re.MULTILINE)
+
+
+def normalize(text: str) -> str:
+    for pattern, replacement in _NORMALIZERS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def _digest(lines) -> str:
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+
+
+def failure_signature(report: dict) -> str:
+    """Signature of a failing structured report: the set of normalized failure messages.
+
+    Test ids and tracebacks are left out, so files that fail for the same
+    reason (the same missing module, the same assertion) share a signature.
+    """
+    failures = {
+        f"{test.get('status')}: {normalize(test.get('message', ''))}"
+        for test in report.get("tests", []) if test.get("status") not in ("passed", "skipped")
+    }
+    return _digest(sorted(failures))
+
+
+def output_signature(output: str) -> str:
+    """Signature of free-form output: its exception lines when there are any, else the whole text."""
+    exceptions = sorted({normalize(line) for line in _EXCEPTION_LINE.findall(output)})
+    return _digest(exceptions or [normalize(output)])
+
+
+class SummaryDeduper:
+    """Computes one summary per (model, outcome, signature) and shares it.
+
+    Concurrent requests for a signature wait on the first one instead of
+    calling the model again, and finished summaries are kept in `cache`
+    (a shared DiskCache) so later runs reuse them.
+    """
+
+    def __init__(self, model_name: str, cache=None):
+        self.model_name = model_name
+        self.cache = cache
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.shared = 0
+
+    def summarize(self, signature: str, passed: bool, compute) -> str:
+        key = make_key(self.model_name, passed, signature)
+        with self._lock:
+            self.requests += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result()
+
+        try:
+            summary = self.cache.get(key) if self.cache is not None else None
+            if summary is not None:
+                with self._lock:
+                    self.cache_hits += 1
+            else:
+                with self._lock:
+                    self.llm_calls += 1
+                summary = compute()  # errors are not cached
+                if self.cache is not None:
+                    self.cache.put(key, summary, meta={"signature": signature, "passed": passed,
+                                                       "model": self.model_name})
+            future.set_result(summary)
+            return summary
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "llm_calls": self.llm_calls,
+                "cache_hits": self.cache_hits,
+                "shared_in_flight": self.shared,
+            }
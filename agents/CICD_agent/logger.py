@@ -1,10 +1,8 @@
 import json
 from datetime import datetime, timezone
 from os import getenv
-from google.cloud import bigquery
 from config import PROJECT_ID
-
-bq_client = bigquery.Client()
+from shared.bq_writer import insert_row
 
 def log_test_result(data: dict):
     """Logs a detailed test result with optional LLM summary."""
@@ -14,6 +12,9 @@ def log_test_result(data: dict):
         "file_path": data.get("file_path"),
         "language": data.get("language"),
         "test_output": data.get("test_output", "")[:5000],
+        "status": data.get("status"),
+        "test_report": json.dumps(data.get("test_report") or {}),
+        "signature": data.get("signature"),
         "deps": ", ".join(data.get("dependencies", [])),
         "review_summary": json.dumps(data.get("review_summary", {})),
         "llm_summary": data.get("summary", ""),
@@ -21,11 +22,8 @@ def log_test_result(data: dict):
         "run_id": run_id
     }
 
-    errors = bq_client.insert_rows_json(table_id, [row])
-    if errors:
-        print("❌ Failed to log test result:", errors)
-    else:
-        print("📊 Test result logged to BigQuery.")
+    insert_row(table_id, row)
+    print("📊 Test result queued for BigQuery.")
 
 def log_cicd_event(meta: dict):
     """Logs a high-level CI/CD event for tracking deployments or workflows."""
@@ -40,8 +38,5 @@ def log_cicd_event(meta: dict):
         "run_id": run_id,
     }
 
-    errors = bq_client.insert_rows_json(table_id, [row])
-    if errors:
-        print("❌ Failed to log CI/CD event:", errors)
-    else:
-        print("📈 CI/CD event logged to BigQuery.")
+    insert_row(table_id, row)
+    print("📈 CI/CD event queued for BigQuery.")
@@ -1,12 +1,16 @@
 import os
-import json
+import sys
 from datetime import datetime, timezone
-import requests
-from concurrent.futures import TimeoutError
-from google.cloud import pubsub_v1
 from config import PROJECT_ID, CICD_SUBSCRIPTION_ID, GITHUB_TOKEN, GITHUB_REPO, GITHUB_BRANCH
-from utils import summarize_test_result
+from utils import summarize_test_result, summary_stats
+from fingerprint import failure_signature, output_signature
 from logger import log_test_result, log_cicd_event
+from shared.bq_writer import flush_all as flush_bigquery
+from shared.transport import TRANSPORT, subscribe
+from shared.codec import decode_message
+from shared.manifest import MANIFEST, RESULT, RUN_DEADLINE_SECONDS, RunTracker, current_run_id, kind_of, wait_for_run
+
+run_tracker = RunTracker(current_run_id())
 
 def trigger_github_workflow():
     """Optionally trigger a GitHub Actions deploy workflow."""
@@ -26,6 +30,7 @@ def trigger_github_workflow():
         }
     }
 
+    import requests
     response = requests.post(url, headers=headers, json=payload)
     if response.status_code == 204:
         print("🚀 GitHub Actions workflow triggered.")
@@ -34,6 +39,19 @@ def trigger_github_workflow():
         print("❌ GitHub Actions failed:", response.text)
         return False
 
+def failing_cases(report: dict) -> list:
+    return [test for test in report.get("tests", []) if test.get("status") not in ("passed", "skipped")]
+
+def format_failures(cases: list) -> str:
+    """Compact text of the failing cases only, which is all the summary model needs to see."""
+    blocks = []
+    for case in cases:
+        block = f"{case.get('id')} [{case.get('status')}]: {case.get('message', '')}"
+        if case.get("traceback"):
+            block += "\n" + case["traceback"]
+        blocks.append(block)
+    return "\n\n".join(blocks)
+
 def process_test_result(data: dict):
     print("\n🧩 CI/CD Agent: Received Test Result")
 
@@ -47,18 +65,32 @@ def process_test_result(data: dict):
     print(f"🌐 Language: {language}")
     print("🧪 Test Output:\n", test_output[:1000], "\n...")
 
-    # Determine pass/fail status
-    passed = all(term not in test_output for term in ["FAIL", "Traceback", "Error"])
+    # Determine pass/fail status from the structured report; older producers only send raw output
+    report = data.get("test_report")
+    if report:
+        # A module with nothing to run is not a failing build
+        passed = report["status"] in ("passed", "skipped", "no_tests")
+        counts = report.get("summary", {})
+        print(f"📋 Report: {report['status']} ({counts.get('passed', 0)}/{counts.get('total', 0)} passed)")
+        summary_input = test_output if passed else format_failures(failing_cases(report))
+    else:
+        passed = all(term not in test_output for term in ["FAIL", "Traceback", "Error"])
+        summary_input = test_output
     status = "PASSED" if passed else "FAILED"
+    signature = failure_signature(report) if report and not passed else output_signature(summary_input)
+    print(f"🧬 Signature: {signature}")
 
-    # 🧠 Summarize test output using Gemini
-    summary = summarize_test_result(test_output, passed)
+    # 🧠 Summarize test output using Gemini, once per distinct signature
+    summary = summarize_test_result(summary_input, passed, signature=signature)
 
     # 📊 Log test result
     log_test_result({
         "file_path": file_path,
         "language": language,
         "test_output": test_output,
+        "status": status,
+        "test_report": report,
+        "signature": signature,
         "dependencies": dependencies,
         "review_summary": review_summary,
         "summary": summary,
@@ -75,28 +107,44 @@ def process_test_result(data: dict):
 
     print(f"✅ CI/CD process {status} and logged successfully.\n")
 
+def process_outcome(data: dict):
+    """Record a file that failed or was skipped upstream, so the run's CI/CD events account for it."""
+    status = kind_of(data).upper()
+    print(f"⚠️ {data.get('file_path')}: {status} in {data.get('stage')} ({data.get('reason')})")
+    log_cicd_event({
+        "file_path": data.get("file_path"),
+        "status": status,
+        "triggered_by": data.get("stage", "Unknown"),
+    })
+
 def callback(message):
     try:
-        print("📥 New message received from Pub/Sub")
-        data = json.loads(message.data.decode("utf-8"))
-        process_test_result(data)
+        data = decode_message(message)
+        kind = kind_of(data)
+        if kind == MANIFEST:
+            if run_tracker.tracks(data):
+                run_tracker.add_manifest(data)
+        elif kind == RESULT:
+            print("📥 New test result received")
+            process_test_result(data)
+        else:
+            process_outcome(data)
         message.ack()
+        if kind != MANIFEST and run_tracker.tracks(data):
+            run_tracker.settle(data["file_path"])
     except Exception as e:
         print("❌ Failed to process message:", e)
         message.nack()
 
-def listen_for_test_results(timeout_seconds=20):
-    subscriber = pubsub_v1.SubscriberClient()
-    subscription_path = subscriber.subscription_path(PROJECT_ID, CICD_SUBSCRIPTION_ID)
-    future = subscriber.subscribe(subscription_path, callback=callback)
-    print(f"🔁 Listening for test results on '{CICD_SUBSCRIPTION_ID}'...")
-
-    try:
-        future.result(timeout=timeout_seconds)
-    except TimeoutError:
-        print("⏳ CI/CD Agent timeout reached. Exiting.")
-        future.cancel()
+def listen_for_test_results(deadline_seconds: float = RUN_DEADLINE_SECONDS) -> bool:
+    """Process test results until every file in this run's manifest is done; False if the deadline passed first."""
+    future = subscribe(PROJECT_ID, CICD_SUBSCRIPTION_ID, callback)
+    print(f"🔁 Listening for test results of run {run_tracker.run_id} on '{CICD_SUBSCRIPTION_ID}' ({TRANSPORT})...")
+    return wait_for_run(run_tracker, future, deadline_seconds)
 
 if __name__ == "__main__":
     print("🚀 Starting CI/CD Agent...")
-    listen_for_test_results()
+    complete = listen_for_test_results()
+    print(f"🧬 Summary dedup: {summary_stats()}")
+    flush_bigquery()
+    sys.exit(0 if complete else 1)
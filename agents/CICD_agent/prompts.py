@@ -1,4 +1,13 @@
+from config import PROMPT_TOKEN_BUDGET
+from shared.prompt_budget import PromptBudget
+
+prompt_budget = PromptBudget("cicd", PROMPT_TOKEN_BUDGET)
+# Tokens of the instructions around the test output
+TEMPLATE_TOKENS = 100
+
+
 def build_ci_prompt(test_output: str, passed: bool = False) -> str:
+    test_output = prompt_budget.test_output(test_output, PROMPT_TOKEN_BUDGET - TEMPLATE_TOKENS)
     if passed:
         return f"""
 You are a CI assistant. The following test suite has passed successfully:
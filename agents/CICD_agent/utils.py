@@ -1,15 +1,37 @@
-from vertexai import init
-from vertexai.preview.generative_models import GenerativeModel
-from config import PROJECT_ID, LOCATION
-from prompts import build_ci_prompt
+import os
+from config import PROJECT_ID, LOCATION, SUMMARY_CACHE_ENABLED, SUMMARY_CACHE_DIR, SUMMARY_CACHE_MAX_AGE_DAYS
+from prompts import build_ci_prompt, prompt_budget
+from fingerprint import SummaryDeduper
+from shared.cache import CACHE_ROOT, DiskCache
+from shared.llm_gateway import get_gateway
 
-init(project=PROJECT_ID, location=LOCATION)
-model = GenerativeModel("gemini-2.0-flash-lite")
+MODEL_NAME = "gemini-2.0-flash-lite"
 
-def summarize_test_result(test_output: str, passed: bool = False) -> str:
+model = get_gateway("cicd", MODEL_NAME, PROJECT_ID, LOCATION)
+
+summary_cache = DiskCache(
+    SUMMARY_CACHE_DIR or os.path.join(CACHE_ROOT, "cicd_summaries"),
+    max_age_seconds=SUMMARY_CACHE_MAX_AGE_DAYS * 24 * 3600,
+) if SUMMARY_CACHE_ENABLED else None
+summary_deduper = SummaryDeduper(MODEL_NAME, summary_cache)
+
+def generate_summary(test_output: str, passed: bool) -> str:
+    prompt = build_ci_prompt(test_output, passed)
+    return model.generate_text(prompt_budget.finish(prompt)).strip()
+
+def summarize_test_result(test_output: str, passed: bool = False, signature: str = None) -> str:
+    """Summarize with Gemini; results with the same `signature` share a single call."""
     try:
-        prompt = build_ci_prompt(test_output, passed)
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        if signature is None:
+            return generate_summary(test_output, passed)
+        return summary_deduper.summarize(signature, passed, lambda: generate_summary(test_output, passed))
     except Exception as e:
         return f"[Gemini Error] Could not summarize test result: {e}"
+
+def summary_stats() -> dict:
+    stats = summary_deduper.stats()
+    stats["prompt"] = prompt_budget.stats()
+    stats["llm"] = model.stats()
+    if summary_cache is not None:
+        stats["cache"] = summary_cache.stats()
+    return stats
@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load .env.local from root directory
@@ -6,10 +7,35 @@ env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '
 if os.path.exists(env_path):
     load_dotenv(dotenv_path=env_path)
 
+# Make agents/shared importable as `shared`
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if AGENTS_DIR not in sys.path:
+    sys.path.append(AGENTS_DIR)
+
 # Load from .env or CI environment
 PROJECT_ID = os.getenv("VERTEX_PROJECT_ID") or os.environ.get("VERTEX_PROJECT_ID") or os.environ.get("PROJECT_ID")
 LOCATION = os.getenv("VERTEX_LOCATION") or os.environ.get("VERTEX_LOCATION") or "us-central1"
 SECURITY_SUBSCRIPTION_ID = os.getenv("SECURITY_SUBSCRIPTION_ID") or os.environ.get("SECURITY_SUBSCRIPTION_ID", "security_agent_sub")
 
+# Whole-repo secret scan (main.py --scan-repo)
+SCAN_WORKERS = int(os.getenv("SECURITY_SCAN_WORKERS", "0")) or os.cpu_count() or 1
+SCAN_MMAP_THRESHOLD_BYTES = int(os.getenv("SECURITY_SCAN_MMAP_KB", "1024")) * 1024
+SCAN_MAX_FILE_BYTES = int(os.getenv("SECURITY_SCAN_MAX_MB", "100")) * 1024 * 1024
+SCAN_BATCH_SIZE = int(os.getenv("SECURITY_SCAN_BATCH_SIZE", "64"))
+
+# Scan result cache keyed by blob SHA and rule-set version (set SECURITY_CACHE_ENABLED=0 to always rescan)
+SECURITY_CACHE_ENABLED = os.getenv("SECURITY_CACHE_ENABLED", "1") != "0"
+SECURITY_CACHE_DIR = os.getenv("SECURITY_CACHE_DIR")
+SECURITY_CACHE_MAX_ENTRIES = int(os.getenv("SECURITY_CACHE_MAX_ENTRIES", "50000"))
+# Dependency audits go stale as advisories are published, so they expire sooner
+SECURITY_DEPS_CACHE_HOURS = float(os.getenv("SECURITY_DEPS_CACHE_HOURS", "24"))
+
+# Local advisory database (safety-db insecure_full.json format); `safety check` is only used when it is missing
+VULN_DB_PATH = os.getenv("VULN_DB_PATH")
+VULN_DB_URL = os.getenv("VULN_DB_URL", "https://raw.githubusercontent.com/pyupio/safety-db/master/data/insecure_full.json")
+
+# Findings are sent to Gemini as compact JSON, with the longest lists cut to fit this many prompt tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("SECURITY_PROMPT_TOKENS", "1500"))
+
 if not PROJECT_ID:
     raise EnvironmentError("❌ PROJECT_ID is not set. Define it in .env.local or GitHub Actions secrets.")
@@ -1,11 +1,9 @@
 
 from os import getenv
-from google.cloud import bigquery
 from datetime import datetime, timezone
 import json
 from config import PROJECT_ID
-
-bq_client = bigquery.Client()
+from shared.bq_writer import insert_row
 
 def log_to_bigquery(finding: dict, run_id: str = "manual"):
     table_id = f"{PROJECT_ID}.devops_logs.security_findings"
@@ -17,8 +15,5 @@ def log_to_bigquery(finding: dict, run_id: str = "manual"):
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "run_id": run_id,
     }
-    errors = bq_client.insert_rows_json(table_id, [row])
-    if errors:
-        print("❌ Failed to log to BigQuery:", errors)
-    else:
-        print("✅ Logged finding to BigQuery.")
+    insert_row(table_id, row)
+    print("✅ Finding queued for BigQuery.")
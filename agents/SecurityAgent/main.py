@@ -1,33 +1,55 @@
+import argparse
 import json
-import os
+import sys
 import time
-from concurrent.futures import TimeoutError
-from google.cloud import pubsub_v1
-from scanner import scan_for_secrets_and_vulnerabilities
-from config import PROJECT_ID, SECURITY_SUBSCRIPTION_ID
-from utils import explain_security_findings
+from scanner import scan_for_secrets_and_vulnerabilities, scan_repo, cache_stats, vuln_db_path
+from config import PROJECT_ID, SECURITY_SUBSCRIPTION_ID, VULN_DB_URL
+from utils import explain_security_findings, model
+from prompts import prompt_budget
 from logger import log_to_bigquery  # moved here for cleaner config separation
+from shared.blob_store import resolve_code
+from shared.bq_writer import flush_all as flush_bigquery
+from shared.transport import TRANSPORT, subscribe
+from shared.codec import decode_message, run_id_of
+from shared.manifest import MANIFEST, RESULT, RUN_DEADLINE_SECONDS, RunTracker, current_run_id, kind_of, wait_for_run
+
+CURRENT_RUN_ID = current_run_id()
+run_tracker = RunTracker(CURRENT_RUN_ID)
 
-CURRENT_RUN_ID = os.getenv("RUN_ID", "manual")
 def callback(message):
     try:
-        print("📥 Security Agent received message")
-        data = json.loads(message.data.decode("utf-8"))
-        print("🔍 Payload:", json.dumps(data, indent=2))
+        # 🧾 Filter only current run, from the attributes alone; legacy messages have to be decoded first
+        run_id = run_id_of(message)
+        data = None
+        if run_id is None:
+            data = decode_message(message)
+            run_id = data.get("run_id")
+        if run_id != CURRENT_RUN_ID:
+            print(f"⚠️ Skipping message with stale run_id: {run_id}")
+            message.ack()
+            return
 
-        # 🧾 Filter only current run
-        if data.get("run_id") != CURRENT_RUN_ID:
-            print(f"⚠️ Skipping message with stale run_id: {data.get('run_id')}")
+        data = data if data is not None else decode_message(message)
+        print(f"📥 Security Agent received {data.get('file_path') or kind_of(data)} (run_id={run_id})")
+
+        if kind_of(data) == MANIFEST:
+            run_tracker.add_manifest(data)
             message.ack()
             return
+        if kind_of(data) != RESULT:
+            print(f"⏭️ Nothing to scan: {kind_of(data)} in {data.get('stage')} ({data.get('reason')})")
+            message.ack()
+            run_tracker.settle(data["file_path"])
+            return
 
         file_path = data.get("file_path")
         language = data.get("language")
         test_output = data.get("test_output", "")
-        deps = data.get("dependencies", [])
+        # Pins from the environment the tests ran in; bare import names can only be reported as unresolved
+        deps = data.get("resolved_dependencies") or data.get("dependencies", [])
         review_summary = data.get("review_summary", {})
 
-        findings = scan_for_secrets_and_vulnerabilities(file_path, deps)
+        findings = scan_for_secrets_and_vulnerabilities(file_path, deps, content=resolve_code(data))
 
         if findings:
             print("⚠️ Security issues found:", findings)
@@ -45,22 +67,54 @@ def callback(message):
             })
 
         message.ack()
+        run_tracker.settle(file_path)
     except Exception as e:
         print("❌ Error in Security Agent:", e)
         message.nack()
 
-def listen(timeout_seconds=20):
-    subscriber = pubsub_v1.SubscriberClient()
-    subscription_path = subscriber.subscription_path(PROJECT_ID, SECURITY_SUBSCRIPTION_ID)
-    future = subscriber.subscribe(subscription_path, callback=callback)
-    print(f"🛡️ Listening on subscription: {SECURITY_SUBSCRIPTION_ID}...")
+def listen(deadline_seconds: float = RUN_DEADLINE_SECONDS) -> bool:
+    """Scan this run's files until its manifest is complete; False if the deadline passed first."""
+    future = subscribe(PROJECT_ID, SECURITY_SUBSCRIPTION_ID, callback)
+    print(f"🛡️ Listening for run {CURRENT_RUN_ID} on subscription: {SECURITY_SUBSCRIPTION_ID} ({TRANSPORT})...")
+    return wait_for_run(run_tracker, future, deadline_seconds)
 
-    try:
-        # Properly handle the timeout with pubsub's exception
-        future.result(timeout=timeout_seconds)
-    except TimeoutError:
-        print("⏳ Timeout reached. Shutting down Security Agent.")
-        future.cancel()
+def run_repo_scan(root: str, as_json: bool = False) -> int:
+    started = time.perf_counter()
+    result = scan_repo(root)
+    elapsed = time.perf_counter() - started
+
+    if as_json:
+        print(json.dumps(result, indent=2))
+    else:
+        for finding in result["findings"]:
+            print(f"{finding['file']}:{finding['line']}:{finding['column']}: [{finding['rule']}] {finding['match']}")
+        for error in result["errors"]:
+            print(f"⚠️ Could not scan {error}")
+        print(f"🔐 Scanned {result['files_scanned']} file(s), reused {result['files_cached']} cached, "
+              f"in {elapsed:.2f}s: {len(result['findings'])} potential secret(s)")
+        print(f"♻️ Scan cache: {cache_stats()}")
+    return 1 if result["findings"] else 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Security Agent: Pub/Sub listener or whole-repo secret scan.")
+    parser.add_argument("--scan-repo", nargs="?", const=".", metavar="PATH",
+                        help="Scan every non-ignored file under PATH (default: current directory) and exit")
+    parser.add_argument("--json", action="store_true", help="Print --scan-repo results as JSON")
+    parser.add_argument("--update-vulndb", action="store_true",
+                        help="Download the advisory database from VULN_DB_URL to VULN_DB_PATH and exit")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    listen()
+    args = parse_args()
+    if args.update_vulndb:
+        from vulndb import download as download_vulndb
+        print(f"🗂️ Advisory database saved to {download_vulndb(VULN_DB_URL, vuln_db_path)}")
+        sys.exit(0)
+    if args.scan_repo:
+        sys.exit(run_repo_scan(args.scan_repo, as_json=args.json))
+    complete = listen()
+    print(f"♻️ Scan cache: {cache_stats()}")
+    print(f"📏 Prompt budget: {prompt_budget.stats()}")
+    print(f"🤖 LLM gateway: {model.stats()}")
+    flush_bigquery()
+    sys.exit(0 if complete else 1)
@@ -1,11 +1,16 @@
-import json
+from config import PROMPT_TOKEN_BUDGET
+from shared.prompt_budget import PromptBudget
+
+prompt_budget = PromptBudget("security", PROMPT_TOKEN_BUDGET)
+# Tokens of the instructions around the findings
+TEMPLATE_TOKENS = 80
 
 
 def build_security_prompt(findings: dict) -> str:
     return f"""
 You're a security auditor. Below is a list of secrets and vulnerabilities detected in a codebase:
 
-{json.dumps(findings, indent=2)}
+{prompt_budget.json(findings, PROMPT_TOKEN_BUDGET - TEMPLATE_TOKENS)}
 
 Summarize the risks and suggest mitigation for the top 2 most critical issues.
 """.strip()
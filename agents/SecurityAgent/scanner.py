@@ -1,30 +1,311 @@
+import mmap
+import os
 import re
 import subprocess
+from typing import NamedTuple
 
-SECRET_PATTERNS = [
-    re.compile(r"(secret|token|api|key|password)[\s:=]+['\"]?[A-Za-z0-9_\-]{16,}['\"]?", re.IGNORECASE),
-    re.compile(r"AKIA[0-9A-Z]{16}"),  # AWS
-    re.compile(r"ghp_[A-Za-z0-9]{36}"),  # GitHub Token
+from config import (
+    SCAN_WORKERS, SCAN_MMAP_THRESHOLD_BYTES, SCAN_MAX_FILE_BYTES, SCAN_BATCH_SIZE,
+    SECURITY_CACHE_ENABLED, SECURITY_CACHE_DIR, SECURITY_CACHE_MAX_ENTRIES, SECURITY_DEPS_CACHE_HOURS, VULN_DB_PATH,
+)
+from shared.cache import CACHE_ROOT, DiskCache, make_key
+from shared.discovery import BINARY_SNIFF_BYTES, file_blob_sha, git_blob_sha, git_index_blobs, iter_source_files
+
+
+class SecretRule(NamedTuple):
+    id: str
+    pattern: str            # must only use non-capturing groups
+    literals: tuple         # every match starts with one of these
+    ignore_case: bool = False
+
+
+SECRET_RULES = [
+    SecretRule("generic-secret-assignment",
+               r"(?:secret|token|api|key|password)[\s:=]+['\"]?[A-Za-z0-9_\-]{16,}['\"]?",
+               ("secret", "token", "api", "key", "password"), ignore_case=True),
+    SecretRule("aws-access-key-id", r"AKIA[0-9A-Z]{16}", ("AKIA",)),
+    SecretRule("github-token", r"ghp_[A-Za-z0-9]{36}", ("ghp_",)),
 ]
 
-def scan_for_secrets_and_vulnerabilities(file_path, deps):
+# Bump when the matching logic changes; rule edits change RULESET_VERSION on their own
+SCANNER_VERSION = 1
+RULESET_VERSION = make_key(SCANNER_VERSION, [list(rule) for rule in SECRET_RULES])[:16]
+
+_cache_dir = SECURITY_CACHE_DIR or os.path.join(CACHE_ROOT, "security")
+secret_cache = DiskCache(os.path.join(_cache_dir, "secrets"), max_entries=SECURITY_CACHE_MAX_ENTRIES)
+deps_cache = DiskCache(os.path.join(_cache_dir, "deps"), max_age_seconds=SECURITY_DEPS_CACHE_HOURS * 3600)
+vuln_db_path = VULN_DB_PATH or os.path.join(CACHE_ROOT, "vulndb", "insecure_full.json")
+
+# Kept for callers that want the individual patterns
+SECRET_PATTERNS = [re.compile(rule.pattern, re.IGNORECASE if rule.ignore_case else 0) for rule in SECRET_RULES]
+
+
+def _compile_matcher(rules: list):
+    """One alternation with a named group per rule, so a single pass finds every rule's matches."""
+    parts = []
+    for index, rule in enumerate(rules):
+        body = f"(?i:{rule.pattern})" if rule.ignore_case else rule.pattern
+        parts.append(f"(?P<r{index}>{body})")
+    return re.compile("|".join(parts).encode("ascii"))
+
+
+_MATCHER = _compile_matcher(SECRET_RULES)
+# (literal, compare case-folded) pairs; every match of the combined matcher starts with one of them
+_LITERALS = sorted({(lit.lower().encode("ascii"), True) if rule.ignore_case else (lit.encode("ascii"), False)
+                    for rule in SECRET_RULES for lit in rule.literals})
+_MAX_LITERAL_BYTES = max(len(lit) for lit, _ in _LITERALS)
+WINDOW_BYTES = 8 * 1024 * 1024
+
+
+def redact(text: str, keep: int = 4) -> str:
+    if len(text) <= keep:
+        return "*" * len(text)
+    return f"{text[:keep]}{'*' * 8} ({len(text)} chars)"
+
+
+def _anchors(data) -> list:
+    """Sorted offsets where a rule literal starts.
+
+    This is the prefilter: `bytes.find` runs far faster than the regex engine,
+    so the combined matcher is only tried at these offsets. Case-insensitive
+    literals are searched in a lowered copy of one window at a time, which
+    keeps memory flat for memory-mapped files.
+    """
+    size = len(data)
+    positions = set()
+    for start in range(0, size, WINDOW_BYTES):
+        window = data[start:min(size, start + WINDOW_BYTES + _MAX_LITERAL_BYTES - 1)]
+        lowered = window.lower()
+        for literal, folded in _LITERALS:
+            haystack = lowered if folded else window
+            index = haystack.find(literal)
+            while index != -1:
+                positions.add(start + index)
+                index = haystack.find(literal, index + 1)
+    return sorted(positions)
+
+
+def scan_bytes(data, file_path: str = None) -> list:
+    """Secret findings in `data` (bytes or mmap) with 1-based line and column."""
+    findings = []
+    line, line_start, pos, last_end = 1, 0, 0, 0
+    for anchor in _anchors(data):
+        if anchor < last_end:
+            continue  # inside the previous match
+        match = _MATCHER.match(data, anchor)
+        if match is None:
+            continue
+        start, last_end = match.start(), match.end()
+        skipped = data[pos:start]
+        newlines = skipped.count(b"\n")
+        if newlines:
+            line += newlines
+            line_start = pos + skipped.rfind(b"\n") + 1
+        pos = start
+        rule = SECRET_RULES[int(match.lastgroup[1:])]
+        findings.append({
+            "file": file_path,
+            "line": line,
+            "column": start - line_start + 1,
+            "rule": rule.id,
+            "match": redact(match.group().decode("utf-8", errors="replace")),
+        })
+    return findings
+
+
+def _secret_key(blob_sha: str) -> str:
+    return make_key("secrets", RULESET_VERSION, blob_sha)
+
+
+def _cached_findings(blob_sha: str, file_path: str):
+    """Findings stored for this blob under the current rule set, relabelled for `file_path`."""
+    if not SECURITY_CACHE_ENABLED or blob_sha is None:
+        return None
+    cached = secret_cache.get(_secret_key(blob_sha))
+    if cached is None:
+        return None
+    return [dict(finding, file=file_path) for finding in cached]
+
+
+def _store_findings(blob_sha: str, findings: list, file_path: str):
+    # Findings are stored without the path so every copy of the blob can reuse them
+    if SECURITY_CACHE_ENABLED and blob_sha is not None:
+        value = [{key: item for key, item in finding.items() if key != "file"} for finding in findings]
+        secret_cache.put(_secret_key(blob_sha), value, meta={"file": file_path, "ruleset": RULESET_VERSION})
+
+
+def _load_blob_index() -> dict:
+    """Findings per blob SHA from earlier repo scans under the current rule set.
+
+    Repo scans keep one index entry instead of one cache file per blob, so a
+    warm scan costs a single read rather than thousands.
+    """
+    if not SECURITY_CACHE_ENABLED:
+        return {}
+    return secret_cache.get(make_key("secret-index", RULESET_VERSION)) or {}
+
+
+def _save_blob_index(index: dict, current: dict):
+    """Merge this scan's blobs into the index, dropping the least recently seen past the entry limit."""
+    merged = {sha: findings for sha, findings in index.items() if sha not in current}
+    merged.update(current)
+    overflow = len(merged) - SECURITY_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        merged = dict(list(merged.items())[overflow:])
+    secret_cache.put(make_key("secret-index", RULESET_VERSION), merged,
+                     meta={"kind": "secret-index", "ruleset": RULESET_VERSION, "blobs": len(merged)})
+
+
+def scan_secrets(data: bytes, file_path: str = None) -> list:
+    """`scan_bytes` behind the blob cache, for content that is already in memory."""
+    blob_sha = git_blob_sha(data) if SECURITY_CACHE_ENABLED else None
+    cached = _cached_findings(blob_sha, file_path)
+    if cached is not None:
+        return cached
+    findings = scan_bytes(data, file_path)
+    _store_findings(blob_sha, findings, file_path)
+    return findings
+
+
+def scan_file(path: str, display_path: str = None) -> list:
+    """Scan one file, memory-mapping it when it is large. Binary files yield nothing."""
+    display_path = display_path or path
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    with open(path, "rb") as f:
+        if size < SCAN_MMAP_THRESHOLD_BYTES:
+            data = f.read()
+            return [] if b"\0" in data[:BINARY_SNIFF_BYTES] else scan_bytes(data, display_path)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if b"\0" in data[:BINARY_SNIFF_BYTES]:
+                return []
+            return scan_bytes(data, display_path)
+
+
+def _scan_batch(batch: list) -> tuple:
+    scanned, errors = [], []
+    for path, display_path, blob_sha in batch:
+        try:
+            scanned.append((display_path, blob_sha, scan_file(path, display_path)))
+        except (OSError, ValueError) as e:
+            errors.append(f"{display_path}: {e}")
+    return scanned, errors
+
+
+def scan_repo(root: str, workers: int = SCAN_WORKERS, batch_size: int = SCAN_BATCH_SIZE) -> dict:
+    """Scan every non-ignored text file under `root`, spreading batches of files across processes.
+
+    Unmodified tracked files are identified by their blob SHA from the git
+    index without being read; others are hashed. Blobs already scanned under
+    the current rule set reuse their cached findings, so only new or changed
+    contents are scanned.
+    """
+    root = os.path.abspath(root)
+    files = [(path, os.path.relpath(path, root))
+             for path in iter_source_files(root, None, max_bytes=SCAN_MAX_FILE_BYTES, skip_binary=False)]
+    index_blobs = git_index_blobs(root) if SECURITY_CACHE_ENABLED else {}
+    blob_index = _load_blob_index()
+
+    findings, errors, pending = [], [], []
+    seen = {}  # blob SHA -> path-free findings, for every file in this scan
+    files_cached = 0
+    for path, display_path in files:
+        blob_sha = None
+        if SECURITY_CACHE_ENABLED:
+            blob_sha = index_blobs.get(display_path.replace(os.sep, "/"))
+            if blob_sha is None:
+                try:
+                    blob_sha = file_blob_sha(path)
+                except OSError as e:
+                    errors.append(f"{display_path}: {e}")
+                    continue
+            cached = seen.get(blob_sha, blob_index.get(blob_sha))
+            if cached is not None:
+                seen[blob_sha] = cached
+                findings.extend(dict(finding, file=display_path) for finding in cached)
+                files_cached += 1
+                continue
+        pending.append((path, display_path, blob_sha))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if workers <= 1 or len(batches) <= 1:
+        results = list(map(_scan_batch, batches))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = list(pool.map(_scan_batch, batches))
+
+    for scanned, batch_errors in results:
+        for display_path, blob_sha, file_findings in scanned:
+            if blob_sha is not None:
+                seen[blob_sha] = [{key: item for key, item in f.items() if key != "file"} for f in file_findings]
+            findings.extend(file_findings)
+        errors.extend(batch_errors)
+    if SECURITY_CACHE_ENABLED and pending:
+        _save_blob_index(blob_index, seen)
+
+    findings.sort(key=lambda f: (f["file"], f["line"], f["column"]))
+    return {
+        "files_scanned": len(pending),
+        "files_cached": files_cached,
+        "findings": findings,
+        "errors": errors,
+    }
+
+
+def check_dependencies(deps: list) -> dict:
+    """Structured advisories for `deps` from the local vulnerability index.
+
+    Returns {"vulnerable": [advisory dicts], "unresolved": [requirements]}.
+    Without a local database this falls back to `safety check`, whose text
+    output becomes a single opaque entry.
+    """
+    from vulndb import get_db  # packaging is only imported once dependencies need checking
+    db = get_db(vuln_db_path)
+    if db is not None:
+        return db.query(deps)
+    return {"vulnerable": _safety_check(deps), "unresolved": []}
+
+
+def _safety_check(deps: list) -> list:
+    """`safety check` output for `deps`, reused for the same dependency set until it expires."""
+    key = make_key("deps", sorted(deps))
+    if SECURITY_CACHE_ENABLED:
+        cached = deps_cache.get(key)
+        if cached is not None:
+            return cached
+    result = subprocess.run(["safety", "check", "--stdin"], input="\n".join(deps), text=True, capture_output=True)
+    vulnerabilities = [result.stdout.strip()] if result.stdout else []
+    if SECURITY_CACHE_ENABLED and (result.returncode == 0 or result.stdout):  # never cache a broken run
+        deps_cache.put(key, vulnerabilities, meta={"deps": sorted(deps)})
+    return vulnerabilities
+
+
+def cache_stats() -> dict:
+    return {"secrets": secret_cache.stats(), "deps": deps_cache.stats()}
+
+
+def scan_for_secrets_and_vulnerabilities(file_path, deps, content=None):
+    """Scan `content` (or the file on disk when not given) for secrets, and `deps` for known vulnerabilities."""
     findings = {"secrets": [], "vulnerabilities": []}
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            for pattern in SECRET_PATTERNS:
-                matches = pattern.findall(content)
-                if matches:
-                    findings["secrets"].extend(matches)
+        if content is None:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        else:
+            data = content.encode("utf-8")
+        findings["secrets"].extend(scan_secrets(data, file_path))
     except Exception as e:
         findings["secrets"].append(f"File read error: {e}")
 
     if deps:
         try:
-            result = subprocess.run(["safety", "check", "--stdin"], input="\n".join(deps), text=True, capture_output=True)
-            if result.stdout:
-                findings["vulnerabilities"].append(result.stdout.strip())
+            result = check_dependencies(deps)
+            findings["vulnerabilities"].extend(result["vulnerable"])
+            if result["unresolved"]:
+                findings["unresolved_dependencies"] = result["unresolved"]
         except Exception as e:
             findings["vulnerabilities"].append(f"Safety scan failed: {e}")
 
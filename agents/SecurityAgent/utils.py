@@ -1,15 +1,12 @@
-from vertexai import init
-from vertexai.preview.generative_models import GenerativeModel
 from config import PROJECT_ID, LOCATION
-from prompts import build_security_prompt
+from prompts import build_security_prompt, prompt_budget
+from shared.llm_gateway import get_gateway
 
-init(project=PROJECT_ID, location=LOCATION)
-model = GenerativeModel("gemini-2.0-flash-lite")
+model = get_gateway("security", "gemini-2.0-flash-lite", PROJECT_ID, LOCATION)
 
 def explain_security_findings(findings: dict) -> str:
     try:
         prompt = build_security_prompt(findings)
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return model.generate_text(prompt_budget.finish(prompt)).strip()
     except Exception as e:
         return f"[Gemini Error] Could not explain security findings: {e}"
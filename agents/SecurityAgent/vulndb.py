@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import threading
+from typing import NamedTuple
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+
+class Advisory(NamedTuple):
+    id: str
+    package: str
+    specs: str          # affected versions, e.g. "<1.2.3,>=2.0,<2.0.4"
+    cve: str
+    advisory: str
+
+
+class VulnDB:
+    """In-memory advisory index loaded from a safety-db style `insecure_full.json`.
+
+    Advisories are grouped by canonical package name with their affected
+    version ranges pre-parsed, so a batch query is a dict lookup plus a
+    specifier check per advisory of each requested package.
+    """
+
+    def __init__(self, advisories: dict, version: str = None):
+        self._index = advisories  # canonical name -> [(SpecifierSet, Advisory)]
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str) -> "VulnDB":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = {}
+        for name, entries in data.items():
+            if name.startswith("$"):
+                continue
+            package = canonicalize_name(name)
+            for entry in entries:
+                for spec in entry.get("specs") or [entry.get("v", "")]:
+                    try:
+                        specifier = SpecifierSet(spec)
+                    except InvalidSpecifier:
+                        continue
+                    index.setdefault(package, []).append((specifier, Advisory(
+                        id=entry.get("id", ""),
+                        package=package,
+                        specs=entry.get("v") or spec,
+                        cve=entry.get("cve") or "",
+                        advisory=entry.get("advisory", ""),
+                    )))
+        meta = data.get("$meta", {})
+        return cls(index, version=str(meta.get("timestamp") or meta.get("version") or os.path.getmtime(path)))
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._index.values())
+
+    def advisories_for(self, package: str, version: str) -> list:
+        parsed = Version(version)
+        seen, matches = set(), []
+        for specifier, advisory in self._index.get(canonicalize_name(package), ()):
+            if advisory.id not in seen and specifier.contains(parsed, prereleases=True):
+                seen.add(advisory.id)
+                matches.append(advisory)
+        return matches
+
+    def query(self, requirements: list) -> dict:
+        """Advisories affecting each requirement.
+
+        Only exact pins (`name==1.2`, e.g. the `pip freeze` of the environment
+        the tests ran in) are checked. Anything else is listed under
+        `unresolved` instead of being guessed: an unpinned name may be an
+        import name rather than a distribution, and the agent's own
+        interpreter says nothing about the tested environment.
+        """
+        vulnerable, unresolved = [], []
+        for requirement in requirements:
+            name, version = resolve_version(requirement)
+            if name is None or version is None:
+                unresolved.append(name or requirement)
+                continue
+            if canonicalize_name(name) not in self._index:
+                continue
+            try:
+                advisories = self.advisories_for(name, version)
+            except InvalidVersion:
+                unresolved.append(f"{name}=={version}")
+                continue
+            vulnerable.extend(dict(advisory._asdict(), version=version) for advisory in advisories)
+        return {"vulnerable": vulnerable, "unresolved": unresolved}
+
+
+def resolve_version(requirement: str) -> tuple:
+    """(name, version) for a requirement string; version is None unless it is pinned exactly."""
+    try:
+        req = Requirement(requirement)
+    except InvalidRequirement:
+        return None, None
+    pins = [spec.version for spec in req.specifier if spec.operator in ("==", "===") and "*" not in spec.version]
+    return req.name, pins[0] if pins else None
+
+
+_db = None
+_db_mtime = None
+_db_lock = threading.Lock()
+
+
+def get_db(path: str):
+    """The advisory index for `path`, loaded once and reloaded when the file changes. None if missing."""
+    global _db, _db_mtime
+    with _db_lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if _db is None or mtime != _db_mtime:
+            _db = VulnDB.load(path)
+            _db_mtime = mtime
+            print(f"🗂️ Loaded {len(_db)} advisories from {path}")
+        return _db
+
+
+def download(url: str, path: str) -> str:
+    """Fetch a fresh advisory database to `path`, replacing the old one atomically."""
+    import urllib.request
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=60) as response:
+        data = response.read()
+    json.loads(data)  # refuse to install something that is not JSON
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
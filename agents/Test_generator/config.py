@@ -1,14 +1,52 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 # Automatically resolve path to shared .env at root
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.env.local'))
 load_dotenv(dotenv_path=env_path)
 
+# Make agents/shared importable as `shared`
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if AGENTS_DIR not in sys.path:
+    sys.path.append(AGENTS_DIR)
+
 PROJECT_ID = os.getenv("VERTEX_PROJECT_ID")
 LOCATION = os.getenv("VERTEX_LOCATION")
 PUBSUB_TOPIC = os.getenv("PUBSUB_TOPIC")  # Already used in Code Reviewer Agent
 PUBLISH_TOPIC = os.getenv("TEST_GEN_OUTPUT_TOPIC", "test_generation_done")
 SUBSCRIPTION_ID = os.getenv("TEST_GEN_SUBSCRIPTION_ID", "test_generator_sub")
 
+# Sources above this estimated token count get tests generated per chunk, in parallel
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "8000"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+# Prompt budget: the review embedded in a test prompt is trimmed to REVIEW_TOKEN_BUDGET
+REVIEW_TOKEN_BUDGET = int(os.getenv("TEST_GEN_REVIEW_TOKENS", "1500"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("TEST_GEN_PROMPT_TOKENS", str(CHUNK_TOKEN_BUDGET + REVIEW_TOKEN_BUDGET + 500)))
+
+# Generated-test store: unchanged source, review, prompt and model re-run the stored test instead of regenerating
+TEST_STORE_ENABLED = os.getenv("TEST_STORE_ENABLED", "1") != "0"
+TEST_STORE_DIR = os.getenv("TEST_STORE_DIR")
+TEST_STORE_MAX_ENTRIES = int(os.getenv("TEST_STORE_MAX_ENTRIES", "5000"))
+TEST_STORE_MAX_MB = int(os.getenv("TEST_STORE_MAX_MB", "200"))
+TEST_STORE_MAX_AGE_DAYS = float(os.getenv("TEST_STORE_MAX_AGE_DAYS", "90"))
+
+# Subscriber runtime: concurrent test-generation workers, flow control and shutdown
+WORKERS = int(os.getenv("TEST_GEN_WORKERS", "2"))
+MAX_MESSAGES = int(os.getenv("TEST_GEN_MAX_MESSAGES", str(WORKERS)))
+MAX_BYTES = int(os.getenv("TEST_GEN_MAX_BYTES", str(10 * 1024 * 1024)))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("TEST_GEN_IDLE_TIMEOUT", "0"))  # 0 = run until signalled
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("TEST_GEN_SHUTDOWN_TIMEOUT", "300"))
+
+# Virtualenv pool for generated-test dependencies (defaults live under .agent_cache)
+TEST_ENV_DIR = os.getenv("TEST_ENV_DIR")
+TEST_WHEEL_DIR = os.getenv("TEST_WHEEL_DIR")
+TEST_ENV_MAX_ENVS = int(os.getenv("TEST_ENV_MAX_ENVS", "8"))
+TEST_ENV_MAX_MB = int(os.getenv("TEST_ENV_MAX_MB", "4096"))
+TEST_ENV_OFFLINE = os.getenv("TEST_ENV_OFFLINE", "0") == "1"  # install only from TEST_WHEEL_DIR
 
+# Sandboxed test runner: parallel test processes (default: one per core) and per-test limits
+TEST_RUN_PARALLEL = int(os.getenv("TEST_RUN_PARALLEL", "0")) or os.cpu_count() or 1
+TEST_RUN_TIMEOUT_SECONDS = float(os.getenv("TEST_RUN_TIMEOUT", "120"))
+TEST_RUN_CPU_SECONDS = int(os.getenv("TEST_RUN_CPU_SECONDS", "120"))
+TEST_RUN_MEMORY_MB = int(os.getenv("TEST_RUN_MEMORY_MB", "2048"))
@@ -0,0 +1,282 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+READY_MARKER = ".ready"
+FREEZE_FILE = ".freeze"  # `pip freeze` of the environment, taken once it is built
+STALE_LOCK_SECONDS = 30 * 60
+# A lease whose process is gone, or that is older than this, no longer protects its environment
+STALE_LEASE_SECONDS = 6 * 3600
+
+
+def normalize_requirements(requirements: list) -> list:
+    return sorted({req.strip().lower() for req in requirements if req.strip()})
+
+
+def requirements_key(requirements: list) -> str:
+    """Hash of the dependency set plus the interpreter it is built for."""
+    interpreter = f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}-{sys.platform}"
+    payload = "\n".join([interpreter] + normalize_requirements(requirements))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _lease_alive(path: str) -> bool:
+    try:
+        if time.time() - os.path.getmtime(path) > STALE_LEASE_SECONDS:
+            return False
+        os.kill(int(os.path.basename(path).split("-", 1)[0]), 0)
+        return True
+    except PermissionError:
+        return True  # the process exists but belongs to someone else
+    except (OSError, ValueError):
+        return False
+
+
+class EnvLease:
+    """An environment in use by a test; eviction skips it until the lease is released."""
+
+    def __init__(self, python: str, path: str = None):
+        self.python = python
+        self.path = path
+
+    def release(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class EnvPool:
+    """Isolated virtualenvs for generated tests, one per distinct dependency set.
+
+    An environment is built once, reused by every file and run that needs the
+    same dependencies, and evicted least-recently-used first once the pool
+    exceeds `max_envs` or `max_bytes`. Environments leased by a running test
+    (in this or another process) are never evicted. Packages are installed from a local
+    wheel directory, which is filled on online builds so later builds can run
+    with `offline=True`.
+    """
+
+    def __init__(self, root: str, wheel_dir: str, max_envs: int = 8, max_bytes: int = 4 * 1024 ** 3,
+                 offline: bool = False):
+        self.root = root
+        self.wheel_dir = wheel_dir
+        self.max_envs = max_envs
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def _env_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    @staticmethod
+    def _env_python(env_dir: str) -> str:
+        if os.name == "nt":
+            return os.path.join(env_dir, "Scripts", "python.exe")
+        return os.path.join(env_dir, "bin", "python")
+
+    def _thread_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _acquire_file_lock(self, lock_path: str):
+        """Cross-process lock: whoever creates the lock file first builds the env."""
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.5)
+
+    def python_for(self, requirements: list) -> str:
+        """Interpreter path of an environment with `requirements` installed, building it if needed."""
+        requirements = normalize_requirements(requirements)
+        if not requirements:
+            return sys.executable
+
+        key = requirements_key(requirements)
+        env_dir = self._env_dir(key)
+        marker = os.path.join(env_dir, READY_MARKER)
+        os.makedirs(self.root, exist_ok=True)
+
+        with self._thread_lock(key):
+            if not os.path.exists(marker):
+                lock_path = env_dir + ".lock"
+                self._acquire_file_lock(lock_path)
+                try:
+                    if not os.path.exists(marker):  # another process may have built it meanwhile
+                        self._build(env_dir, requirements)
+                        self.builds += 1
+                finally:
+                    os.remove(lock_path)
+                self.evict(keep=key)
+            else:
+                self.hits += 1
+            os.utime(marker)  # LRU bookkeeping
+        return self._env_python(env_dir)
+
+    def _lease_dir(self, key: str) -> str:
+        return self._env_dir(key) + ".leases"
+
+    def _leased(self, key: str) -> bool:
+        """Whether a live lease holds the environment; stale leases are cleaned up on the way."""
+        lease_dir = self._lease_dir(key)
+        if not os.path.isdir(lease_dir):
+            return False
+        leased = False
+        for entry in os.scandir(lease_dir):
+            if _lease_alive(entry.path):
+                leased = True
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        return leased
+
+    def lease(self, requirements: list) -> EnvLease:
+        """Lease an environment with `requirements` installed, building it if needed; release it after the test.
+
+        The lease is taken before the environment is looked up, so an
+        eviction that starts later always sees it.
+        """
+        requirements = normalize_requirements(requirements)
+        if not requirements:
+            return EnvLease(sys.executable)
+        lease_dir = self._lease_dir(requirements_key(requirements))
+        os.makedirs(lease_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=lease_dir, prefix=f"{os.getpid()}-")
+        os.close(fd)
+        try:
+            return EnvLease(self.python_for(requirements), path)
+        except BaseException:
+            os.remove(path)
+            raise
+
+    def _build(self, env_dir: str, requirements: list):
+        print(f"📦 Building test environment for: {', '.join(requirements)}")
+        shutil.rmtree(env_dir, ignore_errors=True)  # leftovers of an interrupted build
+        os.makedirs(self.wheel_dir, exist_ok=True)
+        req_path = env_dir + ".requirements.txt"
+        with open(req_path, "w") as f:
+            f.write("\n".join(requirements))
+        try:
+            subprocess.run([sys.executable, "-m", "venv", env_dir], check=True)
+            python = self._env_python(env_dir)
+            if not self.offline:
+                # Fill the local wheel cache so the same set can later be built offline
+                subprocess.run([python, "-m", "pip", "wheel", "--quiet", "--wheel-dir", self.wheel_dir,
+                                "-r", req_path], check=True)
+            subprocess.run([python, "-m", "pip", "install", "--quiet", "--no-index", "--find-links", self.wheel_dir,
+                            "-r", req_path], check=True)
+        except (OSError, subprocess.CalledProcessError):
+            shutil.rmtree(env_dir, ignore_errors=True)
+            raise
+        finally:
+            os.remove(req_path)
+
+        self._freeze(env_dir)
+        with open(os.path.join(env_dir, READY_MARKER), "w") as f:
+            f.write(str(_dir_size(env_dir)))
+
+    def _freeze(self, env_dir: str) -> list:
+        output = subprocess.run([self._env_python(env_dir), "-m", "pip", "freeze", "--all"],
+                                check=True, capture_output=True, text=True).stdout
+        pins = [line.strip() for line in output.splitlines() if "==" in line and not line.startswith("#")]
+        with open(os.path.join(env_dir, FREEZE_FILE), "w") as f:
+            f.write("\n".join(pins))
+        return pins
+
+    def installed(self, requirements: list) -> list:
+        """`name==version` of every distribution in the ready environment for `requirements` ([] if none)."""
+        requirements = normalize_requirements(requirements)
+        env_dir = self._env_dir(requirements_key(requirements))
+        if not requirements or not os.path.isfile(os.path.join(env_dir, READY_MARKER)):
+            return []
+        try:
+            with open(os.path.join(env_dir, FREEZE_FILE)) as f:
+                return [line for line in f.read().splitlines() if line]
+        except FileNotFoundError:
+            return self._freeze(env_dir)  # built before freezes were recorded
+
+    def evict(self, keep: str = None) -> int:
+        """Remove least-recently-used environments beyond the count and size budgets."""
+        envs = []
+        for key in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            marker = os.path.join(self._env_dir(key), READY_MARKER)
+            if key == keep or "." in key or not os.path.isfile(marker):  # skip locks, leases, half-evicted dirs
+                continue
+            try:
+                with open(marker) as f:
+                    size = int(f.read().strip() or 0)
+                envs.append((os.path.getmtime(marker), size, key))
+            except (OSError, ValueError):
+                continue
+
+        kept = self._env_dir(keep) if keep else None
+        total = sum(size for _, size, _ in envs)
+        if kept and os.path.isfile(os.path.join(kept, READY_MARKER)):
+            with open(os.path.join(kept, READY_MARKER)) as f:
+                total += int(f.read().strip() or 0)
+        count = len(envs) + (1 if kept else 0)
+
+        evicted = 0
+        for _, size, key in sorted(envs):
+            if count <= self.max_envs and total <= self.max_bytes:
+                break
+            if os.path.exists(self._env_dir(key) + ".lock") or self._leased(key):
+                continue  # being rebuilt or used right now
+            # Move it aside first, then look for a lease taken in the meantime before deleting anything
+            doomed = f"{self._env_dir(key)}.evicting-{os.getpid()}"
+            try:
+                os.rename(self._env_dir(key), doomed)
+            except OSError:
+                continue
+            if self._leased(key):
+                try:
+                    os.rename(doomed, self._env_dir(key))
+                    continue
+                except OSError:
+                    pass  # already being rebuilt by the new lease holder
+            shutil.rmtree(doomed, ignore_errors=True)
+            total -= size
+            count -= 1
+            evicted += 1
+        if evicted:
+            print(f"🧹 Evicted {evicted} test environment(s).")
+        return evicted
@@ -0,0 +1,210 @@
+"""Run one generated test module and write a JSON report of every test.
+
+Usage: python harness.py <test_file.py> <report.json>
+
+The harness only uses the standard library, so it runs unchanged inside the
+pooled test virtualenvs. Besides unittest TestCases it runs pytest-style
+`test*` functions and plain `Test*` classes. Human-readable unittest output
+still goes to stderr.
+"""
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+REPORT_VERSION = 1
+MAX_TRACEBACK_LINES = 15
+
+
+def _trim_traceback(text: str) -> str:
+    lines = text.rstrip().splitlines()
+    if len(lines) <= MAX_TRACEBACK_LINES:
+        return "\n".join(lines)
+    return "\n".join(["Traceback (most recent call last):", "  ..."] + lines[-(MAX_TRACEBACK_LINES - 2):])
+
+
+def _message(err) -> str:
+    exc_type, exc, _ = err
+    text = str(exc).strip().splitlines()
+    return f"{exc_type.__name__}: {text[0]}" if text else exc_type.__name__
+
+
+class JsonTestResult(unittest.TextTestResult):
+    """TextTestResult that also records status, duration and failure details per test."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.records = []
+        self._started = {}
+
+    def startTest(self, test):
+        self._started[test.id()] = time.perf_counter()
+        super().startTest(test)
+
+    def _record(self, test, status: str, err=None, reason: str = None):
+        started = self._started.get(test.id(), time.perf_counter())
+        entry = {
+            "id": test.id(),
+            "status": status,
+            "duration_seconds": round(time.perf_counter() - started, 4),
+        }
+        if err is not None:
+            entry["message"] = _message(err)
+            entry["traceback"] = _trim_traceback(self._exc_info_to_string(err, test))
+        if reason:
+            entry["message"] = reason
+        self.records.append(entry)
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record(test, "failed", err)
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record(test, "error", err)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._record(test, "skipped", reason=reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._record(test, "passed", reason="expected failure")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._record(test, "failed", reason="unexpected success")
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            failed = issubclass(err[0], test.failureException)
+            self._record(subtest, "failed" if failed else "error", err)
+
+
+def _load_module(path: str):
+    """Import the test module without letting a stray `unittest.main()` take over the process."""
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    original_main = unittest.main
+    unittest.main = lambda *args, **kwargs: None
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        unittest.main = original_main
+    return module
+
+
+class _FunctionTest(unittest.FunctionTestCase):
+    """A pytest-style test function, reported under its module-qualified name like unittest tests are."""
+
+    def __init__(self, func, test_id: str):
+        super().__init__(func)
+        self._test_id = test_id
+
+    def id(self):
+        return self._test_id
+
+    def __str__(self):
+        return self._test_id
+
+
+def _fixture_names(func, skip: int = 0) -> list:
+    params = list(inspect.signature(func).parameters.values())[skip:]
+    return [p.name for p in params if p.default is p.empty and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)]
+
+
+def _plain_test(test_id: str, func, fixtures: list) -> _FunctionTest:
+    """Wrap a bare test callable; one that needs pytest fixtures is skipped rather than reported as an error."""
+    if fixtures:
+        def func():
+            raise unittest.SkipTest(f"needs pytest fixtures: {', '.join(fixtures)}")
+    return _FunctionTest(func, test_id)
+
+
+def _run_method(cls, name: str):
+    """Run one test method of a plain class on a fresh instance, with its setup/teardown_method, as pytest does."""
+    instance = cls()
+    method = getattr(instance, name)
+    if hasattr(instance, "setup_method"):
+        instance.setup_method(method)
+    try:
+        method()
+    finally:
+        if hasattr(instance, "teardown_method"):
+            instance.teardown_method(method)
+
+
+def load_tests(module) -> unittest.TestSuite:
+    """unittest TestCases plus pytest-style `test*` functions and plain `Test*` classes defined in `module`."""
+    suite = unittest.defaultTestLoader.loadTestsFromModule(module)
+    for name, obj in vars(module).items():
+        if getattr(obj, "__module__", None) != module.__name__:
+            continue  # imported, not defined here
+        if name.startswith("test") and inspect.isfunction(obj):
+            suite.addTest(_plain_test(f"{module.__name__}.{name}", obj, _fixture_names(obj)))
+        elif name.startswith("Test") and inspect.isclass(obj) and not issubclass(obj, unittest.TestCase):
+            for method_name, method in vars(obj).items():
+                if method_name.startswith("test") and inspect.isfunction(method):
+                    run = lambda cls=obj, attr=method_name: _run_method(cls, attr)
+                    suite.addTest(_plain_test(f"{module.__name__}.{name}.{method_name}", run,
+                                              _fixture_names(method, skip=1)))
+    return suite
+
+
+def build_report(records: list, duration: float) -> dict:
+    counts = {status: sum(1 for r in records if r["status"] == status)
+              for status in ("passed", "failed", "error", "skipped")}
+    if not records:
+        status = "no_tests"
+    elif counts["failed"] or counts["error"]:
+        status = "failed"
+    else:
+        status = "passed"
+    return {
+        "version": REPORT_VERSION,
+        "status": status,
+        "summary": {"total": len(records), **counts, "duration_seconds": round(duration, 4)},
+        "tests": records,
+    }
+
+
+def main(test_path: str, report_path: str) -> int:
+    started = time.perf_counter()
+    try:
+        module = _load_module(test_path)
+        suite = load_tests(module)
+        runner = unittest.TextTestRunner(stream=sys.stderr, verbosity=2, resultclass=JsonTestResult)
+        records = runner.run(suite).records
+    except BaseException as e:  # import-time failures, including SystemExit from the test module
+        records = [{
+            "id": os.path.basename(test_path),
+            "status": "error",
+            "duration_seconds": round(time.perf_counter() - started, 4),
+            "message": f"{type(e).__name__}: {e}",
+            "traceback": _trim_traceback(traceback.format_exc()),
+        }]
+        print(records[0]["traceback"], file=sys.stderr)
+
+    report = build_report(records, time.perf_counter() - started)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    return 0 if report["status"] in ("passed", "no_tests") else 1
+
+
+if __name__ == "__main__":
+    # Keep the agent's own modules (utils, config, ...) from shadowing the module under test
+    if sys.path and os.path.abspath(sys.path[0]) == os.path.dirname(os.path.abspath(__file__)):
+        sys.path.pop(0)
+    if len(sys.argv) != 3:
+        print(__doc__, file=sys.stderr)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1], sys.argv[2]))
@@ -1,22 +1,80 @@
+import argparse
+import hashlib
 import os
 import sys
 import json
 import re
-import shutil
+import signal
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from git import Repo  # type: ignore
-from vertexai import init
-from vertexai.preview.generative_models import GenerativeModel
-from google.cloud import pubsub_v1, bigquery
 
-from utils import read_local_file, detect_language_from_extension
-from prompts import build_test_generator_prompt
-from config import PROJECT_ID, LOCATION, PUBLISH_TOPIC, SUBSCRIPTION_ID
+from utils import read_local_file, detect_language_from_extension, merge_python_test_files
+from prompts import TEST_PROMPT_VERSION, build_test_generator_prompt, prompt_budget
+from config import (
+    PROJECT_ID, LOCATION, PUBLISH_TOPIC, SUBSCRIPTION_ID, CHUNK_TOKEN_BUDGET, CHUNK_WORKERS,
+    WORKERS, MAX_MESSAGES, MAX_BYTES, IDLE_TIMEOUT_SECONDS, SHUTDOWN_TIMEOUT_SECONDS,
+    TEST_ENV_DIR, TEST_WHEEL_DIR, TEST_ENV_MAX_ENVS, TEST_ENV_MAX_MB, TEST_ENV_OFFLINE,
+    TEST_RUN_PARALLEL, TEST_RUN_TIMEOUT_SECONDS, TEST_RUN_CPU_SECONDS, TEST_RUN_MEMORY_MB,
+    REVIEW_TOKEN_BUDGET, TEST_STORE_ENABLED, TEST_STORE_DIR, TEST_STORE_MAX_ENTRIES, TEST_STORE_MAX_MB,
+    TEST_STORE_MAX_AGE_DAYS,
+)
+from envpool import EnvLease, EnvPool
+from runner import TestJob, TestRunner
+from teststore import STORABLE_STATUSES, GeneratedTestStore
+from shared.cache import CACHE_ROOT, DiskCache
+from shared.llm_gateway import get_gateway
+from shared.chunking import chunk_source, map_chunks, issues_in_chunk
+from shared.blob_store import get_store, resolve_code
+from shared.publisher import publish, flush as flush_publisher
+from shared.bq_writer import insert_row, flush_all as flush_bigquery
+from shared.daemon import serve, submit
+from shared.transport import TRANSPORT, subscribe
+from shared.codec import decode_message, encode
+from shared.manifest import (
+    ERROR, MANIFEST, RESULT, RunTracker, build_manifest, build_outcome, current_run_id, kind_of,
+    run_id_is_explicit,
+)
+from shared.discovery import read_file_list
 
-# Initialize Gemini and BigQuery
-init(project=PROJECT_ID, location=LOCATION)
-model = GenerativeModel("gemini-2.0-flash-lite")
+MODEL_NAME = "gemini-2.0-flash-lite"
+
+# Gemini, behind the shared gateway (adaptive concurrency, retries)
+model = get_gateway("test_generator", MODEL_NAME, PROJECT_ID, LOCATION)
+
+# Generated tests from earlier runs, re-run as long as nothing that shapes their prompt has changed
+test_store = GeneratedTestStore(
+    DiskCache(
+        TEST_STORE_DIR or os.path.join(CACHE_ROOT, "generated_tests"),
+        max_entries=TEST_STORE_MAX_ENTRIES,
+        max_bytes=TEST_STORE_MAX_MB * 1024 * 1024,
+        max_age_seconds=TEST_STORE_MAX_AGE_DAYS * 24 * 3600,
+    ),
+    MODEL_NAME,
+    TEST_PROMPT_VERSION,
+    budgets={"chunk": CHUNK_TOKEN_BUDGET, "review": REVIEW_TOKEN_BUDGET},
+)
+# --regenerate: ignore stored tests for this process and replace them with fresh ones
+REGENERATE = False
+
+# Virtualenvs for generated tests, shared across files and runs
+env_pool = EnvPool(
+    TEST_ENV_DIR or os.path.join(CACHE_ROOT, "test_envs"),
+    TEST_WHEEL_DIR or os.path.join(CACHE_ROOT, "wheels"),
+    max_envs=TEST_ENV_MAX_ENVS,
+    max_bytes=TEST_ENV_MAX_MB * 1024 * 1024,
+    offline=TEST_ENV_OFFLINE,
+)
+
+# Sandboxed runner; bounds concurrent test processes across all workers
+test_runner = TestRunner(
+    max_parallel=TEST_RUN_PARALLEL,
+    timeout=TEST_RUN_TIMEOUT_SECONDS,
+    cpu_seconds=TEST_RUN_CPU_SECONDS,
+    memory_mb=TEST_RUN_MEMORY_MB,
+)
 
 def extract_python_dependencies(code: str, project_dir: str) -> list:
     std_libs = {
@@ -40,151 +98,419 @@ def write_requirements(requirements: list, path: str):
     with open(path, "w") as f:
         f.write("\n".join(clean))
 
-def install_dependencies(requirements_path: str):
+def lease_environment(deps: list) -> EnvLease:
+    """Lease of a pooled virtualenv with `deps` installed (the agent's own interpreter if that fails)."""
     try:
-        # Ensure core dependency in case it's stripped or missing
-        subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "requests"], check=True)
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", requirements_path], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install dependencies: {e}")
+        return env_pool.lease(deps)
+    except Exception as e:
+        print(f"❌ Failed to prepare test environment: {e}")
+        return EnvLease(sys.executable)
 
-def uninstall_dependencies(packages: list):
-    subprocess.run([sys.executable, "-m", "pip", "uninstall", "-y", *packages], check=False)
+def resolved_dependencies(deps: list, python_exe: str) -> list:
+    """Exact `name==version` pins of the pooled environment the test ran in; [] when it ran in the agent's own."""
+    if not deps or python_exe == sys.executable:
+        return []
+    try:
+        return env_pool.installed(deps)
+    except Exception as e:
+        print(f"⚠️ Could not list the test environment's packages: {e}")
+        return []
 
-def get_git_root() -> str:
+def get_git_root(cwd: str = None) -> str:
     try:
-        root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], stderr=subprocess.DEVNULL)
+        root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], cwd=cwd, stderr=subprocess.DEVNULL)
         return root.decode("utf-8").strip()
     except subprocess.CalledProcessError:
         raise RuntimeError("❌ Not inside a Git repository.")
 
-def run_python_test(test_file_path: str):
-    test_dir = os.path.dirname(test_file_path)
-    with open(test_file_path, encoding="utf-8", errors="replace") as f:
-        test_code = f.read()
-    temp_path = test_file_path + ".temp.py"
-    injected_code = f"import sys\nsys.path.insert(0, r'{test_dir}')\n" + test_code
-    with open(temp_path, "w", encoding="utf-8") as f:
-        f.write(injected_code)
-    result = subprocess.run([sys.executable, temp_path], capture_output=True, text=True)
-    os.remove(temp_path)
-    return result.stdout + result.stderr
-
-def run_test(language: str, test_path: str):
-    return run_python_test(test_path) if language == "python" else f"⚠️ Language '{language}' not supported."
-
-def publish_test_result(data: dict):
-    publisher = pubsub_v1.PublisherClient()
-    topic_path = publisher.topic_path(PROJECT_ID, PUBLISH_TOPIC)
-    publisher.publish(topic_path, data=json.dumps(data).encode("utf-8"))
-    print("📤 Published test result to Pub/Sub.")
+def output_dir_for_tests() -> str:
+    output_dir = os.path.join(os.path.dirname(__file__), "..", "..", "generated_tests")
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+def source_rel_path(source_path: str, root_dir: str) -> str:
+    """`source_path` relative to the repository root; files outside it are keyed by a hash of their directory."""
+    path = os.path.abspath(source_path)
+    rel_path = os.path.relpath(path, root_dir)
+    if rel_path.startswith(os.pardir):
+        digest = hashlib.sha256(os.path.dirname(path).encode("utf-8")).hexdigest()[:8]
+        rel_path = os.path.join("_external", digest, os.path.basename(path))
+    return rel_path
+
+def test_paths_for(source_path: str, output_dir: str, root_dir: str) -> tuple:
+    """(test file, requirements file) for a source, mirroring its directory so same-named sources never collide."""
+    rel_path = source_rel_path(source_path, root_dir)
+    test_path = os.path.join(output_dir, os.path.dirname(rel_path), f"test_{os.path.basename(rel_path)}")
+    return test_path, os.path.splitext(test_path)[0] + ".requirements.txt"
+
+def skipped_run(test_path: str, language: str) -> dict:
+    message = f"⚠️ Language '{language}' not supported."
+    return {"test_file": test_path, "status": "skipped", "returncode": None, "duration_seconds": 0.0,
+            "output": message,
+            "report": {"version": 1, "status": "skipped",
+                       "summary": {"total": 0, "passed": 0, "failed": 0, "error": 0, "skipped": 0},
+                       "tests": [], "message": message}}
+
+def test_job(prepared: dict) -> TestJob:
+    source_dir = os.path.dirname(os.path.abspath(prepared["source_path"]))
+    return TestJob(prepared["test_path"], source_dir, prepared["python_exe"], extra_paths=(prepared["root_dir"],))
+
+def run_test(prepared: dict) -> dict:
+    """Run a generated test in the sandboxed runner; returns the per-file result."""
+    if prepared["language"] != "python":
+        return skipped_run(prepared["test_path"], prepared["language"])
+    # Leased from lookup until this test has run, so the environment cannot be evicted under it but is
+    # free for eviction again as soon as it is done
+    with lease_environment(prepared["deps"]) as lease:
+        prepared["python_exe"] = lease.python
+        prepared["resolved"] = resolved_dependencies(prepared["deps"], lease.python)
+        return test_runner.run(test_job(prepared))
+
+def run_tests(prepared: list) -> list:
+    """Run many generated tests at once, up to the runner's parallelism; results come back in order."""
+    if not prepared:
+        return []
+    with ThreadPoolExecutor(max_workers=min(test_runner.max_parallel, len(prepared))) as pool:
+        return list(pool.map(run_test, prepared))
+
+def print_store_stats():
+    """Persist this run's generated-test store counters and print them with the all-time totals."""
+    if TEST_STORE_ENABLED:
+        test_store.save_stats()
+        print(f"🗃️ Test store: {test_store.stats()}")
+
+def publish_test_result(data: dict, label: str = None):
+    body, attributes = encode(data)
+    publish(PROJECT_ID, PUBLISH_TOPIC, body, label=label or f"{kind_of(data)} for {data['file_path']}", **attributes)
+
+def publish_manifest(manifest: dict):
+    """Pass a run manifest on to the CI/CD and security agents (the files are the same downstream)."""
+    publish_test_result(manifest, label=f"manifest of run {manifest['run_id']} ({len(manifest['files'])} file(s))")
 
 def log_to_bigquery(result: dict):
-    client = bigquery.Client()
     table_id = f"{PROJECT_ID}.devops_logs.test_results"
     row = {
         "file_path": result["file_path"],
         "language": result["language"],
         "test_output": result["test_output"][:5000],
+        "status": result.get("test_report", {}).get("status"),
+        "test_report": json.dumps(result.get("test_report", {})),
         "deps": ", ".join(result.get("dependencies", [])),
         "review_summary": json.dumps(result.get("review_summary", {})),
         "timestamp": datetime.utcnow().isoformat(),
         "run_id": result.get("run_id", "manual")
     }
-    errors = client.insert_rows_json(table_id, [row])
-    if errors:
-        print("❌ BigQuery insert failed:", errors)
-    else:
-        print("✅ Logged test result to BigQuery.")
+    insert_row(table_id, row)
+    print("✅ Test result queued for BigQuery.")
+
+def strip_code_fence(text: str) -> str:
+    raw = text.strip()
+    if raw.startswith("```"):
+        raw = "\n".join(raw.splitlines()[1:-1]).strip()
+    return raw
+
+def generate_test_code(source_path: str, code: str, language: str, review: dict = None) -> tuple:
+    """Ask Gemini for a test file, one request per chunk when the source exceeds the token budget.
 
-def generate_test_for_file(source_path: str, output_dir: str, root_dir: str, review: dict = None, run_id: str = "manual"):
+    Returns (test code, whether every chunk succeeded).
+    """
+    filename = os.path.basename(source_path)
+    chunks = chunk_source(code, language, CHUNK_TOKEN_BUDGET)
+    if len(chunks) == 1:
+        prompt = build_test_generator_prompt(code, language, filename, review=review)
+        return strip_code_fence(model.generate_text(prompt_budget.finish(prompt))), True
+
+    print(f"🧩 Generating tests for {source_path} in {len(chunks)} chunks")
+
+    def generate_chunk(chunk):
+        chunk_review = dict(review, issues=issues_in_chunk(review.get("issues", []), chunk)) if review else None
+        prompt = build_test_generator_prompt(chunk.text, language, filename, review=chunk_review,
+                                             part=f"lines {chunk.start_line}-{chunk.end_line}")
+        return strip_code_fence(model.generate_text(prompt_budget.finish(prompt)))
+
+    parts = []
+    for chunk, result, error in map_chunks(generate_chunk, chunks, CHUNK_WORKERS):
+        if error is not None:
+            print(f"❌ Test generation failed for lines {chunk.start_line}-{chunk.end_line} of {source_path}: {error}")
+        else:
+            parts.append(result)
+    if not parts:
+        raise RuntimeError(f"all {len(chunks)} chunks failed")
+    merged = merge_python_test_files(parts) if language == "python" else "\n\n".join(parts)
+    return merged, len(parts) == len(chunks)
+
+def prepare_test(source_path: str, output_dir: str, root_dir: str, review: dict = None, run_id: str = "manual",
+                 code: str = None):
+    """Generate (or reuse) the test for a source and write it out with its requirements; None on failure."""
     try:
         print(f"🧪 Generating test for: {source_path} (run_id={run_id})")
-        code = read_local_file(source_path)
+        if code is None:
+            code = read_local_file(source_path)
         language = detect_language_from_extension(source_path)
 
-        prompt = build_test_generator_prompt(code, language, os.path.basename(source_path), review=review)
-        response = model.generate_content(prompt)
-        raw = response.text.strip()
-        if raw.startswith("```"):
-            raw = "\n".join(raw.splitlines()[1:-1]).strip()
-
-        os.makedirs(output_dir, exist_ok=True)
-
-        test_filename = f"test_{os.path.basename(source_path)}"
-        test_path = os.path.join(output_dir, test_filename)
-        root_test_path = os.path.join(root_dir, test_filename)
+        store_key = test_store.key(source_rel_path(source_path, root_dir), code, language, review) if TEST_STORE_ENABLED else None
+        stored = test_store.get(store_key) if store_key and not REGENERATE else None
+        if stored is not None:
+            raw = stored["test_code"]
+            complete, generation_seconds = True, 0.0
+            print(f"♻️ Reusing stored test for {source_path} (unchanged source and review)")
+        else:
+            started = time.perf_counter()
+            raw, complete = generate_test_code(source_path, code, language, review)
+            generation_seconds = time.perf_counter() - started
+            test_store.record_generation()
 
+        test_path, req_path = test_paths_for(source_path, output_dir, root_dir)
+        os.makedirs(os.path.dirname(test_path), exist_ok=True)
         with open(test_path, "w", encoding="utf-8") as f:
             f.write(raw)
 
         print(f"✅ Test saved to: {test_path}")
 
-        deps = extract_python_dependencies(raw, root_dir) if language == "python" else []
+        # The isolated environment has to import both the test and the module under test
+        deps = extract_python_dependencies(raw + "\n" + code, root_dir) if language == "python" else []
         if deps:
-            req_path = os.path.join(output_dir, "requirements.txt")
             write_requirements(deps, req_path)
-            install_dependencies(req_path)
 
-        shutil.copy2(test_path, root_test_path)
-        result = run_test(language, root_test_path)
+        return {
+            "source_path": source_path, "language": language, "code": code, "review": review, "run_id": run_id,
+            "root_dir": root_dir, "raw": raw, "test_path": test_path, "deps": deps, "python_exe": sys.executable,
+            "resolved": [], "stored": stored is not None, "store_key": store_key,
+            "complete": complete and stored is None, "generation_seconds": generation_seconds,
+        }
+
+    except Exception as e:
+        print(f"❌ Test generation failed for {source_path}: {e}")
+        publish_test_result(build_outcome(ERROR, source_path, run_id, "test_generation", e))
+        return None
 
+def finish_test(prepared: dict, run: dict):
+    """Store, publish and log the result of a prepared test's run."""
+    source_path, run_id, language = prepared["source_path"], prepared["run_id"], prepared["language"]
+    try:
+        print(f"🧪 Tests for {source_path}: {run['status']} in {run['duration_seconds']}s")
+        if prepared["store_key"] and prepared["complete"] and run["status"] in STORABLE_STATUSES:
+            test_store.put(prepared["store_key"], source_path, prepared["raw"], prepared["generation_seconds"])
+
+        deps, review, code, stored = prepared["deps"], prepared["review"], prepared["code"], prepared["stored"]
         test_result = {
             "file_path": source_path,
             "language": language,
-            "test_output": result,
+            "test_output": run["output"],
+            "test_run": dict({key: run[key] for key in ("status", "returncode", "duration_seconds")},
+                             reused=stored),
+            "test_report": run["report"],
             "dependencies": deps,
+            "resolved_dependencies": prepared["resolved"],
             "review_summary": review,
+            "code_ref": get_store().put_text(code),
             "run_id": run_id
         }
 
         publish_test_result(test_result)
         log_to_bigquery(test_result)
-
-        if language == "python" and deps:
-            uninstall_dependencies(deps)
-
-        os.remove(root_test_path)
+        return test_result
 
     except Exception as e:
-        print(f"❌ Test generation failed for {source_path}: {e}")
+        print(f"❌ Test run failed for {source_path}: {e}")
+        publish_test_result(build_outcome(ERROR, source_path, run_id, "test_run", e))
+        return None
+
+def generate_test_for_file(source_path: str, output_dir: str, root_dir: str, review: dict = None, run_id: str = "manual",
+                           code: str = None):
+    prepared = prepare_test(source_path, output_dir, root_dir, review=review, run_id=run_id, code=code)
+    return None if prepared is None else finish_test(prepared, run_test(prepared))
 
 def callback(message):
     try:
         print("📥 Received message")
-        data = json.loads(message.data.decode("utf-8"))
+        data = decode_message(message)
+        if kind_of(data) != RESULT:
+            # Manifests and files that failed or were skipped upstream go straight on to the next agents
+            if kind_of(data) == MANIFEST:
+                publish_manifest(data)
+            else:
+                publish_test_result(data)
+            message.ack()
+            return data
         file_path = data["file_path"]
         review_summary = data.get("review_summary", {})
         run_id = data.get("run_id", "manual")
+        code = resolve_code(data)
 
         root_dir = get_git_root()
-        output_dir = os.path.join(os.path.dirname(__file__), "..", "..", "generated_tests")
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = output_dir_for_tests()
 
-        generate_test_for_file(file_path, output_dir, root_dir, review=review_summary, run_id=run_id)
+        generate_test_for_file(file_path, output_dir, root_dir, review=review_summary, run_id=run_id, code=code)
         message.ack()
+        return data
     except Exception as e:
         print(f"❌ Callback error: {e}")
         message.nack()
+        return None
+
+class ActivityTracker:
+    """Counts in-flight messages and remembers when the last one finished."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.processed = 0
+        self.last_activity = time.monotonic()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.last_activity = time.monotonic()
 
-def listen_for_messages():
-    subscriber = pubsub_v1.SubscriberClient()
-    sub_path = subscriber.subscription_path(PROJECT_ID, SUBSCRIPTION_ID)
-    subscriber.subscribe(sub_path, callback=callback)
-    print(f"🔁 Listening on subscription: {SUBSCRIPTION_ID}")
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.processed += 1
+            self.last_activity = time.monotonic()
+
+    def idle_for(self) -> float:
+        with self._lock:
+            return 0.0 if self.in_flight else time.monotonic() - self.last_activity
+
+def listen_for_messages(exit_on_complete: bool = None):
+    """Run the subscriber until a signal arrives, this run's manifest is complete (see below), or it has been
+    idle for IDLE_TIMEOUT_SECONDS.
+
+    At most WORKERS messages run at once, and flow control never leases more
+    messages than there are workers, so nothing waits in memory unprocessed.
+    Completion only ends the listener when RUN_ID was set or `exit_on_complete`
+    is given: a long-running "manual" subscriber would otherwise stop after the
+    first ad-hoc batch.
+    """
+    if exit_on_complete is None:
+        exit_on_complete = run_id_is_explicit()
+    tracker = ActivityTracker()
+    run = RunTracker(current_run_id())
+    stop = threading.Event()
+
+    def tracked_callback(message):
+        tracker.start()
+        try:
+            data = callback(message)
+            if data is not None and run.tracks(data):
+                if kind_of(data) == MANIFEST:
+                    run.add_manifest(data)
+                else:
+                    run.settle(data["file_path"])
+        finally:
+            tracker.finish()
+
+    max_messages = min(MAX_MESSAGES, WORKERS)
+    if MAX_MESSAGES > WORKERS:
+        print(f"⚠️ TEST_GEN_MAX_MESSAGES={MAX_MESSAGES} exceeds TEST_GEN_WORKERS={WORKERS}; leasing at most {WORKERS}.")
+    streaming_pull = subscribe(PROJECT_ID, SUBSCRIPTION_ID, tracked_callback, workers=WORKERS,
+                               max_messages=max_messages, max_bytes=MAX_BYTES, await_callbacks_on_shutdown=True)
+    print(f"🔁 Listening on subscription: {SUBSCRIPTION_ID} ({WORKERS} workers, {TRANSPORT})")
+
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda signum, frame: stop.set())
+
+    # Sleep on the event instead of spinning; wake up once a second to check for idleness
+    while not stop.wait(timeout=1.0):
+        if streaming_pull.done():
+            print("❌ Subscriber stream ended unexpectedly.")
+            break
+        if exit_on_complete and run.complete():
+            break
+        if IDLE_TIMEOUT_SECONDS and tracker.idle_for() >= IDLE_TIMEOUT_SECONDS:
+            print(f"💤 No messages for {IDLE_TIMEOUT_SECONDS:.0f}s, shutting down.")
+            break
+
+    print(f"🛑 Stopping subscriber, waiting for {tracker.in_flight} in-flight message(s)...")
+    streaming_pull.cancel()
     try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        print("🛑 Subscriber stopped.")
+        streaming_pull.result(timeout=SHUTDOWN_TIMEOUT_SECONDS)
+    except Exception:
+        pass
+    streaming_pull.close()
+    flush_publisher()
+    flush_bigquery()
+    run.print_report()
+    print(f"📏 Prompt budget: {prompt_budget.stats()}")
+    print(f"🤖 LLM gateway: {model.stats()}")
+    print_store_stats()
+    print(f"🛑 Subscriber stopped after {tracker.processed} message(s).")
+
+def generate_tests_for_files(paths: list, run_id: str, root_dir: str = None) -> dict:
+    """Generate and run tests for every file in this process; returns counts per test status."""
+    root_dir = root_dir or get_git_root()
+    output_dir = output_dir_for_tests()
+    publish_manifest(build_manifest(run_id, paths, producer="test_generator"))
+    # Generation is bounded by WORKERS model calls at a time; the tests then run together on every runner slot
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        prepared = [item for item in pool.map(
+            lambda path: prepare_test(path, output_dir, root_dir, review={}, run_id=run_id), paths
+        ) if item is not None]
+    results = [finish_test(item, run) for item, run in zip(prepared, run_tests(prepared))]
+    results += [None] * (len(paths) - len(prepared))
+    counts = {}
+    for result in results:
+        status = result["test_run"]["status"] if result else "generation_failed"
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+def handle_daemon_request(request: dict) -> dict:
+    """Generate tests for the files of one daemon request, then flush so its results are delivered."""
+    started = time.perf_counter()
+    counts = generate_tests_for_files(request.get("files", []), request.get("run_id", "manual"),
+                                      root_dir=get_git_root(request.get("cwd")))
+    flush_publisher()
+    flush_bigquery()
+    if TEST_STORE_ENABLED:
+        test_store.save_stats()
+    return {"files": len(request.get("files", [])), "statuses": counts,
+            "seconds": round(time.perf_counter() - started, 2)}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate and run tests for source files, or listen for reviews.")
+    parser.add_argument("files", nargs="*", help="Generate tests for these files instead of listening")
+    parser.add_argument("--files-from", metavar="FILE",
+                        help="Also generate tests for the files listed in FILE, one per line ('-' reads stdin)")
+    parser.add_argument("--serve", metavar="SOCKET", help="Run as a daemon accepting file lists on a Unix socket")
+    parser.add_argument("--submit", metavar="SOCKET", help="Send the files to a daemon started with --serve")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Generate fresh tests even when a stored one matches, and replace the stored ones")
+    parser.add_argument("--invalidate", action="store_true",
+                        help="Drop the stored tests of the given files (all stored tests if none are given) and exit")
+    parser.add_argument("--store-stats", action="store_true", help="Print generated-test store statistics and exit")
+    parser.add_argument("--exit-on-complete", action="store_true", default=None,
+                        help="Stop listening once this run's manifest is complete, even without RUN_ID")
+    args = parser.parse_args()
+    if args.files_from:
+        args.files += [path for path in read_file_list(args.files_from) if path not in args.files]
+    return args
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        run_id = os.getenv("RUN_ID", "manual")
-        root_dir = get_git_root()
-        output_dir = os.path.join(os.path.dirname(__file__), "..", "..", "generated_tests")
-        os.makedirs(output_dir, exist_ok=True)
-        generate_test_for_file(input_file, output_dir, root_dir, review={}, run_id=run_id)
+    args = parse_args()
+    run_id = os.getenv("RUN_ID", "manual")
+    REGENERATE = args.regenerate
+    if args.invalidate:
+        removed = test_store.invalidate(args.files)
+        test_store.save_stats()
+        print(f"🗑️ Dropped {removed} stored test(s){'' if args.files else ' (all)'}.")
+    elif args.store_stats:
+        print(f"🗃️ Test store: {test_store.stats()}")
+    elif args.serve:
+        serve(args.serve, handle_daemon_request, name="test generator")
+    elif args.submit:
+        response = submit(args.submit, {"files": [os.path.abspath(path) for path in args.files],
+                                        "run_id": run_id, "cwd": os.getcwd()})
+        print("✅ Daemon finished:" if response["ok"] else "❌ Daemon failed:",
+              response.get("result", response.get("error")))
+        sys.exit(0 if response["ok"] else 1)
+    elif args.files or args.files_from:
+        print(f"🧪 Test generation: {generate_tests_for_files(args.files, run_id)}")
+        print(f"📏 Prompt budget: {prompt_budget.stats()}")
+        print(f"🤖 LLM gateway: {model.stats()}")
+        print_store_stats()
+        flush_publisher()
+        flush_bigquery()
     else:
-        listen_for_messages()
+        listen_for_messages(exit_on_complete=args.exit_on_complete)
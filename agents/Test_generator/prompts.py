@@ -1,12 +1,20 @@
-import json
+from config import PROMPT_TOKEN_BUDGET, REVIEW_TOKEN_BUDGET
+from shared.prompt_budget import PromptBudget
 
+prompt_budget = PromptBudget("test_generator", PROMPT_TOKEN_BUDGET)
 
-def build_test_generator_prompt(code: str, language: str, filename: str = "", review: dict = None) -> str:
-    review_summary = f"\nHere is the code review summary:\n{json.dumps(review, indent=2)}" if review else ""
+# Part of the generated-test store key: bump whenever the prompt below changes, so stored tests are regenerated
+TEST_PROMPT_VERSION = 1
+
+
+def build_test_generator_prompt(code: str, language: str, filename: str = "", review: dict = None, part: str = None) -> str:
+    review_summary = f"\nHere is the code review summary:\n{prompt_budget.review(review, REVIEW_TOKEN_BUDGET)}" if review else ""
+    source_intro = f"Here is {part} of the source code from file `{filename}`" if part else f"Here is the source code from file `{filename}`"
+    part_rule = "\n- Only test the functions and classes shown in this excerpt; the rest of the file is covered separately" if part else ""
     return f"""
 You are a helpful test-writing assistant. The language is {language}.
 
-Here is the source code from file `{filename}`:
+{source_intro}:
 {code}
 {review_summary}
 
@@ -17,7 +25,7 @@ Please generate a fully working unit test file. Requirements:
 - DO NOT use relative imports like `from .{filename.replace('.py', '')} import ...`
 - DO NOT hallucinate functions or modules — only write tests for what’s explicitly defined in the code
 - Assume this file is in the same directory as the test file
-- Include only executable test code
+- Include only executable test code{part_rule}
 - Respond ONLY with a complete test file, wrapped in triple backticks (```), and nothing else.
 """.strip()
 
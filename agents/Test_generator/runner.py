@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# Stdlib-only script that runs a test module and writes a JSON report
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "harness.py")
+
+# Sets the rlimits in the test interpreter itself and then execs the harness. preexec_fn would do the same
+# between fork and exec, but it is not safe while other threads of the agent are running.
+RLIMIT_WRAPPER = """\
+import os, resource, sys
+cpu_seconds, memory_bytes = int(sys.argv[1]), int(sys.argv[2])
+if cpu_seconds:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+if memory_bytes:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+os.execv(sys.argv[3], sys.argv[3:])
+"""
+
+
+class TestJob(NamedTuple):
+    test_file: str       # generated test module
+    source_dir: str      # directory of the module under test, put on PYTHONPATH
+    python_exe: str = sys.executable
+    extra_paths: tuple = ()
+
+
+class TestRunner:
+    """Runs generated test files in throwaway working directories.
+
+    Each run gets a wall-clock timeout (the whole process group is killed when
+    it expires), CPU-time and address-space rlimits where the OS supports
+    them, and output captured to a file with only the tail kept. Tests run
+    under harness.py, so every result carries a structured per-test report. At most
+    `max_parallel` tests run at once, however many threads submit work.
+    """
+
+    def __init__(self, max_parallel: int = None, timeout: float = 120, cpu_seconds: int = 120,
+                 memory_mb: int = 2048, max_output_bytes: int = 64 * 1024):
+        self.max_parallel = max_parallel or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_output_bytes = max_output_bytes
+        self._slots = threading.BoundedSemaphore(self.max_parallel)
+
+    def _command(self, job: TestJob, test_path: str, report_path: str) -> list:
+        command = [job.python_exe, HARNESS_PATH, test_path, report_path]
+        if os.name != "posix" or resource is None or not (self.cpu_seconds or self.memory_mb):
+            return command
+        return [job.python_exe, "-c", RLIMIT_WRAPPER, str(self.cpu_seconds or 0),
+                str((self.memory_mb or 0) * 1024 * 1024)] + command
+
+    def _read_tail(self, path: str) -> str:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if size > self.max_output_bytes:
+                f.seek(size - self.max_output_bytes)
+            data = f.read()
+        text = data.decode("utf-8", errors="replace")
+        if size > self.max_output_bytes:
+            text = f"[... {size - self.max_output_bytes} bytes of output truncated ...]\n" + text
+        return text
+
+    def run(self, job: TestJob) -> dict:
+        with self._slots:
+            return self._run(job)
+
+    def _run(self, job: TestJob) -> dict:
+        workdir = tempfile.mkdtemp(prefix="gentest-")
+        test_path = os.path.join(workdir, os.path.basename(job.test_file))
+        output_path = os.path.join(workdir, ".output")
+        report_path = os.path.join(workdir, ".report.json")
+        shutil.copy2(job.test_file, test_path)
+
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(
+            [job.source_dir, *job.extra_paths] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+        )
+        popen_kwargs = {"cwd": workdir, "env": env}
+        if os.name == "posix":
+            popen_kwargs["start_new_session"] = True  # own process group, so a timeout kills children too
+
+        started = time.monotonic()
+        status, returncode, report = "error", None, None
+        try:
+            with open(output_path, "wb") as output:
+                proc = subprocess.Popen(self._command(job, test_path, report_path),
+                                        stdout=output, stderr=subprocess.STDOUT, **popen_kwargs)
+                try:
+                    returncode = proc.wait(timeout=self.timeout)
+                    status = "passed" if returncode == 0 else "failed"
+                except subprocess.TimeoutExpired:
+                    self._kill(proc)
+                    returncode = proc.wait()
+                    status = "timeout"
+            output_text = self._read_tail(output_path)
+            report = self._load_report(report_path)
+            if status == "timeout":
+                output_text += f"\n⏱️ Test killed after {self.timeout:.0f}s timeout."
+            elif report is not None:
+                status = report["status"]
+        except OSError as e:
+            output_text = f"❌ Could not run test: {e}"
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        return {
+            "test_file": job.test_file,
+            "status": status,
+            "returncode": returncode,
+            "duration_seconds": round(time.monotonic() - started, 3),
+            "output": output_text,
+            "report": report or self._missing_report(job, status, output_text),
+        }
+
+    @staticmethod
+    def _load_report(path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _missing_report(job: TestJob, status: str, output: str) -> dict:
+        """Report for a run that died before the harness could write one (timeout, crash, rlimit)."""
+        lines = output.strip().splitlines()
+        return {
+            "version": 1,
+            "status": "error",
+            "summary": {"total": 1, "passed": 0, "failed": 0, "error": 1, "skipped": 0},
+            "tests": [{
+                "id": os.path.basename(job.test_file),
+                "status": status if status == "timeout" else "error",
+                "message": lines[-1] if lines else "test process produced no report",
+                "traceback": "\n".join(lines[-15:]),
+            }],
+        }
+
+    @staticmethod
+    def _kill(proc):
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from shared.cache import DiskCache, make_key
+from shared.prompt_budget import review_fields
+
+# A stored test is only kept when the generated module loaded and ran; broken generations are retried next time
+STORABLE_STATUSES = ("passed", "failed")
+STATS_FILE = "stats.json"
+_COUNTERS = ("reused", "generated", "stored", "invalidated", "seconds_saved")
+
+
+class GeneratedTestStore:
+    """Generated test files keyed by everything that shapes their prompt.
+
+    The key covers the source text, its path relative to the repository
+    root (the prompt imports from it, and two files with the same name and
+    text still get their own tests), language, the review fields the prompt embeds, the prompt version,
+    the model and the token budgets. While none of these change, the stored
+    test is re-run instead of being generated again. Entries are only
+    dropped by `invalidate` or by the cache's size and age limits.
+
+    Counters (tests reused and generated, generation time saved) are added
+    to `stats.json` in the store directory by `save_stats`, so they
+    accumulate across runs.
+    """
+
+    def __init__(self, cache: DiskCache, model_name: str, prompt_version, budgets: dict = None):
+        self.cache = cache
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.budgets = budgets or {}
+        self._lock = threading.Lock()
+        self._session = dict.fromkeys(_COUNTERS, 0)
+        self._unsaved = dict.fromkeys(_COUNTERS, 0)
+
+    def _count(self, field: str, amount=1):
+        with self._lock:
+            self._session[field] += amount
+            self._unsaved[field] += amount
+
+    def key(self, rel_path: str, code: str, language: str, review: dict = None) -> str:
+        """`rel_path` is the source path relative to the repository root."""
+        return make_key("generated-test", self.prompt_version, self.model_name, self.budgets, language,
+                        rel_path.replace(os.sep, "/"), code, review_fields(review) if review else None)
+
+    def get(self, key: str):
+        """The stored entry ({"test_code", "generation_seconds"}) for `key`, or None."""
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._count("reused")
+            self._count("seconds_saved", entry.get("generation_seconds", 0.0))
+        return entry
+
+    def put(self, key: str, source_path: str, test_code: str, generation_seconds: float):
+        self.cache.put(key, {"test_code": test_code, "generation_seconds": round(generation_seconds, 3)},
+                       meta={"file_path": os.path.realpath(source_path), "model": self.model_name,
+                             "prompt_version": self.prompt_version})
+        self._count("stored")
+
+    def record_generation(self):
+        self._count("generated")
+
+    def invalidate(self, paths: list = None) -> int:
+        """Drop the stored tests of `paths`, or every stored test when no paths are given."""
+        if not paths:
+            removed = self.cache.clear()
+        else:
+            targets = {os.path.realpath(path) for path in paths}
+            removed = sum(self.cache.delete(key) for key, entry in self.cache.entries()
+                          if entry.get("meta", {}).get("file_path") in targets)
+        self._count("invalidated", removed)
+        return removed
+
+    def _stats_path(self) -> str:
+        return os.path.join(self.cache.directory, STATS_FILE)
+
+    def load_stats(self) -> dict:
+        try:
+            with open(self._stats_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_stats(self):
+        """Add this process's unsaved counters to the persisted totals."""
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, dict.fromkeys(_COUNTERS, 0)
+        if not any(unsaved.values()):
+            return
+        totals = self.load_stats()
+        for field, amount in unsaved.items():
+            totals[field] = round(totals.get(field, 0) + amount, 3)
+        totals["updated_at"] = time.time()
+        os.makedirs(self.cache.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(totals, f, indent=2)
+        os.replace(tmp_path, self._stats_path())
+
+    @staticmethod
+    def _with_rate(counters: dict) -> dict:
+        counters = {field: round(counters.get(field, 0), 3) for field in _COUNTERS}
+        lookups = counters["reused"] + counters["generated"]
+        counters["reuse_rate"] = round(counters["reused"] / lookups, 3) if lookups else 0.0
+        return counters
+
+    def stats(self) -> dict:
+        """This run's counters and the persisted all-time totals (including unsaved counts)."""
+        with self._lock:
+            session, unsaved = dict(self._session), dict(self._unsaved)
+        totals = self.load_stats()
+        return {
+            "run": self._with_rate(session),
+            "total": self._with_rate({field: totals.get(field, 0) + unsaved[field] for field in _COUNTERS}),
+        }
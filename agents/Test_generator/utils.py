@@ -1,5 +1,6 @@
+import ast
 import os
-import requests
+import re
 
 EXTENSION_LANGUAGE_MAP = {
     ".py": "python",
@@ -30,6 +31,7 @@ def read_local_file(filepath: str) -> str:
         return f.read()
 
 def read_remote_file(url: str) -> str:
+    import requests
     response = requests.get(url)
     response.raise_for_status()
     return response.text
@@ -39,4 +41,52 @@ def is_url(path: str) -> bool:
 
 def detect_language_from_extension(filepath: str) -> str:
     _, ext = os.path.splitext(filepath)
-    return EXTENSION_LANGUAGE_MAP.get(ext.lower(), "unknown")
\ No newline at end of file
+    return EXTENSION_LANGUAGE_MAP.get(ext.lower(), "unknown")
+
+def _is_main_guard(node) -> bool:
+    return (
+        isinstance(node, ast.If)
+        and isinstance(node.test, ast.Compare)
+        and isinstance(node.test.left, ast.Name)
+        and node.test.left.id == "__name__"
+    )
+
+def merge_python_test_files(sources: list) -> str:
+    """Merge several generated unittest modules into one.
+
+    Imports are de-duplicated and hoisted, each module's `__main__` guard is
+    dropped in favour of a single one, and clashing top-level class or
+    function names get a `_part<n>` suffix. Sources that do not parse are
+    skipped.
+    """
+    imports, bodies, seen_names = [], [], set()
+    for index, source in enumerate(sources, start=1):
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            print(f"⚠️ Skipping generated test part {index}: {e}")
+            continue
+        lines = source.splitlines()
+        for node in tree.body:
+            start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+            segment = "\n".join(lines[start - 1:node.end_lineno])
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                if segment not in imports:
+                    imports.append(segment)
+                continue
+            if _is_main_guard(node):
+                continue
+            name = getattr(node, "name", None)
+            if name is not None:
+                if name in seen_names:
+                    new_name = f"{name}_part{index}"
+                    segment = re.sub(rf"^(\s*(?:async\s+)?(?:class|def)\s+){re.escape(name)}\b",
+                                     rf"\g<1>{new_name}", segment, count=1, flags=re.MULTILINE)
+                    name = new_name
+                seen_names.add(name)
+            bodies.append(segment)
+
+    if "import unittest" not in imports:
+        imports.insert(0, "import unittest")
+    main_guard = 'if __name__ == "__main__":\n    unittest.main()'
+    return "\n".join(imports) + "\n\n\n" + "\n\n\n".join(bodies) + "\n\n\n" + main_guard + "\n"
@@ -1,11 +1,53 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 # Automatically resolve path to shared .env at root
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.env.local'))
 load_dotenv(dotenv_path=env_path)
 
+# Make agents/shared importable as `shared`
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if AGENTS_DIR not in sys.path:
+    sys.path.append(AGENTS_DIR)
+
 PROJECT_ID = os.getenv("VERTEX_PROJECT_ID")
 LOCATION = os.getenv("VERTEX_LOCATION")
 PUBSUB_TOPIC = os.getenv("PUBSUB_TOPIC")
 
+# Repository discovery: "git" lists files from the index, "walk" scans the filesystem
+DISCOVERY_MODE = os.getenv("REVIEW_DISCOVERY", "git")
+MAX_REVIEW_FILE_KB = int(os.getenv("REVIEW_MAX_FILE_KB", "512"))
+EXTRA_EXCLUDED_DIRS = [d for d in os.getenv("REVIEW_EXCLUDED_DIRS", "").split(",") if d.strip()]
+
+# Incremental review (--base-ref): fall back to a full review when the excerpt covers this share of the file
+INCREMENTAL_FULL_FILE_RATIO = float(os.getenv("REVIEW_INCREMENTAL_FULL_FILE_RATIO", "0.8"))
+
+# Files above this estimated token count are split at function/class boundaries and reviewed in parallel
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "8000"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+# Review prompts are bounded by the chunk budget; this only sets the size tracked as "over budget"
+PROMPT_TOKEN_BUDGET = int(os.getenv("REVIEW_PROMPT_TOKENS", str(CHUNK_TOKEN_BUDGET + 500)))
+
+# Review cache (set REVIEW_CACHE_ENABLED=0 to always call Gemini)
+REVIEW_CACHE_ENABLED = os.getenv("REVIEW_CACHE_ENABLED", "1") != "0"
+REVIEW_CACHE_DIR = os.getenv("REVIEW_CACHE_DIR")
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "5000"))
+REVIEW_CACHE_MAX_MB = int(os.getenv("REVIEW_CACHE_MAX_MB", "200"))
+REVIEW_CACHE_MAX_AGE_DAYS = float(os.getenv("REVIEW_CACHE_MAX_AGE_DAYS", "30"))
+
+# Files from a list (--files-from, several paths, or a daemon request) are reviewed this many at a time
+BATCH_WORKERS = int(os.getenv("REVIEW_BATCH_WORKERS", "4"))
+
+# Packed review (--pack): small files share one request of up to PACK_TOKEN_BUDGET tokens and PACK_MAX_FILES files
+PACK_TOKEN_BUDGET = int(os.getenv("REVIEW_PACK_TOKENS", str(CHUNK_TOKEN_BUDGET)))
+PACK_MAX_FILES = int(os.getenv("REVIEW_PACK_MAX_FILES", "20"))
+PACK_FILE_MAX_TOKENS = int(os.getenv("REVIEW_PACK_FILE_MAX_TOKENS", "2000"))  # larger files are reviewed alone
+
+# Pipelined repo review (main.py --pipeline): workers per stage and queue depth between stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("REVIEW_PIPELINE_QUEUE_SIZE", "32"))
+PIPELINE_READ_WORKERS = int(os.getenv("REVIEW_READ_WORKERS", "4"))
+PIPELINE_PROMPT_WORKERS = int(os.getenv("REVIEW_PROMPT_WORKERS", "2"))
+PIPELINE_LLM_CONCURRENCY = int(os.getenv("REVIEW_LLM_CONCURRENCY", "8"))
+PIPELINE_PARSE_WORKERS = int(os.getenv("REVIEW_PARSE_WORKERS", "2"))
+PIPELINE_PUBLISH_WORKERS = int(os.getenv("REVIEW_PUBLISH_WORKERS", "4"))
@@ -0,0 +1,166 @@
+import ast
+import re
+import subprocess
+import textwrap
+
+from shared.chunking import chunk_source
+from shared.tokens import estimate_tokens
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+CONTEXT_LINES = 3          # around changes that are not inside a Python def/class
+FALLBACK_CONTEXT_LINES = 15  # for languages we cannot parse
+EXCERPT_SEPARATOR = "..."
+
+
+def _git(repo_root: str, *args) -> str:
+    return subprocess.check_output(["git", "-C", repo_root, *args], stderr=subprocess.DEVNULL).decode("utf-8", "replace")
+
+
+def merge_base(repo_root: str, base_ref: str) -> str:
+    return _git(repo_root, "merge-base", base_ref, "HEAD").strip()
+
+
+def changed_files(repo_root: str, base_ref: str) -> list:
+    """Files added or modified since the merge base with `base_ref` (working tree and untracked files included)."""
+    base = merge_base(repo_root, base_ref)
+    output = _git(repo_root, "diff", "--name-only", "--diff-filter=d", base)
+    output += _git(repo_root, "ls-files", "--others", "--exclude-standard")
+    return list(dict.fromkeys(line for line in output.splitlines() if line))
+
+
+def is_untracked(repo_root: str, path: str) -> bool:
+    """Whether `path` is a new file git does not track yet (and does not ignore); it has no diff to review."""
+    return bool(_git(repo_root, "ls-files", "--others", "--exclude-standard", "--", path).strip())
+
+
+def changed_line_ranges(repo_root: str, base_ref: str, path: str) -> list:
+    """(start, end) line ranges in the current file touched since the merge base."""
+    base = merge_base(repo_root, base_ref)
+    diff = _git(repo_root, "diff", "--unified=0", "--no-color", base, "--", path)
+    ranges = []
+    for match in HUNK_HEADER.finditer(diff):
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        if count == 0:
+            # Pure deletion: `start` is the line just before the removed block
+            start = max(start, 1)
+            ranges.append((start, start))
+        else:
+            ranges.append((start, start + count - 1))
+    return ranges
+
+
+def _python_blocks(code: str) -> list:
+    blocks = []
+    for node in ast.walk(ast.parse(code)):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            blocks.append((start, node.end_lineno))
+    return blocks
+
+
+def _merge(ranges: list) -> list:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def expand_to_enclosing_blocks(code: str, language: str, ranges: list) -> list:
+    """Grow each changed range to its innermost enclosing function or class.
+
+    Python is parsed with `ast`; other languages (or files that do not parse)
+    fall back to a fixed number of context lines around each change.
+    """
+    total = max(1, len(code.splitlines()))
+    blocks = None
+    if language == "python":
+        try:
+            blocks = _python_blocks(code)
+        except SyntaxError:
+            blocks = None
+
+    expanded = []
+    for start, end in ranges:
+        if blocks is None:
+            start, end = start - FALLBACK_CONTEXT_LINES, end + FALLBACK_CONTEXT_LINES
+        else:
+            enclosing = [b for b in blocks if b[0] <= start and end <= b[1]]
+            if enclosing:
+                start, end = min(enclosing, key=lambda b: b[1] - b[0])
+            else:
+                # Change spans several blocks or sits at module level: keep every block it touches
+                touched = [b for b in blocks if b[0] <= end and start <= b[1]]
+                start = min([start - CONTEXT_LINES] + [b[0] for b in touched])
+                end = max([end + CONTEXT_LINES] + [b[1] for b in touched])
+        expanded.append((max(1, start), min(total, end)))
+    return _merge(expanded)
+
+
+def split_ranges(code: str, language: str, ranges: list, max_tokens: int) -> list:
+    """Group excerpt ranges into batches of at most ~`max_tokens`, each reviewed on its own.
+
+    A block larger than the budget is cut at its inner definitions with
+    `shared.chunking` (by lines as a last resort).
+    """
+    lines = code.splitlines()
+    pieces = []
+    for start, end in ranges:
+        text = "\n".join(lines[start - 1:end])
+        if estimate_tokens(text) <= max_tokens:
+            pieces.append((start, end, estimate_tokens(text)))
+            continue
+        # Dedented, so a method parses on its own; line numbers are unchanged
+        for chunk in chunk_source(textwrap.dedent(text), language, max_tokens):
+            pieces.append((start + chunk.start_line - 1, start + chunk.end_line - 1, estimate_tokens(chunk.text)))
+
+    groups, current, used = [], [], 0
+    for start, end, tokens in pieces:
+        if current and used + tokens > max_tokens:
+            groups.append(_merge(current))
+            current, used = [], 0
+        current.append((start, end))
+        used += tokens
+    if current:
+        groups.append(_merge(current))
+    return groups
+
+
+def build_excerpt(code: str, ranges: list):
+    """Join the selected line ranges into one excerpt.
+
+    Returns (excerpt, line_map) where line_map[i] is the real file line of
+    excerpt line i + 1, or None for the separators between ranges.
+    """
+    lines = code.splitlines()
+    excerpt, line_map = [], []
+    for start, end in ranges:
+        if excerpt:
+            excerpt.append(EXCERPT_SEPARATOR)
+            line_map.append(None)
+        for number in range(start, end + 1):
+            excerpt.append(lines[number - 1])
+            line_map.append(number)
+    return "\n".join(excerpt), line_map
+
+
+def excerpt_lines_for(ranges: list, line_map: list) -> list:
+    """Excerpt line numbers (1-based) of the lines that actually changed."""
+    changed = set()
+    for start, end in ranges:
+        changed.update(range(start, end + 1))
+    return [i + 1 for i, real in enumerate(line_map) if real in changed]
+
+
+def remap_issue_lines(review: dict, line_map: list) -> dict:
+    """Rewrite issue `line` values from excerpt positions to real file positions."""
+    for issue in review.get("issues", []):
+        try:
+            index = int(issue.get("line")) - 1
+        except (TypeError, ValueError):
+            continue
+        issue["line"] = line_map[index] if 0 <= index < len(line_map) else None
+    return review
@@ -1,89 +1,489 @@
+import argparse
 import subprocess
 import os
 import json
-import sys
-from vertexai import init
-from vertexai.preview.generative_models import GenerativeModel
-from google.cloud import pubsub_v1
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from utils import read_local_file, detect_language_from_extension
-from prompts import build_code_review_prompt
-from config import PROJECT_ID, LOCATION, PUBSUB_TOPIC
+from prompts import build_code_review_prompt, build_incremental_review_prompt, build_packed_review_prompt, prompt_budget
+from config import (
+    PROJECT_ID, LOCATION, PUBSUB_TOPIC,
+    REVIEW_CACHE_ENABLED, REVIEW_CACHE_DIR, REVIEW_CACHE_MAX_ENTRIES, REVIEW_CACHE_MAX_MB, REVIEW_CACHE_MAX_AGE_DAYS,
+    PIPELINE_QUEUE_SIZE, PIPELINE_READ_WORKERS, PIPELINE_PROMPT_WORKERS, PIPELINE_LLM_CONCURRENCY,
+    PIPELINE_PARSE_WORKERS, PIPELINE_PUBLISH_WORKERS, DISCOVERY_MODE, MAX_REVIEW_FILE_KB, EXTRA_EXCLUDED_DIRS,
+    INCREMENTAL_FULL_FILE_RATIO, CHUNK_TOKEN_BUDGET, CHUNK_WORKERS, BATCH_WORKERS,
+    PACK_TOKEN_BUDGET, PACK_MAX_FILES, PACK_FILE_MAX_TOKENS,
+)
+from diff_review import (
+    changed_files, changed_line_ranges, expand_to_enclosing_blocks, build_excerpt, excerpt_lines_for, remap_issue_lines,
+    is_untracked, split_ranges,
+)
+from pipeline import Stage, run_pipeline, print_pipeline_summary
+from packing import make_packed_files, pack_files, split_packed_response
+from shared.cache import CACHE_ROOT, DiskCache, make_key
+from shared.llm_gateway import get_gateway
+from shared.chunking import chunk_source, file_issue_lines, map_chunks
+from shared.tokens import estimate_tokens
+from shared.blob_store import get_store
+from shared.publisher import publish, flush as flush_publisher
+from shared.discovery import DEFAULT_EXCLUDED_DIRS, iter_source_files as discover_source_files, read_file_list
+from shared.daemon import serve, submit
+from shared.codec import encode
+from shared.manifest import ERROR, SKIPPED, build_manifest, build_outcome, current_run_id
 
 SUPPORTED_EXTENSIONS = [".py", ".js", ".ts", ".java", ".cpp", ".c", ".go", ".sh", ".sql", ".jsx", ".tsx"]
+# The agents never review their own sources
+EXCLUDED_DIRS = DEFAULT_EXCLUDED_DIRS | {"agents"} | set(EXTRA_EXCLUDED_DIRS)
+MODEL_NAME = "gemini-2.0-flash-lite-001"
 
-# Initialize Gemini
-init(project=PROJECT_ID, location=LOCATION)
-model = GenerativeModel("gemini-2.0-flash-lite-001")
+# Gemini, behind the shared gateway (adaptive concurrency, retries, JSON re-asks)
+model = get_gateway("code_review", MODEL_NAME, PROJECT_ID, LOCATION)
 
-def get_git_root() -> str:
+# Reviews are keyed by the exact prompt (code, language and template) plus the model
+review_cache = DiskCache(
+    REVIEW_CACHE_DIR or os.path.join(CACHE_ROOT, "code_review"),
+    max_entries=REVIEW_CACHE_MAX_ENTRIES,
+    max_bytes=REVIEW_CACHE_MAX_MB * 1024 * 1024,
+    max_age_seconds=REVIEW_CACHE_MAX_AGE_DAYS * 24 * 3600,
+)
+_state_lock = threading.Lock()
+# Last published review, for local debugging; kept with the caches instead of in the working directory
+STATE_PATH = os.path.join(CACHE_ROOT, "agent_state.json")
+RUN_ID = current_run_id()
+
+def get_git_root(cwd: str = None) -> str:
     """Return the top-level directory of the git repository."""
     try:
-        root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], stderr=subprocess.DEVNULL)
+        root = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], cwd=cwd, stderr=subprocess.DEVNULL)
         return root.decode("utf-8").strip()
     except subprocess.CalledProcessError:
         raise RuntimeError("❌ Not inside a Git repository.")
 
-def publish_to_pubsub(data: dict):
-    """Publish the review result to Google Cloud Pub/Sub."""
-    publisher = pubsub_v1.PublisherClient()
-    topic_path = publisher.topic_path(PROJECT_ID, PUBSUB_TOPIC)
-    message = json.dumps(data).encode("utf-8")
-    future = publisher.publish(topic_path, data=message)
-    print(f"📬 Published review to Pub/Sub (message ID: {future.result()})")
+def publish_to_pubsub(data: dict, label: str = None):
+    """Queue the review result on the shared Pub/Sub publisher (delivery is confirmed by flush)."""
+    body, attributes = encode(data)
+    publish(PROJECT_ID, PUBSUB_TOPIC, body, label=label or f"review of {data['file_path']}", **attributes)
+
+def publish_manifest(files: list, run_id: str = RUN_ID):
+    """Announce every file this run will publish a message for, so consumers know when they are done."""
+    publish_to_pubsub(build_manifest(run_id, files, producer="code_review"),
+                      label=f"manifest of run {run_id} ({len(files)} file(s))")
+
+def publish_outcome(kind: str, source_path: str, reason, run_id: str = RUN_ID):
+    """Settle a manifest entry that produced no review (an ERROR or a SKIPPED file)."""
+    publish_to_pubsub(build_outcome(kind, source_path, run_id, "code_review", reason),
+                      label=f"{kind} for {source_path}")
+
+def parse_review_response(text: str) -> dict:
+    """Strip an optional ```json fence and parse the model's review JSON."""
+    cleaned_text = text.strip()
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text.removeprefix("```json").removesuffix("```").strip()
+    return json.loads(cleaned_text)
+
+def lookup_cached_review(prompt: str):
+    if not REVIEW_CACHE_ENABLED:
+        return None
+    return review_cache.get(make_key(MODEL_NAME, prompt))
+
+def store_review(prompt: str, parsed_json: dict, label: str):
+    if REVIEW_CACHE_ENABLED:
+        review_cache.put(make_key(MODEL_NAME, prompt), parsed_json, meta={"file_path": label, "model": MODEL_NAME})
+
+def review_prompt(prompt: str, label: str) -> dict:
+    """Return the parsed review for a prompt, calling Gemini only on a cache miss."""
+    cached = lookup_cached_review(prompt)
+    if cached is not None:
+        print(f"\n♻️ Reusing cached review for {label}")
+        return cached
+
+    parsed_json = model.generate_json(prompt_budget.finish(prompt), parse=parse_review_response)
+
+    print(f"\n📄 Review Output for {label}:")
+    print(json.dumps(parsed_json, indent=2))
+
+    store_review(prompt, parsed_json, label)
+    return parsed_json
+
+def print_cache_stats():
+    if REVIEW_CACHE_ENABLED:
+        review_cache.prune()
+        print(f"♻️ Review cache: {review_cache.stats()}")
+    print(f"📏 Prompt budget: {prompt_budget.stats()}")
+    print(f"🤖 LLM gateway: {model.stats()}")
+
+def review_chunks(source_path: str, language: str, chunks: list) -> dict:
+    """Review each chunk in parallel and merge the results with file-relative line numbers."""
+    def review_chunk(chunk):
+        part = f"lines {chunk.start_line}-{chunk.end_line}"
+        prompt = build_code_review_prompt(chunk.text, language, part=part)
+        return review_prompt(prompt, f"{source_path} ({part})")
 
-def review_code(source_path: str):
+    issues, summaries, failed = [], [], []
+    for chunk, result, error in map_chunks(review_chunk, chunks, CHUNK_WORKERS):
+        if error is not None:
+            print(f"❌ Chunk {chunk.start_line}-{chunk.end_line} of {source_path} failed:", error)
+            failed.append({"start_line": chunk.start_line, "end_line": chunk.end_line, "error": str(error)})
+            continue
+        issues.extend(file_issue_lines(result.get("issues", []), chunk))
+        if result.get("summary"):
+            summaries.append(f"Lines {chunk.start_line}-{chunk.end_line}: {result['summary']}")
+
+    if len(failed) == len(chunks):
+        raise RuntimeError(f"all {len(chunks)} chunks failed")
+    merged = {"issues": issues, "summary": "\n".join(summaries)}
+    if failed:
+        merged["failed_chunks"] = failed
+    return merged
+
+def review_source(source_path: str, code: str, language: str) -> dict:
+    """Review a whole file, splitting it at function/class boundaries when it exceeds the token budget."""
+    chunks = chunk_source(code, language, CHUNK_TOKEN_BUDGET)
+    if len(chunks) > 1:
+        print(f"🧩 Splitting {source_path} into {len(chunks)} chunks")
+        return review_chunks(source_path, language, chunks)
+    return review_prompt(build_code_review_prompt(code, language), source_path)
+
+def review_code(source_path: str, run_id: str = RUN_ID):
     try:
         code = read_local_file(source_path)
         language = detect_language_from_extension(source_path)
-        prompt = build_code_review_prompt(code, language)
-        response = model.generate_content(prompt)
+        parsed_json = review_source(source_path, code, language)
+        publish_review(source_path, language, code, parsed_json, run_id=run_id)
+
+    except Exception as e:
+        print(f"❌ Error reviewing {source_path}:", e)
+        publish_outcome(ERROR, source_path, e, run_id)
 
-        print(f"\n📄 Review Output for {source_path}:")
-        print(response.text)
+def review_excerpt(source_path: str, code: str, language: str, ranges: list, changed: list) -> dict:
+    """Review one excerpt of `ranges`, with issue lines mapped back to the file."""
+    excerpt, line_map = build_excerpt(code, ranges)
+    prompt = build_incremental_review_prompt(
+        excerpt, language, os.path.basename(source_path), excerpt_lines_for(changed, line_map)
+    )
+    return remap_issue_lines(review_prompt(prompt, source_path), line_map)
 
-        cleaned_text = response.text.strip()
-        if cleaned_text.startswith("```json"):
-            cleaned_text = cleaned_text.removeprefix("```json").removesuffix("```").strip()
+def review_excerpt_groups(source_path: str, code: str, language: str, groups: list, changed: list) -> dict:
+    """Review excerpt groups that together exceed the token budget in parallel, and merge the results."""
+    issues, summaries, failed = [], [], []
+    for group, result, error in map_chunks(
+        lambda ranges: review_excerpt(source_path, code, language, ranges, changed), groups, CHUNK_WORKERS
+    ):
+        start_line, end_line = group[0][0], group[-1][1]
+        if error is not None:
+            print(f"❌ Excerpt {start_line}-{end_line} of {source_path} failed:", error)
+            failed.append({"start_line": start_line, "end_line": end_line, "error": str(error)})
+            continue
+        issues.extend(result.get("issues", []))
+        if result.get("summary"):
+            summaries.append(f"Lines {start_line}-{end_line}: {result['summary']}")
 
-        parsed_json = json.loads(cleaned_text)
+    if len(failed) == len(groups):
+        raise RuntimeError(f"all {len(groups)} excerpts failed")
+    merged = {"issues": issues, "summary": "\n".join(summaries)}
+    if failed:
+        merged["failed_chunks"] = failed
+    return merged
 
-        review_result = {
-            "file_path": source_path,
-            "language": language,
-            "code": code,
-            "review_summary": parsed_json
-        }
+def review_changes(source_path: str, base_ref: str, repo_root: str, run_id: str = RUN_ID):
+    """Review only the lines changed since `base_ref`, plus their enclosing function or class."""
+    try:
+        code = read_local_file(source_path)
+        language = detect_language_from_extension(source_path)
+        changed = changed_line_ranges(repo_root, base_ref, os.path.abspath(source_path))
+        if not changed and is_untracked(repo_root, os.path.abspath(source_path)):
+            # A new file has no diff yet: every line of it is a change
+            print(f"🆕 {source_path} is new, reviewing all of it")
+            review_code(source_path, run_id)
+            return
+        if not changed:
+            print(f"⏭️ No changes in {source_path} since {base_ref}, skipping.")
+            publish_outcome(SKIPPED, source_path, f"no changes since {base_ref}", run_id)
+            return
 
-        # Save state
-        with open("agent_state.json", "w") as f:
-            json.dump({"last_review": review_result}, f, indent=2)
+        ranges = expand_to_enclosing_blocks(code, language, changed)
+        excerpt, line_map = build_excerpt(code, ranges)
+        if len(line_map) >= INCREMENTAL_FULL_FILE_RATIO * max(1, len(code.splitlines())):
+            # Most of the file changed: a full review costs about the same and shares the cache
+            review_code(source_path, run_id)
+            return
 
-        # Publish to Pub/Sub
-        publish_to_pubsub(review_result)
+        groups = split_ranges(code, language, ranges, CHUNK_TOKEN_BUDGET)
+        print(f"✂️ Reviewing {len(line_map)} of {len(code.splitlines())} lines of {source_path}"
+              + (f" in {len(groups)} excerpts" if len(groups) > 1 else ""))
+        if len(groups) == 1:
+            parsed_json = review_excerpt(source_path, code, language, ranges, changed)
+        else:
+            parsed_json = review_excerpt_groups(source_path, code, language, groups, changed)
+        publish_review(source_path, language, code, parsed_json,
+                       review_scope={"base_ref": base_ref, "ranges": ranges}, run_id=run_id)
 
     except Exception as e:
-        print(f"❌ Error reviewing {source_path}:", e)
+        print(f"❌ Error reviewing changes in {source_path}:", e)
+        publish_outcome(ERROR, source_path, e, run_id)
+
+def review_changed_files(repo_root: str, base_ref: str, run_id: str = RUN_ID):
+    paths = [os.path.join(repo_root, rel_path) for rel_path in changed_files(repo_root, base_ref)
+             if any(rel_path.endswith(ext) for ext in SUPPORTED_EXTENSIONS)]
+    publish_manifest(paths, run_id)
+    for path in paths:
+        review_changes(path, base_ref, repo_root, run_id)
+
+def review_files(paths: list, base_ref: str = None, repo_root: str = None, run_id: str = RUN_ID):
+    """Review a list of files in this process, BATCH_WORKERS at a time, sharing the model, caches and publisher."""
+    if base_ref and repo_root is None:
+        repo_root = get_git_root()
+    publish_manifest(paths, run_id)
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        futures = {}
+        for path in paths:
+            if base_ref:
+                futures[pool.submit(review_changes, path, base_ref, repo_root, run_id)] = [path]
+            else:
+                futures[pool.submit(review_code, path, run_id)] = [path]
+        settle_futures(futures, run_id)
+
+def settle_futures(futures: dict, run_id: str = RUN_ID):
+    """Wait for `{future: [paths]}`; paths whose worker raised past its own handling still get an ERROR outcome."""
+    for future, paths in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            for path in paths:
+                print(f"❌ Error reviewing {path}:", e)
+                try:
+                    publish_outcome(ERROR, path, e, run_id)
+                except Exception as publish_error:
+                    print(f"❌ Could not publish the error outcome for {path}:", publish_error)
+
+# --- Packed mode: several small files share one review request ---
+
+def review_pack(pack: list, run_id: str = RUN_ID):
+    """Review a pack of small files in one request and publish each file's review on its own.
 
-def review_all_code_in_repo(repo_root: str):
-    for root, dirs, files in os.walk(repo_root):
-        # Skip any folder that contains 'agents' in its path
-        if "agents" in root.split(os.sep):
+    Files whose section of the answer is missing or malformed (every file,
+    if the whole request fails) are retried with a single-file review. The
+    answer is cached under the packed prompt only: it was not written for any
+    single-file prompt, so it must never be served as one.
+    """
+    reviews, failed = {}, list(pack)
+    if len(pack) > 1:
+        try:
+            parsed = review_prompt(build_packed_review_prompt(pack), f"pack of {len(pack)} files")
+            reviews, failed = split_packed_response(parsed, pack)
+            print(f"📦 Reviewed {len(reviews)} of {len(pack)} packed files in one request")
+        except Exception as e:
+            print(f"❌ Packed review of {len(pack)} files failed:", e)
+    for packed in pack:
+        if packed.path in reviews:
+            publish_review(packed.path, packed.language, packed.code, reviews[packed.path], run_id=run_id)
+    for packed in failed:
+        if len(pack) > 1:
+            print(f"🔁 Retrying {packed.path} on its own")
+        try:
+            review = review_source(packed.path, packed.code, packed.language)
+            publish_review(packed.path, packed.language, packed.code, review, run_id=run_id)
+        except Exception as e:
+            print(f"❌ Error reviewing {packed.path}:", e)
+            publish_outcome(ERROR, packed.path, e, run_id)
+
+def review_files_packed(paths: list, run_id: str = RUN_ID):
+    """Review `paths`, packing small uncached files into shared requests; large files are reviewed alone."""
+    paths = list(dict.fromkeys(paths))
+    publish_manifest(paths, run_id)
+    small, alone = [], []
+    for path in paths:
+        try:
+            code = read_local_file(path)
+            language = detect_language_from_extension(path)
+        except Exception as e:
+            print(f"❌ Error reviewing {path}:", e)
+            publish_outcome(ERROR, path, e, run_id)
             continue
+        cached = lookup_cached_review(build_code_review_prompt(code, language))
+        if cached is not None:
+            print(f"♻️ Reusing cached review for {path}")
+            publish_review(path, language, code, cached, run_id=run_id)
+        elif estimate_tokens(code) > PACK_FILE_MAX_TOKENS:
+            alone.append(path)
+        else:
+            small.append((path, language, code))
+
+    packs = pack_files(make_packed_files(small), PACK_TOKEN_BUDGET, PACK_MAX_FILES)
+    print(f"📦 Packed {len(small)} small file(s) into {len(packs)} request(s); {len(alone)} reviewed alone")
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        futures = {}
+        for pack in packs:
+            futures[pool.submit(review_pack, pack, run_id)] = [packed.path for packed in pack]
+        for path in alone:
+            futures[pool.submit(review_code, path, run_id)] = [path]
+        settle_futures(futures, run_id)
+
+def publish_review(source_path: str, language: str, code: str, review_summary: dict, review_scope: dict = None,
+                   run_id: str = RUN_ID):
+    # Claim check: the message carries a digest, subscribers fetch the code from the blob store
+    review_result = {
+        "file_path": source_path,
+        "language": language,
+        "code_ref": get_store().put_text(code),
+        "review_summary": review_summary,
+        "run_id": run_id,
+    }
+    if review_scope:
+        review_result["review_scope"] = review_scope
+
+    # Save state
+    os.makedirs(CACHE_ROOT, exist_ok=True)
+    with _state_lock, open(STATE_PATH, "w") as f:
+        json.dump({"last_review": review_result}, f, indent=2)
+
+    # Publish to Pub/Sub
+    publish_to_pubsub(review_result)
 
-        for file in files:
-            if any(file.endswith(ext) for ext in SUPPORTED_EXTENSIONS):
-                full_path = os.path.join(root, file)
-                review_code(full_path)
+def iter_source_files(repo_root: str):
+    """Yield reviewable files, honoring .gitignore/.agentignore and skipping binary or oversized files."""
+    return discover_source_files(
+        repo_root,
+        SUPPORTED_EXTENSIONS,
+        excluded_dirs=EXCLUDED_DIRS,
+        max_bytes=MAX_REVIEW_FILE_KB * 1024,
+        use_git=DISCOVERY_MODE == "git",
+    )
+
+def review_all_code_in_repo(repo_root: str, run_id: str = RUN_ID):
+    paths = list(iter_source_files(repo_root))
+    publish_manifest(paths, run_id)
+    for full_path in paths:
+        review_code(full_path, run_id)
+
+# --- Pipelined mode: discover -> read -> prompt -> llm -> parse -> publish ---
+
+def _read_stage(job: dict) -> dict:
+    job["language"] = detect_language_from_extension(job["file_path"])
+    job["code"] = read_local_file(job["file_path"])
+    return job
+
+def _prompt_stage(job: dict) -> dict:
+    chunks = chunk_source(job["code"], job["language"], CHUNK_TOKEN_BUDGET)
+    if len(chunks) > 1:
+        job["chunks"] = chunks  # reviewed chunk by chunk in the llm stage
+        return job
+    job["prompt"] = build_code_review_prompt(job["code"], job["language"])
+    cached = lookup_cached_review(job["prompt"])
+    if cached is not None:
+        print(f"♻️ Reusing cached review for {job['file_path']}")
+        job["review_summary"] = cached
+    return job
+
+def _llm_stage(job: dict) -> dict:
+    if "chunks" in job:
+        job["review_summary"] = review_chunks(job["file_path"], job["language"], job["chunks"])
+    elif "review_summary" not in job:
+        job["review_summary"] = model.generate_json(prompt_budget.finish(job["prompt"]), parse=parse_review_response)
+        job["fresh"] = True
+    return job
+
+def _parse_stage(job: dict) -> dict:
+    if job.get("fresh"):
+        store_review(job["prompt"], job["review_summary"], job["file_path"])
+        print(f"📄 Reviewed {job['file_path']}")
+    return job
+
+def _publish_stage(job: dict) -> dict:
+    publish_review(job["file_path"], job["language"], job["code"], job["review_summary"], run_id=job["run_id"])
+    return job
+
+def _on_stage_error(stage: str, job: dict, error: Exception):
+    publish_outcome(ERROR, job["file_path"], f"{stage}: {error}", job["run_id"])
+
+def review_repo_pipelined(repo_root: str, paths: list = None, run_id: str = RUN_ID):
+    """Review the repo (or just `paths`) with bounded queues and concurrent workers between each stage."""
+    stages = [
+        Stage("read", _read_stage, PIPELINE_READ_WORKERS),
+        Stage("prompt", _prompt_stage, PIPELINE_PROMPT_WORKERS),
+        Stage("llm", _llm_stage, PIPELINE_LLM_CONCURRENCY),
+        Stage("parse", _parse_stage, PIPELINE_PARSE_WORKERS),
+        Stage("publish", _publish_stage, PIPELINE_PUBLISH_WORKERS),
+    ]
+    started = time.perf_counter()
+    # Discovery is cheap next to the reviews, and the manifest has to list every file up front
+    paths = list(paths) if paths is not None else list(iter_source_files(repo_root))
+    publish_manifest(paths, run_id)
+    source = ({"file_path": path, "run_id": run_id} for path in paths)
+    summaries = run_pipeline(source, stages, queue_size=PIPELINE_QUEUE_SIZE, on_error=_on_stage_error)
+    print_pipeline_summary(summaries, time.perf_counter() - started)
+
+def handle_daemon_request(request: dict) -> dict:
+    """Review the files of one daemon request; the model, caches and publisher stay warm between requests."""
+    paths = request.get("files", [])
+    base_ref = request.get("base_ref")
+    repo_root = get_git_root(request.get("cwd")) if base_ref else None
+    started = time.perf_counter()
+    if request.get("pack") and not base_ref:
+        review_files_packed(paths, run_id=request.get("run_id", RUN_ID))
+    else:
+        review_files(paths, base_ref=base_ref, repo_root=repo_root, run_id=request.get("run_id", RUN_ID))
+    flush_publisher()
+    return {"files": len(paths), "seconds": round(time.perf_counter() - started, 2), "cache": review_cache.stats()}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Review source files with Gemini and publish the results.")
+    parser.add_argument("source_paths", nargs="*", help="Review these files instead of the whole repository")
+    parser.add_argument("--files-from", metavar="FILE",
+                        help="Also review the files listed in FILE, one per line ('-' reads stdin)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Review the repository (or the given files) with the concurrent staged pipeline")
+    parser.add_argument("--pack", action="store_true",
+                        help="Review small files several per request (full reviews only, not with --base-ref)")
+    parser.add_argument("--base-ref", help="Only review hunks changed since this git ref (e.g. origin/main)")
+    parser.add_argument("--serve", metavar="SOCKET", help="Run as a daemon accepting review requests on a Unix socket")
+    parser.add_argument("--submit", metavar="SOCKET", help="Send the files to a daemon started with --serve")
+    args = parser.parse_args()
+    args.files = list(args.source_paths)
+    if args.files_from:
+        args.files += [path for path in read_file_list(args.files_from) if path not in args.files]
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve(args.serve, handle_daemon_request, name="code review")
+        raise SystemExit(0)
+    if args.submit:
+        response = submit(args.submit, {"files": [os.path.abspath(path) for path in args.files],
+                                        "base_ref": args.base_ref, "cwd": os.getcwd(), "run_id": RUN_ID,
+                                        "pack": args.pack})
+        print("✅ Daemon finished:" if response["ok"] else "❌ Daemon failed:",
+              response.get("result", response.get("error")))
+        raise SystemExit(0 if response["ok"] else 1)
+    if args.pack and args.base_ref:
+        print("⚠️ --pack only applies to full reviews; reviewing changed hunks one file at a time.")
     try:
-        if len(sys.argv) > 1:
-            review_code(sys.argv[1])
+        if args.pack and not args.base_ref:
+            review_files_packed(args.files if args.files or args.files_from else list(iter_source_files(get_git_root())))
+        elif args.files or args.files_from:
+            if args.pipeline and not args.base_ref:
+                review_repo_pipelined(get_git_root(), paths=args.files)
+            else:
+                review_files(args.files, base_ref=args.base_ref)
+        elif args.base_ref:
+            review_changed_files(get_git_root(), args.base_ref)
         else:
             repo_root = get_git_root()
-            review_all_code_in_repo(repo_root)
-        print("✅ Code review completed.")
+            if args.pipeline:
+                review_repo_pipelined(repo_root)
+            else:
+                review_all_code_in_repo(repo_root)
     except Exception as e:
-        print(e)
-        print("❌ Please ensure you are running this script inside a Git repository.")
-
+        print(f"❌ Code review failed: {type(e).__name__}: {e}")
+        failed = True
+    else:
+        failed = False
+    finally:
+        # Reviews published before a failure are still delivered
+        print_cache_stats()
+        flush_publisher()
+    if failed:
+        raise SystemExit(1)
+    print("✅ Code review completed.")
@@ -0,0 +1,62 @@
+from typing import NamedTuple
+
+from shared.tokens import estimate_tokens
+
+# Tokens of the <file id=... path=... language=...> wrapper around each packed file
+TAG_OVERHEAD_TOKENS = 30
+
+
+class PackedFile(NamedTuple):
+    file_id: str        # tag the model uses to key its answer, e.g. "F3"
+    path: str
+    language: str
+    code: str
+    tokens: int
+
+
+def make_packed_files(files: list) -> list:
+    """Tag `(path, language, code)` tuples with IDs and their estimated token counts."""
+    return [PackedFile(f"F{index}", path, language, code, estimate_tokens(code))
+            for index, (path, language, code) in enumerate(files, start=1)]
+
+
+def pack_files(files: list, budget_tokens: int, max_files: int, overhead_tokens: int = TAG_OVERHEAD_TOKENS) -> list:
+    """First-fit-decreasing bin packing of PackedFiles into requests of at most `budget_tokens`.
+
+    Each file costs its own tokens plus `overhead_tokens` for its tag. A file
+    larger than the budget gets a request to itself.
+    """
+    bins = []  # [used_tokens, [files]]
+    for packed in sorted(files, key=lambda f: f.tokens, reverse=True):
+        cost = packed.tokens + overhead_tokens
+        for entry in bins:
+            if entry[0] + cost <= budget_tokens and len(entry[1]) < max_files:
+                entry[0] += cost
+                entry[1].append(packed)
+                break
+        else:
+            bins.append([cost, [packed]])
+    return [entry[1] for entry in bins]
+
+
+def _valid_review(review) -> bool:
+    return isinstance(review, dict) and isinstance(review.get("issues", []), list) and "summary" in review
+
+
+def split_packed_response(parsed, files: list) -> tuple:
+    """Per-file reviews from a packed response, plus the files whose section was missing or malformed.
+
+    `parsed` is the decoded JSON: {"files": {"<file_id>": {"issues": [...], "summary": "..."}}}.
+    Returns ({path: review}, [PackedFile, ...]).
+    """
+    sections = parsed.get("files") if isinstance(parsed, dict) else None
+    if not isinstance(sections, dict):
+        return {}, list(files)
+    reviews, failed = {}, []
+    for packed in files:
+        review = sections.get(packed.file_id)
+        if _valid_review(review):
+            reviews[packed.path] = {"issues": review.get("issues", []), "summary": review["summary"]}
+        else:
+            failed.append(packed)
+    return reviews, failed
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Stage:
+    """One pipeline step. `func(item)` returns the item for the next stage, or None to drop it."""
+
+    def __init__(self, name: str, func, workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.latencies = []
+        self.errors = 0
+        self.dropped = 0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+
+    def record(self, start: float, end: float, error: bool = False, dropped: bool = False):
+        with self._lock:
+            self.latencies.append(end - start)
+            self.errors += error
+            self.dropped += dropped
+            if self.first_start is None or start < self.first_start:
+                self.first_start = start
+            if self.last_end is None or end > self.last_end:
+                self.last_end = end
+
+    def summary(self) -> dict:
+        elapsed = (self.last_end - self.first_start) if self.latencies else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": len(self.latencies),
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "throughput_per_s": round(len(self.latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+        }
+
+
+def _label(item) -> str:
+    return item.get("file_path", "?") if isinstance(item, dict) else str(item)
+
+
+def run_pipeline(source, stages: list, queue_size: int = 64, source_name: str = "discover", on_error=None) -> list:
+    """Run items from the `source` iterable through `stages`, each in its own worker threads.
+
+    Stages are connected by bounded queues, so a slow stage blocks the ones
+    upstream of it instead of letting work pile up in memory. An item whose
+    stage raises is dropped after `on_error(stage_name, item, error)`.
+    Returns one summary dict per stage (source first).
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    source_stats = StageStats(source_name, 1)
+    all_stats = [StageStats(stage.name, stage.workers) for stage in stages]
+    threads = []
+
+    def feed():
+        iterator = iter(source)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            except Exception as e:
+                print(f"❌ {source_name} failed: {e}")
+                source_stats.record(start, time.perf_counter(), error=True)
+                break
+            source_stats.record(start, time.perf_counter())
+            queues[0].put(item)
+        for _ in range(stages[0].workers):
+            queues[0].put(_DONE)
+
+    def work(index: int, remaining: list, lock: threading.Lock):
+        stage, stats = stages[index], all_stats[index]
+        in_q = queues[index]
+        out_q = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+                error = False
+            except Exception as e:
+                print(f"❌ {stage.name} failed for {_label(item)}: {e}")
+                result, error = None, True
+                if on_error is not None:
+                    try:
+                        on_error(stage.name, item, e)
+                    except Exception as hook_error:
+                        print(f"❌ Error handler failed for {_label(item)}: {hook_error}")
+            stats.record(start, time.perf_counter(), error=error, dropped=result is None and not error)
+            if result is not None and out_q is not None:
+                out_q.put(result)
+
+        # The last worker of a stage to finish tells every downstream worker to stop
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and out_q is not None:
+            for _ in range(stages[index + 1].workers):
+                out_q.put(_DONE)
+
+    threads.append(threading.Thread(target=feed, name=source_name, daemon=True))
+    for index, stage in enumerate(stages):
+        remaining, lock = [stage.workers], threading.Lock()
+        for n in range(stage.workers):
+            threads.append(threading.Thread(target=work, args=(index, remaining, lock),
+                                            name=f"{stage.name}-{n}", daemon=True))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [source_stats.summary()] + [stats.summary() for stats in all_stats]
+
+
+def print_pipeline_summary(summaries: list, elapsed: float):
+    print(f"\n📊 Pipeline summary ({elapsed:.1f}s wall clock)")
+    print(f"{'stage':<10} {'workers':>7} {'items':>6} {'errors':>6} {'dropped':>7} {'items/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for s in summaries:
+        print(f"{s['stage']:<10} {s['workers']:>7} {s['items']:>6} {s['errors']:>6} {s['dropped']:>7} "
+              f"{s['throughput_per_s']:>8} {s['p50_ms']:>9} {s['p95_ms']:>9}")
@@ -1,7 +1,15 @@
-def build_code_review_prompt(code: str, language: str = "unknown") -> str:
+from config import PROMPT_TOKEN_BUDGET
+from shared.prompt_budget import PromptBudget
+
+# Review prompts are already bounded by chunking; the budget only measures them
+prompt_budget = PromptBudget("code_review", PROMPT_TOKEN_BUDGET)
+
+
+def build_code_review_prompt(code: str, language: str = "unknown", part: str = None) -> str:
+    part_note = f"\nThis is {part} of a larger file. Number lines from 1 at the first line shown.\n" if part else ""
     return f"""
 You are a senior software engineer. Please review the following {language} code.
-
+{part_note}
 Return a JSON object with:
 1. "issues": a list of dictionaries with "type", "line", and "description"
 2. "summary": a short paragraph summarizing the review
@@ -11,4 +19,42 @@ Respond ONLY with valid JSON.
 ```{language}
 {code}
 ```
-"""
\ No newline at end of file
+"""
+
+def build_incremental_review_prompt(excerpt: str, language: str, filename: str, changed_lines: list) -> str:
+    return f"""
+You are a senior software engineer reviewing a change to the {language} file `{filename}`.
+
+Below is an excerpt of the file: the changed code plus its enclosing functions or classes.
+Lines containing only "..." separate unrelated parts of the file.
+The changed lines are excerpt lines {", ".join(str(n) for n in changed_lines)}. Focus the review on them and use the surrounding code only as context.
+
+Return a JSON object with:
+1. "issues": a list of dictionaries with "type", "line", and "description", where "line" is the line number within this excerpt (the first excerpt line is 1)
+2. "summary": a short paragraph summarizing the review of the change
+
+Respond ONLY with valid JSON.
+
+```{language}
+{excerpt}
+```
+"""
+
+def build_packed_review_prompt(files: list) -> str:
+    """One review request for several small files; `files` are PackedFiles with unique `file_id` tags."""
+    sections = "\n\n".join(
+        f'<file id="{f.file_id}" path="{f.path}" language="{f.language}">\n{f.code}\n</file>' for f in files
+    )
+    ids = ", ".join(f'"{f.file_id}"' for f in files)
+    return f"""
+You are a senior software engineer. Please review each of the following {len(files)} files independently.
+Each file is wrapped in a <file> tag with its id, path and language. Number lines from 1 at the first line of each file.
+
+Return a JSON object of the form {{"files": {{"<id>": {{"issues": [...], "summary": "..."}}}}}} with one entry for each of the ids {ids}, where:
+1. "issues": a list of dictionaries with "type", "line", and "description"
+2. "summary": a short paragraph summarizing the review of that file
+
+Respond ONLY with valid JSON.
+
+{sections}
+"""
@@ -1,4 +1,3 @@
-import requests
 import os
 
 EXTENSION_LANGUAGE_MAP = {
@@ -56,6 +55,7 @@ def read_local_file(filepath: str) -> str:
         return f.read()
 
 def read_remote_file(url: str) -> str:
+    import requests
     response = requests.get(url)
     response.raise_for_status()
     return response.text
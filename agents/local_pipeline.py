@@ -0,0 +1,120 @@
+"""Run the whole pipeline in one process: code review -> test generation -> CI/CD and security.
+
+Usage: python agents/local_pipeline.py [--transport memory|file] [--base-ref REF] [--files-from FILE] [path ...]
+
+All four agents are imported into this interpreter and their subscribers run
+as background tasks on a local transport (AGENT_TRANSPORT), so messages never
+leave the machine and nothing waits on listener timeouts: the run ends as soon
+as every message has been acknowledged. Without paths the whole repository is
+reviewed.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS = ["code-review-agent", "Test_generator", "CICD_agent", "SecurityAgent"]
+
+
+def _module_names(agent: str) -> set:
+    return {name[:-3] for name in os.listdir(os.path.join(AGENTS_DIR, agent)) if name.endswith(".py")}
+
+
+def load_agents() -> dict:
+    """Import each agent's main module, keeping their same-named modules (config, utils, ...) apart.
+
+    The agents are flat scripts, so every one of them has a `main`, `config`
+    and `utils`. Each agent is imported with the clashing names cleared from
+    sys.modules and its own directory first on sys.path; afterwards the
+    clashing entries are removed again so the next agent gets its own. Names
+    only one agent uses stay importable for imports done inside functions.
+    """
+    names = {agent: _module_names(agent) for agent in AGENTS}
+    clashing = {name for agent in AGENTS for name in names[agent]
+                if any(name in names[other] for other in AGENTS if other != agent)}
+    loaded = {}
+    for agent in AGENTS:
+        agent_dir = os.path.join(AGENTS_DIR, agent)
+        for name in clashing:
+            sys.modules.pop(name, None)
+        sys.path.insert(0, agent_dir)
+        try:
+            loaded[agent] = importlib.import_module("main")
+        finally:
+            sys.path.remove(agent_dir)
+            sys.path.append(agent_dir)
+        for name in clashing:
+            sys.modules.pop(name, None)
+    return loaded
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="Review these files instead of the whole repository")
+    parser.add_argument("--files-from", metavar="FILE", help="Also review the files listed in FILE ('-' reads stdin)")
+    parser.add_argument("--base-ref", help="Only review hunks changed since this git ref")
+    parser.add_argument("--transport", choices=["memory", "file"], default=os.getenv("AGENT_TRANSPORT", "memory"),
+                        help="memory (default) or file; Pub/Sub is what this runner replaces")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Give up waiting for downstream agents after this many seconds")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="Answer every model call with a local fake (LLM_BACKEND=fake); no Vertex AI needed")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.transport == "pubsub":
+        raise SystemExit("❌ The local pipeline needs AGENT_TRANSPORT=memory or file.")
+    os.environ["AGENT_TRANSPORT"] = args.transport  # read by shared.transport on import
+    os.environ.setdefault("PUBSUB_TOPIC", "code_review_done")  # the only topic name without a default
+    if args.fake_llm:
+        os.environ["LLM_BACKEND"] = "fake"  # read by shared.llm_gateway on import
+
+    started = time.perf_counter()
+    agents = load_agents()
+    review, test_gen, cicd, security = (agents[name] for name in AGENTS)
+    from shared import transport
+    from shared.bq_writer import flush_all as flush_bigquery
+    from shared.discovery import read_file_list
+    from shared.publisher import flush as flush_publisher
+    print(f"🧩 Loaded {len(agents)} agents in {time.perf_counter() - started:.2f}s ({transport.TRANSPORT} transport)")
+
+    subscriptions = [
+        transport.subscribe(test_gen.PROJECT_ID, test_gen.SUBSCRIPTION_ID, test_gen.callback,
+                            workers=test_gen.WORKERS, max_messages=min(test_gen.MAX_MESSAGES, test_gen.WORKERS)),
+        transport.subscribe(cicd.PROJECT_ID, cicd.CICD_SUBSCRIPTION_ID, cicd.callback),
+        transport.subscribe(security.PROJECT_ID, security.SECURITY_SUBSCRIPTION_ID, security.callback),
+    ]
+
+    paths = list(args.paths)
+    if args.files_from:
+        paths += [path for path in read_file_list(args.files_from) if path not in paths]
+    if paths:
+        review.review_files(paths, base_ref=args.base_ref)
+    elif args.base_ref:
+        review.review_changed_files(review.get_git_root(), args.base_ref)
+    else:
+        review.review_repo_pipelined(review.get_git_root())
+    flush_publisher()
+    reviewed = time.perf_counter()
+
+    drained = transport.drain(timeout=args.timeout)
+    if not drained:
+        print(f"⏳ Stopped waiting after {args.timeout:.0f}s; undelivered work stays queued.")
+    for subscription in subscriptions:
+        subscription.close()
+    flush_publisher()
+    flush_bigquery()
+
+    finished = time.perf_counter()
+    print(f"📊 Transport: {transport.get_broker().stats()}")
+    print(f"✅ Pipeline finished in {finished - started:.2f}s "
+          f"(review {reviewed - started:.2f}s, downstream {finished - reviewed:.2f}s)")
+    return 0 if drained else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Helpers shared by the agents in this directory.
+
+Each agent's config.py puts `agents/` on sys.path, so these modules are
+imported as `shared.<module>` from any agent.
+"""
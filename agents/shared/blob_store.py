@@ -0,0 +1,118 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from shared.cache import CACHE_ROOT
+
+# Where message bodies are parked. Only file:// ships here; see register_backend for others.
+BLOB_STORE_URI = os.getenv("BLOB_STORE_URI") or "file://" + os.path.join(CACHE_ROOT, "blobs")
+BLOB_CACHE_ENTRIES = int(os.getenv("BLOB_CACHE_ENTRIES", "64"))
+
+
+class LocalBlobBackend:
+    """Stores each blob as <root>/<2-char prefix>/<sha256 hex>."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, digest: str, data: bytes):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+
+_BACKENDS = {"file": lambda uri: LocalBlobBackend(uri.path)}
+
+
+def register_backend(scheme: str, factory):
+    """Register `factory(parsed_uri) -> backend` for BLOB_STORE_URI values with this scheme.
+
+    A backend needs `exists(digest)`, `put(digest, data)` and `get(digest)`.
+    """
+    _BACKENDS[scheme] = factory
+
+
+class BlobStore:
+    """Content-addressed blob store with a small in-process LRU read cache.
+
+    Blobs are keyed by their SHA-256, so identical contents are stored once
+    no matter how many files, messages or runs reference them.
+    """
+
+    def __init__(self, backend, cache_entries: int = BLOB_CACHE_ENTRIES):
+        self.backend = backend
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put_bytes(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.backend.exists(digest):
+            self.backend.put(digest, data)
+        self._remember(digest, data)
+        return digest
+
+    def get_bytes(self, digest: str) -> bytes:
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+        data = self.backend.get(digest)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Blob {digest} is corrupt")
+        self._remember(digest, data)
+        return data
+
+    def put_text(self, text: str) -> dict:
+        """Store text and return the reference that travels in messages instead of the text."""
+        data = text.encode("utf-8")
+        return {"digest": self.put_bytes(data), "size": len(data), "encoding": "utf-8"}
+
+    def resolve_text(self, ref: dict) -> str:
+        return self.get_bytes(ref["digest"]).decode(ref.get("encoding", "utf-8"))
+
+    def _remember(self, digest: str, data: bytes):
+        with self._lock:
+            self._cache[digest] = data
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> BlobStore:
+    """Return the process-wide store for BLOB_STORE_URI."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            uri = urlparse(BLOB_STORE_URI)
+            if uri.scheme not in _BACKENDS:
+                raise ValueError(f"❌ No blob backend registered for '{uri.scheme}://'")
+            _store = BlobStore(_BACKENDS[uri.scheme](uri))
+        return _store
+
+
+def resolve_code(data: dict):
+    """Source code for a message: from its `code_ref`, or an inline `code` field from older producers."""
+    if data.get("code_ref"):
+        return get_store().resolve_text(data["code_ref"])
+    return data.get("code")
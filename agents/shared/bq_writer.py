@@ -0,0 +1,243 @@
+import argparse
+import atexit
+import json
+import os
+import random
+import threading
+import time
+
+from shared.cache import CACHE_ROOT
+
+# Rows are buffered per table and inserted when either limit is hit
+BQ_FLUSH_ROWS = int(os.getenv("BQ_FLUSH_ROWS", "500"))
+BQ_FLUSH_INTERVAL = float(os.getenv("BQ_FLUSH_INTERVAL", "5"))
+BQ_MAX_RETRIES = int(os.getenv("BQ_MAX_RETRIES", "5"))
+BQ_RETRY_BASE_DELAY = float(os.getenv("BQ_RETRY_BASE_DELAY", "0.5"))
+BQ_SPOOL_DIR = os.getenv("BQ_SPOOL_DIR") or os.path.join(CACHE_ROOT, "bq_spool")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide BigQuery client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import bigquery
+            _client = bigquery.Client()
+        return _client
+
+
+class BigQueryWriter:
+    """Buffers rows for one table and streams them in batches.
+
+    Inserts are retried with jittered exponential backoff. Rows that still
+    fail (or that BigQuery rejects) are appended to a local JSONL spool that
+    `replay_spool` can send later. The table schema is fetched once and every
+    row is checked against the cached field names; rows missing a REQUIRED
+    field are spooled rather than buffered.
+    """
+
+    def __init__(self, table_id: str, flush_rows: int = BQ_FLUSH_ROWS, flush_interval: float = BQ_FLUSH_INTERVAL,
+                 max_retries: int = BQ_MAX_RETRIES, spool_dir: str = BQ_SPOOL_DIR, client_factory=get_client):
+        self.table_id = table_id
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spool_path = os.path.join(spool_dir, f"{table_id}.jsonl")
+        self.client_factory = client_factory
+        self.inserted = 0
+        self.spooled = 0
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._fields = None
+        self._schema_loaded = False
+        self._warned_fields = set()
+        self._timer = None
+        self._stop = threading.Event()
+
+    def _load_schema(self):
+        # Its own lock: the lookup is a network call and must not block add() or flush() on other threads
+        with self._schema_lock:
+            if self._schema_loaded:
+                return
+            try:
+                table = self.client_factory().get_table(self.table_id)
+                self._fields = {field.name: field for field in table.schema}
+            except Exception as e:
+                print(f"⚠️ Could not load schema for {self.table_id}, rows will not be validated: {e}")
+                self._fields = None
+            self._schema_loaded = True
+
+    def _validate(self, row: dict):
+        """The row without fields the table lacks, or None (after spooling it) if a REQUIRED field is missing."""
+        if not self._schema_loaded:
+            self._load_schema()
+        if self._fields is None:
+            return row
+        unknown = set(row) - set(self._fields)
+        with self._schema_lock:
+            new_unknown = unknown - self._warned_fields
+            self._warned_fields |= new_unknown
+        if new_unknown:
+            print(f"⚠️ Dropping fields not in {self.table_id} schema: {sorted(new_unknown)}")
+        missing = [name for name, field in self._fields.items()
+                   if getattr(field, "mode", "NULLABLE") == "REQUIRED" and row.get(name) is None]
+        if missing:
+            # BigQuery would reject it anyway; keep it for replay instead of failing the caller
+            self._spool([row], f"missing required fields {missing}")
+            return None
+        return {key: value for key, value in row.items() if key not in unknown} if unknown else row
+
+    def add(self, row: dict):
+        row = self._validate(row)
+        if row is None:
+            return
+        with self._lock:
+            self._rows.append(row)
+            should_flush = len(self._rows) >= self.flush_rows
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._flush_periodically, name=f"bq-{self.table_id}", daemon=True)
+                self._timer.start()
+        if should_flush:
+            self.flush()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """Insert every buffered row now. Returns the number of rows inserted."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            return self._insert_with_retry(rows)
+
+    def _insert_with_retry(self, rows: list) -> int:
+        for attempt in range(self.max_retries + 1):
+            try:
+                errors = self.client_factory().insert_rows_json(self.table_id, rows)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._spool(rows, str(e))
+                    return 0
+                delay = BQ_RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random())
+                print(f"⚠️ BigQuery insert into {self.table_id} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            # Row-level errors (bad values) will not succeed on retry: spool just those rows
+            failed = {error.get("index") for error in errors or [] if error.get("index") is not None}
+            if errors and not failed:
+                failed = set(range(len(rows)))
+            if failed:
+                print(f"❌ BigQuery rejected {len(failed)} row(s) for {self.table_id}:", errors)
+                self._spool([rows[i] for i in sorted(failed)], json.dumps(errors, default=str)[:1000])
+            inserted = len(rows) - len(failed)
+            with self._lock:
+                self.inserted += inserted
+            if inserted:
+                print(f"📊 Inserted {inserted} row(s) into {self.table_id}.")
+            return inserted
+        return 0
+
+    def _spool(self, rows: list, reason: str):
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        with self._lock, open(self.spool_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+            self.spooled += len(rows)
+        print(f"💾 Spooled {len(rows)} row(s) for {self.table_id} to {self.spool_path}: {reason}")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(table_id: str) -> BigQueryWriter:
+    """Return the process-wide writer for `table_id`."""
+    with _writers_lock:
+        if table_id not in _writers:
+            _writers[table_id] = BigQueryWriter(table_id)
+        return _writers[table_id]
+
+
+def insert_row(table_id: str, row: dict):
+    get_writer(table_id).add(row)
+
+
+def flush_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+def _read_spool(path: str) -> list:
+    """Rows of a spool file; lines that are not JSON are moved to `<table>.jsonl.bad` instead of aborting."""
+    rows, bad = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                bad.append(line if line.endswith("\n") else line + "\n")
+    if bad:
+        bad_path = path[:path.index(".jsonl")] + ".jsonl.bad"
+        with open(bad_path, "a", encoding="utf-8") as f:
+            f.writelines(bad)
+        print(f"⚠️ Moved {len(bad)} unreadable spooled row(s) to {bad_path}")
+    return rows
+
+
+def _replay_file(table_id: str, replay_path: str, spool_dir: str, client_factory) -> int:
+    rows = _read_spool(replay_path)
+    writer = BigQueryWriter(table_id, spool_dir=spool_dir, client_factory=client_factory)
+    inserted = writer._insert_with_retry(rows) if rows else 0
+    os.remove(replay_path)
+    return inserted
+
+
+def replay_spool(spool_dir: str = BQ_SPOOL_DIR, client_factory=get_client) -> dict:
+    """Re-send every spooled row. Rows that fail again are spooled afresh. Returns rows inserted per table."""
+    results = {}
+    if not os.path.isdir(spool_dir):
+        return results
+    tables = sorted({name[:name.index(".jsonl")] for name in os.listdir(spool_dir)
+                     if name.endswith((".jsonl", ".jsonl.replaying"))})
+    for table_id in tables:
+        path = os.path.join(spool_dir, f"{table_id}.jsonl")
+        replay_path = path + ".replaying"
+        inserted = 0
+        # Left by a replay that crashed: send it first, taking the spool below would overwrite it
+        if os.path.exists(replay_path):
+            inserted += _replay_file(table_id, replay_path, spool_dir, client_factory)
+        if os.path.exists(path):
+            os.replace(path, replay_path)  # new failures go to a fresh spool file
+            inserted += _replay_file(table_id, replay_path, spool_dir, client_factory)
+        results[table_id] = inserted
+    return results
+
+
+atexit.register(flush_all)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local BigQuery spool.")
+    parser.add_argument("--replay", action="store_true", help="Insert every spooled row and clear the spool")
+    args = parser.parse_args()
+    if args.replay:
+        print("📊 Replayed rows:", replay_spool())
+    else:
+        parser.print_help()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Default location for every on-disk agent cache (override with AGENT_CACHE_DIR)
+CACHE_ROOT = os.getenv("AGENT_CACHE_DIR") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".agent_cache")
+)
+
+
+def make_key(*parts) -> str:
+    """Hash any mix of str/bytes/JSON-serializable parts into a stable cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (str, bytes)):
+            part = json.dumps(part, sort_keys=True, separators=(",", ":"))
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Content-addressed JSON cache stored as one file per entry.
+
+    Entries are evicted when they have not been used for `max_age_seconds`,
+    then least-recently-used first until the cache fits `max_entries` and
+    `max_bytes`. Writes are atomic, so several processes can share a directory.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 5000, max_bytes: int = 200 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600, prune_every: int = 200):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                self._remove(path)
+                self._count("misses")
+                return default
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used for LRU eviction
+        except FileNotFoundError:
+            self._count("misses")
+            return default
+        except (OSError, ValueError):
+            # Corrupt or half-written entry: drop it and treat as a miss
+            self._remove(path)
+            self._count("misses")
+            return default
+
+        self._count("hits")
+        return entry.get("value", default)
+
+    def put(self, key: str, value, meta: dict = None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"key": key, "stored_at": time.time(), "meta": meta or {}, "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            self._writes_since_prune += 1
+            should_prune = self._writes_since_prune >= self.prune_every
+            if should_prune:
+                self._writes_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def delete(self, key: str) -> bool:
+        return self._remove(self._path(key))
+
+    def entries(self):
+        """Yield (key, entry) for every stored entry, skipping unreadable files."""
+        for path, _, _ in self._scan():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            yield entry.get("key"), entry
+
+    def clear(self) -> int:
+        removed = sum(1 for path, _, _ in self._scan() if self._remove(path))
+        self._count("evictions", removed)
+        return removed
+
+    def prune(self) -> int:
+        """Apply age, entry-count and size limits. Returns the number of evicted entries."""
+        now = time.time()
+        live = []
+        evicted = 0
+        for path, mtime, size in self._scan():
+            if now - mtime > self.max_age_seconds:
+                evicted += self._remove(path)
+            else:
+                live.append((mtime, size, path))
+
+        live.sort()  # oldest use first
+        total_bytes = sum(size for _, size, _ in live)
+        while live and (len(live) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = live.pop(0)
+            total_bytes -= size
+            evicted += self._remove(path)
+
+        self._count("evictions", evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _scan(self):
+        if not os.path.isdir(self.directory):
+            return
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for item in os.scandir(bucket.path):
+                if not item.name.endswith(".json"):
+                    continue
+                try:
+                    st = item.stat()
+                except FileNotFoundError:
+                    continue
+                yield item.path, st.st_mtime, st.st_size
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,177 @@
+import ast
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from shared.tokens import estimate_tokens
+
+# Top-level line that starts a new definition in a brace/keyword language
+_DEFINITION_START = re.compile(r"^(?:export\s+|public\s+|private\s+|protected\s+|static\s+|async\s+)*"
+                               r"(?:function|class|interface|enum|struct|impl|fn|func|def|type|const|let|var|"
+                               r"CREATE|ALTER|module|namespace)\b")
+
+
+class Chunk(NamedTuple):
+    start_line: int  # 1-based, inclusive
+    end_line: int    # 1-based, inclusive
+    text: str
+    context_lines: int = 0  # lines of enclosing class header prepended to `text`
+    header_start: int = 0   # file line of the first of those header lines
+
+    @property
+    def line_offset(self) -> int:
+        """Add to a line number within `text` past the header to get the line in the file."""
+        return self.start_line - 1 - self.context_lines
+
+    def file_line(self, line: int) -> int:
+        """The file line of line `line` (1-based) of `text`, header lines included."""
+        if line <= self.context_lines:
+            return self.header_start + line - 1
+        return line + self.line_offset
+
+
+def _python_boundaries(code: str, lines: list, max_tokens: int):
+    """Start lines of every top-level statement, plus the members of classes too large for one chunk.
+
+    Returns (boundaries, headers); headers holds (first body line, last line,
+    header start line, header text) for each class that was split, so its
+    member chunks can start with the `class X(...):` line.
+    """
+    tree = ast.parse(code)
+    boundaries, headers = set(), []
+
+    def node_start(node):
+        return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+    for node in tree.body:
+        start = node_start(node)
+        boundaries.add(start)
+        if isinstance(node, ast.ClassDef) and estimate_tokens("\n".join(lines[start - 1:node.end_lineno])) > max_tokens:
+            body_start = node_start(node.body[0])
+            if body_start > start:
+                headers.append((body_start, node.end_lineno, start, "\n".join(lines[start - 1:body_start - 1])))
+            for member in node.body[1:]:
+                boundaries.add(node_start(member))
+    return boundaries, headers
+
+
+def _generic_boundaries(lines: list):
+    """Definitions at column 0, or any column-0 line that follows a blank line."""
+    boundaries = set()
+    for i, line in enumerate(lines):
+        if not line or line[0].isspace() or line[0] in "})]":
+            continue
+        if _DEFINITION_START.match(line) or (i > 0 and not lines[i - 1].strip()):
+            boundaries.add(i + 1)
+    return boundaries
+
+
+def _segments(lines: list, boundaries: set):
+    starts = sorted(b for b in boundaries | {1} if 1 <= b <= len(lines))
+    ends = [s - 1 for s in starts[1:]] + [len(lines)]
+    return list(zip(starts, ends))
+
+
+def chunk_source(code: str, language: str, max_tokens: int) -> list:
+    """Split source into chunks of at most ~max_tokens, cutting at function/class boundaries.
+
+    Python is split with `ast` at top-level statements, and a class too large
+    for one chunk at its members; chunks inside such a class start with its
+    header for context (see `Chunk.file_line`). Other languages use a
+    column-0 heuristic. A single definition larger than the budget is split
+    by lines as a last resort.
+    """
+    lines = code.splitlines()
+    if estimate_tokens(code) <= max_tokens or len(lines) <= 1:
+        return [Chunk(1, max(1, len(lines)), code)]
+
+    boundaries, headers = None, []
+    if language == "python":
+        try:
+            boundaries, headers = _python_boundaries(code, lines, max_tokens)
+        except SyntaxError:
+            boundaries = None
+    if boundaries is None:
+        boundaries = _generic_boundaries(lines)
+
+    chunks = []
+    current_start, current_tokens = None, 0
+
+    def flush(end_line):
+        nonlocal current_start, current_tokens
+        if current_start is not None:
+            text = "\n".join(lines[current_start - 1:end_line])
+            header_start, header = next(((first, h) for body_start, last, first, h in headers
+                                         if body_start <= current_start <= last), (0, ""))
+            if header:
+                chunks.append(Chunk(current_start, end_line, header + "\n" + text, header.count("\n") + 1,
+                                    header_start))
+            else:
+                chunks.append(Chunk(current_start, end_line, text))
+        current_start, current_tokens = None, 0
+
+    for start, end in _segments(lines, boundaries):
+        segment_tokens = estimate_tokens("\n".join(lines[start - 1:end]))
+        if segment_tokens > max_tokens:
+            flush(start - 1)
+            # Hard split an oversized definition line by line
+            for number in range(start, end + 1):
+                line_tokens = estimate_tokens(lines[number - 1]) + 1
+                if current_start is not None and current_tokens + line_tokens > max_tokens:
+                    flush(number - 1)
+                if current_start is None:
+                    current_start = number
+                current_tokens += line_tokens
+            flush(end)
+            continue
+        if current_start is not None and current_tokens + segment_tokens > max_tokens:
+            flush(start - 1)
+        if current_start is None:
+            current_start = start
+        current_tokens += segment_tokens
+    flush(len(lines))
+    return chunks
+
+
+def map_chunks(func, chunks: list, max_workers: int = 4) -> list:
+    """Run `func(chunk)` for every chunk in parallel.
+
+    Returns (chunk, result, error) tuples in chunk order, so one failing chunk
+    does not lose the results of the others.
+    """
+    def run(chunk):
+        try:
+            return chunk, func(chunk), None
+        except Exception as e:
+            return chunk, None, e
+
+    if len(chunks) == 1:
+        return [run(chunks[0])]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        return list(pool.map(run, chunks))
+
+
+def file_issue_lines(issues: list, chunk: Chunk) -> list:
+    """Map issue `line` values relative to `chunk.text` back to file lines, including the prepended header."""
+    mapped = []
+    for issue in issues or []:
+        issue = dict(issue)
+        try:
+            issue["line"] = chunk.file_line(int(issue.get("line")))
+        except (TypeError, ValueError):
+            pass
+        mapped.append(issue)
+    return mapped
+
+
+def issues_in_chunk(issues: list, chunk: Chunk) -> list:
+    """Issues whose `line` falls inside `chunk`, renumbered relative to its text."""
+    selected = []
+    for issue in issues or []:
+        try:
+            line = int(issue.get("line"))
+        except (TypeError, ValueError):
+            continue
+        if chunk.start_line <= line <= chunk.end_line:
+            selected.append(dict(issue, line=line - chunk.line_offset))
+    return selected
@@ -0,0 +1,65 @@
+import json
+import os
+import zlib
+
+# Version of the envelope below; bump when the body layout or attributes change incompatibly
+SCHEMA_VERSION = "1"
+# Envelope versions this code can decode; messages without a `schema` attribute are legacy plain JSON
+SUPPORTED_SCHEMAS = (SCHEMA_VERSION,)
+# Bodies smaller than this are sent as plain compact JSON, where zlib would only add overhead
+COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "256"))
+COMPRESSION_LEVEL = int(os.getenv("MESSAGE_COMPRESSION_LEVEL", "6"))
+
+# Body fields copied into message attributes so consumers can route and filter without decoding
+ROUTING_FIELDS = ("kind", "run_id", "file_path", "language")
+# Pub/Sub rejects attribute values above 1024 bytes; longer values are only in the body
+MAX_ATTRIBUTE_BYTES = 1024
+
+JSON = "json"
+JSON_ZLIB = "json+zlib"
+
+
+def encode(payload: dict) -> tuple:
+    """(body, attributes) for a message: compact JSON, zlib-compressed when large, plus routing attributes."""
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    encoding = JSON
+    if len(body) >= COMPRESS_MIN_BYTES:
+        body, encoding = zlib.compress(body, COMPRESSION_LEVEL), JSON_ZLIB
+    attributes = {"schema": SCHEMA_VERSION, "encoding": encoding}
+    for field in ROUTING_FIELDS:
+        value = payload.get(field)
+        if value is not None and len(str(value).encode("utf-8")) <= MAX_ATTRIBUTE_BYTES:
+            attributes[field] = str(value)
+    return body, attributes
+
+
+def decode(body: bytes, attributes=None) -> dict:
+    """The payload of a message. Messages without an `encoding` attribute are legacy plain JSON.
+
+    Raises ValueError for an envelope version or encoding this code does not know.
+    """
+    schema = (attributes or {}).get("schema", SCHEMA_VERSION)
+    if schema not in SUPPORTED_SCHEMAS:
+        raise ValueError(f"unsupported message schema '{schema}' (supported: {', '.join(SUPPORTED_SCHEMAS)})")
+    encoding = (attributes or {}).get("encoding", JSON)
+    if encoding == JSON_ZLIB:
+        body = zlib.decompress(body)
+    elif encoding != JSON:
+        raise ValueError(f"unknown message encoding '{encoding}'")
+    return json.loads(body.decode("utf-8"))
+
+
+def decode_message(message) -> dict:
+    return decode(message.data, getattr(message, "attributes", None))
+
+
+def routing(message) -> dict:
+    """Routing attributes of a message without touching its body (empty for legacy messages)."""
+    attributes = getattr(message, "attributes", None) or {}
+    return {field: attributes[field] for field in ROUTING_FIELDS + ("schema",) if field in attributes}
+
+
+def run_id_of(message):
+    """The run a message belongs to, from its attributes only; None when the producer did not set it."""
+    attributes = getattr(message, "attributes", None) or {}
+    return attributes.get("run_id")
@@ -0,0 +1,79 @@
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+
+# Requests and responses are one JSON document per line
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            if request.get("command") == "ping":
+                response = {"ok": True, "result": "pong"}
+            elif request.get("command") == "shutdown":
+                response = {"ok": True, "result": "shutting down"}
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                response = {"ok": True, "result": self.server.work_handler(request)}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, work_handler):
+        self.work_handler = work_handler
+        super().__init__(path, _Handler)
+
+
+def serve(path: str, work_handler, name: str = "agent"):
+    """Serve `work_handler(request) -> result` on a Unix socket until SIGINT/SIGTERM or a shutdown command.
+
+    The process, its SDK clients and its caches stay warm between requests,
+    so each batch only pays for the work itself.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("❌ Daemon mode needs Unix domain sockets, which this platform does not support.")
+    if os.path.exists(path):
+        try:
+            submit(path, {"command": "ping"}, timeout=1)
+        except OSError:
+            os.remove(path)  # stale socket from a process that died
+        else:
+            raise RuntimeError(f"❌ Another {name} daemon is already listening on {path}")
+
+    server = _Server(path, work_handler)
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"🛰️ {name} daemon listening on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        print(f"🛑 {name} daemon stopped.")
+
+
+def submit(path: str, request: dict, timeout: float = None) -> dict:
+    """Send one request to a daemon and return its response ({"ok", "result"} or {"ok": False, "error"})."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError(f"❌ Daemon on {path} closed the connection without a response")
+    return json.loads(line)
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import re
+import subprocess
+import sys
+
+# Directories never worth descending into, pruned during traversal
+DEFAULT_EXCLUDED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".tox", ".nox",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".agent_cache", ".idea", ".vscode",
+}
+IGNORE_FILES = (".gitignore", ".agentignore")
+BINARY_SNIFF_BYTES = 8192
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regex fragment ('*' never crosses '/')."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """A subset of .gitignore semantics: globs, '**', leading '/', trailing '/', and '!' negation.
+
+    Patterns without a '/' match a name at any depth; patterns with one are
+    anchored to the repository root. The last matching pattern wins.
+    """
+
+    def __init__(self, lines=()):
+        self.rules = []
+        for line in lines:
+            self.add(line)
+
+    @classmethod
+    def from_files(cls, root: str, names=IGNORE_FILES) -> "IgnoreRules":
+        rules = cls()
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        rules.add(line)
+        return rules
+
+    def add(self, line: str):
+        line = line.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            return
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if line:
+            self.rules.append((re.compile(f"^{_translate(line)}$"), negate, dir_only, anchored))
+
+    def matches(self, rel_path: str, is_dir: bool = False) -> bool:
+        rel_path = rel_path.replace(os.sep, "/")
+        name = rel_path.rsplit("/", 1)[-1]
+        ignored = False
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                ignored = not negate
+        return ignored
+
+
+def is_virtualenv(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "pyvenv.cfg"))
+
+
+def is_binary_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(BINARY_SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+def _git_candidates(root: str):
+    """Tracked and untracked-but-not-ignored files from the git index, or None outside a repo."""
+    try:
+        output = subprocess.check_output(
+            ["git", "-C", root, "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [p for p in output.decode("utf-8", errors="replace").split("\0") if p]
+
+
+def git_blob_sha(data: bytes) -> str:
+    """The SHA git would give `data` as a blob (`git hash-object`)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def file_blob_sha(path: str, block_size: int = 1024 * 1024) -> str:
+    """`git_blob_sha` of a file's contents, read in blocks."""
+    digest = hashlib.sha1(b"blob %d\0" % os.path.getsize(path))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def git_index_blobs(root: str) -> dict:
+    """Blob SHA per root-relative path for tracked files whose working copy matches the index.
+
+    Lets callers identify unmodified files without reading them. Empty outside a repository.
+    """
+    try:
+        staged = subprocess.check_output(["git", "-C", root, "ls-files", "-s", "-z"], stderr=subprocess.DEVNULL)
+        modified = subprocess.check_output(["git", "-C", root, "ls-files", "-m", "-z"], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    dirty = set(modified.decode("utf-8", errors="replace").split("\0"))
+    blobs = {}
+    for entry in staged.decode("utf-8", errors="replace").split("\0"):
+        meta, _, path = entry.partition("\t")
+        fields = meta.split()
+        # <mode> <sha> <stage>; skip conflicts (stage != 0), submodules and locally modified files
+        if len(fields) != 3 or fields[2] != "0" or fields[0] == "160000" or path in dirty:
+            continue
+        blobs[path] = fields[1]
+    return blobs
+
+
+def _walk_candidates(root: str, excluded_dirs: set, rules: IgnoreRules):
+    for current, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(current, root)
+        rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/") + "/"
+        # Prune in place so os.walk never descends into excluded directories
+        dirs[:] = [
+            d for d in dirs
+            if d not in excluded_dirs
+            and not rules.matches(rel_dir + d, is_dir=True)
+            and not is_virtualenv(os.path.join(current, d))
+        ]
+        for name in files:
+            yield rel_dir + name
+
+
+def iter_source_files(root: str, extensions, excluded_dirs=None, max_bytes: int = None,
+                      use_git: bool = True, skip_binary: bool = True):
+    """Yield absolute paths of candidate source files under `root`.
+
+    With `use_git`, candidates come from `git ls-files` (which already applies
+    .gitignore) instead of a filesystem walk; otherwise the walk prunes excluded
+    and ignored directories before descending. Either way .agentignore/.gitignore
+    rules from the root, the extension filter (None keeps every file), the size
+    limit and the binary check are applied before a path is yielded.
+    """
+    root = os.path.abspath(root)
+    extensions = tuple(extensions) if extensions is not None else None
+    excluded_dirs = DEFAULT_EXCLUDED_DIRS if excluded_dirs is None else set(excluded_dirs)
+    rules = IgnoreRules.from_files(root)
+
+    candidates = _git_candidates(root) if use_git else None
+    from_git = candidates is not None
+    if not from_git:
+        candidates = _walk_candidates(root, excluded_dirs, rules)
+
+    dir_verdicts = {}
+
+    def dir_excluded(rel_dir: str) -> bool:
+        if rel_dir not in dir_verdicts:
+            parent, _, name = rel_dir.rpartition("/")
+            dir_verdicts[rel_dir] = (
+                (bool(parent) and dir_excluded(parent))
+                or name in excluded_dirs
+                or rules.matches(rel_dir, is_dir=True)
+                or is_virtualenv(os.path.join(root, rel_dir))
+            )
+        return dir_verdicts[rel_dir]
+
+    for rel_path in candidates:
+        if extensions is not None and not rel_path.endswith(extensions):
+            continue
+        parent = rel_path.rpartition("/")[0]
+        if from_git and parent and dir_excluded(parent):
+            continue
+        if rules.matches(rel_path):
+            continue
+
+        full_path = os.path.join(root, *rel_path.split("/"))
+        try:
+            size = os.path.getsize(full_path)
+        except OSError:
+            continue  # listed in the index but deleted from the working tree
+        if max_bytes is not None and size > max_bytes:
+            continue
+        if skip_binary and is_binary_file(full_path):
+            continue
+        yield full_path
+
+
+def read_file_list(source: str) -> list:
+    """Paths listed one per line in `source` ("-" reads stdin), skipping blanks, #comments and duplicates."""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    paths = []
+    for line in lines:
+        path = line.strip()
+        if path and not path.startswith("#") and path not in paths:
+            paths.append(path)
+    return paths
@@ -0,0 +1,39 @@
+import threading
+
+_models = {}
+_initialized = set()
+_lock = threading.Lock()
+
+
+def get_model(model_name: str, project: str, location: str):
+    """Process-wide GenerativeModel for `model_name`, importing and initializing Vertex AI on first use."""
+    key = (model_name, project, location)
+    with _lock:
+        if key not in _models:
+            import vertexai
+            from vertexai.preview.generative_models import GenerativeModel
+            if (project, location) not in _initialized:
+                vertexai.init(project=project, location=location)
+                _initialized.add((project, location))
+            _models[key] = GenerativeModel(model_name)
+        return _models[key]
+
+
+class LazyModel:
+    """Module-level stand-in for a GenerativeModel that is only built when first called.
+
+    Importing an agent therefore never pays for the Vertex AI SDK import,
+    `vertexai.init` or model construction; runs that never reach the model
+    (cache hits, skipped files, --help) never pay at all.
+    """
+
+    def __init__(self, model_name: str, project: str, location: str):
+        self.model_name = model_name
+        self.project = project
+        self.location = location
+
+    def get(self):
+        return get_model(self.model_name, self.project, self.location)
+
+    def generate_content(self, *args, **kwargs):
+        return self.get().generate_content(*args, **kwargs)
@@ -0,0 +1,339 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from shared.llm import LazyModel
+
+# vertex (default) or fake (a local FakeModel, for tests and local pipeline runs without Gemini)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "vertex").lower()
+# AIMD limit on concurrent calls per model, shared by every agent in the process
+INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Successful calls slower than this shrink the limit gently (0 disables the latency signal)
+LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "30"))
+# Retries with full-jitter exponential backoff on throttling, 5xx and timeouts
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+# Send a second copy of a call still running after this many seconds, if the limit has room (0 disables)
+HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+# Calls whose answer must be JSON are repeated this many times in total while it does not parse
+JSON_ATTEMPTS = int(os.getenv("LLM_JSON_ATTEMPTS", "2"))
+
+BACKENDS = ("vertex", "fake")
+if LLM_BACKEND not in BACKENDS:
+    raise EnvironmentError(f"❌ LLM_BACKEND must be one of {', '.join(BACKENDS)}, not '{LLM_BACKEND}'.")
+
+# Outcomes of one call, as seen by the limiter and the retry loop
+OK = "ok"
+OVERLOADED = "overloaded"   # 429 / 503: the quota or the service is saturated
+RETRYABLE = "retryable"     # other 5xx, timeouts, dropped connections
+FATAL = "fatal"             # bad requests, permissions, safety blocks: retrying cannot help
+
+_OVERLOADED_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable"}
+_RETRYABLE_NAMES = {"InternalServerError", "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted"}
+
+JSON_REMINDER = "\n\nYour previous answer was not valid JSON. Reply with the JSON only, no prose and no code fence."
+
+
+def classify(error: Exception) -> str:
+    """OVERLOADED, RETRYABLE or FATAL, from the HTTP status or exception class (google.api_core or otherwise)."""
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    name = type(error).__name__
+    if code in (429, 503) or name in _OVERLOADED_NAMES:
+        return OVERLOADED
+    if (code is not None and code >= 500) or name in _RETRYABLE_NAMES or isinstance(error, (TimeoutError, ConnectionError)):
+        return RETRYABLE
+    return FATAL
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^(attempt-1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent calls.
+
+    Each success below the latency target adds 1/limit (about +1 per round
+    of calls); throttling halves the limit and slow calls cut it by 10%. A
+    burst of failures from calls that were in flight together counts as one
+    decrease.
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, minimum: int = MIN_CONCURRENCY,
+                 maximum: int = MAX_CONCURRENCY, latency_target: float = LATENCY_TARGET_SECONDS):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._latency = None  # moving average, also the cool-down between decreases
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._stats = {"peak_in_flight": 0, "increases": 0, "decreases": 0}
+
+    def _take(self):
+        self.in_flight += 1
+        self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self.in_flight)
+
+    def acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self._take()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self._take()
+            return True
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < (self._latency or 0.0):
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self._last_decrease = now
+        self._stats["decreases"] += 1
+
+    def release(self, outcome: str, latency: float):
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == OK:
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+                if self.latency_target and latency > self.latency_target:
+                    self._decrease(0.9)
+                elif self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                    self._stats["increases"] += 1
+            elif outcome == OVERLOADED:
+                self._decrease(0.5)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, limit=round(self.limit, 2), in_flight=self.in_flight)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str) -> AdaptiveLimiter:
+    """Process-wide limiter for `key` (the model name): agents calling the same model share its quota."""
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = AdaptiveLimiter()
+        return _limiters[key]
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+FAKE_REVIEW = {"issues": [], "summary": "No issues found (fake model)."}
+_PACKED_FILE = re.compile(r'<file id="([^"]+)"')
+
+
+def fake_review(prompt) -> str:
+    """A clean review as JSON, one per file for packed review prompts."""
+    file_ids = _PACKED_FILE.findall(str(prompt))
+    if file_ids:
+        return json.dumps({"files": {file_id: FAKE_REVIEW for file_id in file_ids}})
+    return json.dumps(FAKE_REVIEW)
+
+
+class FakeModel:
+    """Local stand-in for a GenerativeModel with simulated latency, a concurrency quota and failures.
+
+    `responder` is the response text or a function of the prompt. Calls
+    beyond `capacity` at once fail with 429 like an exhausted quota; a
+    share `slow_rate` of calls take `slow_latency` instead of `latency`.
+    """
+
+    def __init__(self, responder=fake_review, latency: float = 0.05, capacity: int = 0, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 1.0, seed: int = None):
+        self.responder = responder
+        self.latency = latency
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            if self.capacity and self.in_flight >= self.capacity:
+                self.rejected += 1
+                raise FakeError(429, "Resource exhausted (fake quota)")
+            self.in_flight += 1
+            slow = self._random.random() < self.slow_rate
+            failed = self._random.random() < self.error_rate
+        try:
+            time.sleep(self.slow_latency if slow else self.latency)
+            if failed:
+                raise FakeError(500, "Internal error (fake)")
+            return FakeResponse(self.responder(prompt) if callable(self.responder) else self.responder)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class LLMGateway:
+    """Every model call of one agent: adaptive concurrency, retries, optional hedging and metrics.
+
+    Drop-in for the model object (`generate_content(prompt).text`), plus
+    `generate_text` and `generate_json`, which also retries answers that
+    do not parse. Raises the last error once retries are exhausted.
+    """
+
+    def __init__(self, name: str, model, limiter: AdaptiveLimiter = None, max_attempts: int = MAX_ATTEMPTS,
+                 timeout: float = TIMEOUT_SECONDS, hedge_after: float = HEDGE_AFTER_SECONDS,
+                 json_attempts: int = JSON_ATTEMPTS):
+        self.name = name
+        self.model = model
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_attempts = max(1, max_attempts)
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.json_attempts = max(1, json_attempts)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=2048)
+        self._stats = {"calls": 0, "ok": 0, "failed": 0, "attempts": 0, "retries": 0, "throttled": 0,
+                       "timeouts": 0, "hedges": 0, "hedge_wins": 0, "json_retries": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _start(self, prompt, kwargs) -> Future:
+        """Run one call on its own daemon thread; a slot must already be held and is released when it ends."""
+        future = Future()
+
+        def call():
+            started = time.monotonic()
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                self.limiter.release(classify(e), time.monotonic() - started)
+                future.set_exception(e)
+            else:
+                latency = time.monotonic() - started
+                self.limiter.release(OK, latency)
+                with self._lock:
+                    self._latencies.append(latency)
+                future.set_result(response)
+
+        self._count("attempts")
+        threading.Thread(target=call, name=f"llm-{self.name}", daemon=True).start()
+        return future
+
+    def _attempt(self, prompt, kwargs):
+        """One call, hedged once if it is still running after `hedge_after` seconds; the first success wins.
+
+        The timeout starts once a slot is held: waiting for the limiter is
+        not the call being slow.
+        """
+        self.limiter.acquire()
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        primary = self._start(prompt, kwargs)
+        pending = {primary}
+        if self.hedge_after:
+            wait(pending, timeout=self.hedge_after)
+            if not primary.done() and self.limiter.try_acquire():
+                self._count("hedges")
+                pending.add(self._start(prompt, kwargs))
+        error = None
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                self._count("timeouts")
+                raise TimeoutError(f"no answer within {self.timeout:g}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def generate_content(self, prompt, **kwargs):
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self._attempt(prompt, kwargs)
+                self._count("ok")
+                return response
+            except Exception as e:
+                outcome = classify(e)
+                if outcome == OVERLOADED:
+                    self._count("throttled")
+                if outcome == FATAL or attempt == self.max_attempts:
+                    self._count("failed")
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"🔁 {self.name}: model call failed ({e}); retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                self._count("retries")
+                time.sleep(delay)
+
+    def generate_text(self, prompt, **kwargs) -> str:
+        return self.generate_content(prompt, **kwargs).text
+
+    def generate_json(self, prompt, parse=json.loads, **kwargs):
+        """The parsed answer, asking again (with a reminder) while `parse` raises ValueError."""
+        for attempt in range(1, self.json_attempts + 1):
+            text = self.generate_text(prompt if attempt == 1 else prompt + JSON_REMINDER, **kwargs)
+            try:
+                return parse(text)
+            except ValueError as e:
+                if attempt == self.json_attempts:
+                    raise
+                print(f"🔁 {self.name}: answer was not valid JSON ({e}); asking again")
+                self._count("json_retries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, agent=self.name)
+            latencies = sorted(self._latencies)
+        if latencies:
+            stats["latency_p50"] = round(latencies[len(latencies) // 2], 3)
+            stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            stats["latency_max"] = round(latencies[-1], 3)
+        stats["limiter"] = self.limiter.stats()
+        return stats
+
+
+def fake_model_from_env() -> FakeModel:
+    return FakeModel(
+        responder=os.getenv("LLM_FAKE_RESPONSE") or fake_review,
+        latency=float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0.05")),
+        capacity=int(os.getenv("LLM_FAKE_CAPACITY", "0")),
+    )
+
+
+def get_gateway(name: str, model_name: str, project: str, location: str) -> LLMGateway:
+    """The gateway an agent calls `model_name` through; LLM_BACKEND=fake swaps in a local FakeModel."""
+    model = fake_model_from_env() if LLM_BACKEND == "fake" else LazyModel(model_name, project, location)
+    return LLMGateway(name, model, limiter=get_limiter(model_name))
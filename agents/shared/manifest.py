@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Consumers stop waiting for a run after this many seconds and report which files never arrived
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS", "900"))
+
+# Message kinds; a message without "kind" is a regular per-file result
+MANIFEST = "manifest"
+ERROR = "error"
+SKIPPED = "skipped"
+RESULT = "result"
+
+
+def current_run_id() -> str:
+    return os.getenv("RUN_ID", "manual")
+
+
+def run_id_is_explicit() -> bool:
+    """Whether RUN_ID was set; without it every ad-hoc run shares the "manual" id and never really ends."""
+    return bool(os.getenv("RUN_ID"))
+
+
+def kind_of(data: dict) -> str:
+    return data.get("kind", RESULT)
+
+
+def build_manifest(run_id: str, files: list, producer: str) -> dict:
+    """The list of files a run will produce exactly one message for, published before any of them."""
+    return {
+        "kind": MANIFEST,
+        "run_id": run_id,
+        "files": sorted(set(files)),
+        "producer": producer,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def build_outcome(kind: str, file_path: str, run_id: str, stage: str, reason) -> dict:
+    """A message that settles `file_path` for downstream consumers without carrying work (ERROR or SKIPPED)."""
+    return {"kind": kind, "file_path": file_path, "run_id": run_id, "stage": stage, "reason": str(reason)}
+
+
+class RunTracker:
+    """Completion barrier for one run.
+
+    The run is complete once its manifest has arrived and every file it
+    lists has been settled. Results may arrive before the manifest, and
+    duplicates (redeliveries) are harmless. Several manifests for the same
+    run are merged.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.expected = None
+        self.settled = set()
+        self._cond = threading.Condition()
+
+    def tracks(self, data: dict) -> bool:
+        return data.get("run_id", "manual") == self.run_id
+
+    def add_manifest(self, manifest: dict):
+        with self._cond:
+            self.expected = (self.expected or set()) | set(manifest.get("files", []))
+            self._cond.notify_all()
+        print(f"🧾 Manifest for run {self.run_id}: {len(self.expected)} file(s) expected")
+
+    def settle(self, file_path: str):
+        with self._cond:
+            self.settled.add(file_path)
+            self._cond.notify_all()
+
+    def _complete(self) -> bool:
+        return self.expected is not None and self.expected <= self.settled
+
+    def complete(self) -> bool:
+        with self._cond:
+            return self._complete()
+
+    def missing(self) -> list:
+        with self._cond:
+            return sorted((self.expected or set()) - self.settled)
+
+    def wait(self, timeout: float = RUN_DEADLINE_SECONDS) -> bool:
+        """Block until the run is complete (True) or `timeout` seconds have passed (False)."""
+        with self._cond:
+            return self._cond.wait_for(self._complete, timeout)
+
+    def report(self) -> dict:
+        with self._cond:
+            missing = sorted((self.expected or set()) - self.settled)
+            return {
+                "run_id": self.run_id,
+                "manifest_received": self.expected is not None,
+                "expected": len(self.expected or ()),
+                "settled": len(self.settled),
+                "missing": missing,
+            }
+
+    def print_report(self):
+        report = self.report()
+        if not report["manifest_received"]:
+            print(f"⏳ No manifest arrived for run {self.run_id}; {report['settled']} file(s) processed.")
+        elif report["missing"]:
+            print(f"⏳ Run {self.run_id}: {len(report['missing'])} of {report['expected']} file(s) never arrived:")
+            for file_path in report["missing"]:
+                print(f"   - {file_path}")
+        else:
+            print(f"✅ Run {self.run_id} complete: {report['expected']} file(s) processed.")
+
+
+def wait_for_run(tracker: RunTracker, streaming_pull, deadline_seconds: float = RUN_DEADLINE_SECONDS) -> bool:
+    """Wait until the run is complete, the subscriber stream ends or the deadline passes; then stop and report.
+
+    Returns whether the run completed.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    while not tracker.wait(min(1.0, max(0.0, deadline - time.monotonic()))):
+        if streaming_pull.done():
+            print("❌ Subscriber stream ended unexpectedly.")
+            break
+        if time.monotonic() >= deadline:
+            print(f"⏳ Run deadline of {deadline_seconds:.0f}s reached.")
+            break
+    streaming_pull.cancel()
+    streaming_pull.close()
+    tracker.print_report()
+    return tracker.complete()
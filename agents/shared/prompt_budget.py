@@ -0,0 +1,198 @@
+import json
+import re
+import threading
+
+from shared.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Issue fields the prompts actually use; anything else a review carries is dropped
+REVIEW_ISSUE_FIELDS = ("type", "line", "description")
+REVIEW_DESCRIPTION_CHARS = 240
+
+TRACEBACK_START = "Traceback (most recent call last):"
+_FRAME = re.compile(r'^\s*File "[^"]*", line \d+, in ')
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def shorten(text: str, max_chars: int) -> str:
+    text = str(text)
+    return text if len(text) <= max_chars else text[:max(0, max_chars - 1)].rstrip() + "…"
+
+
+def collapse_repeated_lines(lines: list, min_run: int = 3) -> list:
+    """Replace runs of at least `min_run` identical lines with the line and a repeat count."""
+    out, index = [], 0
+    while index < len(lines):
+        end = index
+        while end + 1 < len(lines) and lines[end + 1] == lines[index]:
+            end += 1
+        run = end - index + 1
+        if run >= min_run:
+            out += [lines[index], f"[previous line repeated {run - 1} more times]"]
+        else:
+            out += lines[index:end + 1]
+        index = end + 1
+    return out
+
+
+def _frames(lines: list) -> list:
+    """Split lines into frames (a `File ...` line plus the indented source under it) and other single lines."""
+    groups = []
+    for line in lines:
+        if _FRAME.match(line) or not groups or not line[:1].isspace() or not _FRAME.match(groups[-1][0]):
+            groups.append([line])
+        else:
+            groups[-1].append(line)
+    return groups
+
+
+def collapse_repeated_frames(lines: list) -> list:
+    """Collapse consecutive identical stack frames, e.g. from recursion or retry loops."""
+    out, previous, repeats = [], None, 0
+    for frame in _frames(lines) + [None]:
+        if frame is not None and frame == previous and _FRAME.match(frame[0]):
+            repeats += 1
+            continue
+        if repeats:
+            out.append(f"  [previous frame repeated {repeats} more times]")
+            repeats = 0
+        if frame is not None:
+            out += frame
+        previous = frame
+    return out
+
+
+def collapse_repeated_tracebacks(text: str) -> str:
+    """Keep the first copy of each distinct traceback and replace later copies with a marker."""
+    parts = text.split(TRACEBACK_START)
+    seen, out = {}, [parts[0]]
+    for part in parts[1:]:
+        # A traceback runs up to its exception line; whatever follows is ordinary output
+        lines = part.split("\n")
+        end = next((i for i, line in enumerate(lines) if i and line and not line[0].isspace()), len(lines) - 1)
+        body = "\n".join(lines[:end + 1])
+        rest = part[len(body):]
+        if body in seen:
+            seen[body] += 1
+            out.append(f"[traceback identical to #{list(seen).index(body) + 1} omitted]" + rest)
+        else:
+            seen[body] = 1
+            out.append(TRACEBACK_START + body + rest)
+    return "".join(out)
+
+
+def keep_head_and_tail(text: str, max_tokens: int, head_share: float = 0.3) -> str:
+    """Cut the middle of `text` at line boundaries so it fits `max_tokens`; the tail usually holds the verdict."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens * CHARS_PER_TOKEN - 64)
+    head_chars = int(budget * head_share)
+    head = text[:head_chars].rsplit("\n", 1)[0] if "\n" in text[:head_chars] else text[:head_chars]
+    tail_start = len(text) - (budget - len(head))
+    tail = text[tail_start:].split("\n", 1)[-1] if "\n" in text[tail_start:] else text[tail_start:]
+    # Lines neither kept in the head nor in the tail
+    omitted = max(0, text.count("\n") - head.count("\n") - tail.count("\n") - 1)
+    return f"{head}\n... [{omitted} lines omitted] ...\n{tail}"
+
+
+def compress_test_output(text: str, max_tokens: int) -> str:
+    """Shrink test output for a prompt: drop repeated tracebacks, frames and lines, then keep head and tail."""
+    if not text:
+        return text or ""
+    text = collapse_repeated_tracebacks(text)
+    lines = collapse_repeated_frames(collapse_repeated_lines(text.split("\n")))
+    return keep_head_and_tail("\n".join(lines), max_tokens)
+
+
+def fit_json(value: dict, max_tokens: int) -> dict:
+    """Drop items from the end of the longest lists until the compact JSON fits; records `<key>_omitted` counts."""
+    value = dict(value)
+    while estimate_tokens(compact_json(value)) > max_tokens:
+        lists = [key for key, item in value.items() if isinstance(item, list) and item]
+        if not lists:
+            break
+        key = max(lists, key=lambda k: len(compact_json(value[k])))
+        value[key] = value[key][:-1]
+        # Counted inside the loop so the counts themselves fit the budget too
+        value[f"{key}_omitted"] = value.get(f"{key}_omitted", 0) + 1
+    return value
+
+
+def review_fields(review: dict) -> dict:
+    """Only the parts of a review a prompt can embed: `type`/`line`/`description` per issue and the summary."""
+    issues = [{field: issue[field] for field in REVIEW_ISSUE_FIELDS if issue.get(field) not in (None, "")}
+              for issue in review.get("issues", []) if isinstance(issue, dict)]
+    return {"issues": issues, "summary": review.get("summary", "")}
+
+
+def trim_review(review: dict, max_tokens: int) -> dict:
+    """The parts of a code review worth prompting with, within `max_tokens` of compact JSON.
+
+    Keeps only `type`/`line`/`description` per issue and the summary. If
+    that is still too large it shortens descriptions, caps the summary at a
+    third of the budget, and then drops issues from the end (the model
+    lists the important ones first).
+    """
+    if not review:
+        return review
+    trimmed = review_fields(review)
+    if estimate_tokens(compact_json(trimmed)) <= max_tokens:
+        return trimmed
+    for issue in trimmed["issues"]:
+        if "description" in issue:
+            issue["description"] = shorten(issue["description"], REVIEW_DESCRIPTION_CHARS)
+    trimmed["summary"] = shorten(trimmed["summary"], max_tokens * CHARS_PER_TOKEN // 3)
+    return fit_json(trimmed, max_tokens)
+
+
+class PromptBudget:
+    """Per-agent prompt token budget plus counters of tokens sent and saved by compaction.
+
+    Sections are compacted through the budget so each saving is measured
+    against what the prompt used to embed (indented JSON, raw output).
+    `finish(prompt)` records one call.
+    """
+
+    def __init__(self, name: str, max_tokens: int):
+        self.name = name
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._pending = threading.local()
+        self._stats = {"calls": 0, "tokens_in": 0, "tokens_saved": 0, "max_prompt_tokens": 0, "over_budget": 0}
+
+    def _saved(self, before: str, after: str) -> str:
+        self._pending.saved = getattr(self._pending, "saved", 0) + estimate_tokens(before) - estimate_tokens(after)
+        return after
+
+    def json(self, value, max_tokens: int = None, trim=fit_json) -> str:
+        """Compact JSON of `value`, trimmed to `max_tokens` (default: the whole budget) when it is a dict."""
+        before = json.dumps(value, indent=2, default=str)
+        if isinstance(value, dict):
+            value = trim(value, max_tokens or self.max_tokens)
+        return self._saved(before, compact_json(value))
+
+    def review(self, review: dict, max_tokens: int = None) -> str:
+        return self.json(review, max_tokens, trim=trim_review)
+
+    def test_output(self, text: str, max_tokens: int = None) -> str:
+        return self._saved(text or "", compress_test_output(text, max_tokens or self.max_tokens))
+
+    def finish(self, prompt: str) -> str:
+        """Record one prompt (its size and what its sections saved) and return it unchanged."""
+        tokens = estimate_tokens(prompt)
+        saved, self._pending.saved = getattr(self._pending, "saved", 0), 0
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["tokens_in"] += tokens
+            self._stats["tokens_saved"] += max(0, saved)
+            self._stats["max_prompt_tokens"] = max(self._stats["max_prompt_tokens"], tokens)
+            self._stats["over_budget"] += tokens > self.max_tokens
+        return prompt
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, agent=self.name, budget=self.max_tokens)
+        stats["avg_tokens_in"] = round(stats["tokens_in"] / stats["calls"]) if stats["calls"] else 0
+        return stats
@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# Batching for the process-wide PublisherClient. Messages are sent when any limit is reached.
+BATCH_MAX_MESSAGES = int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", "100"))
+BATCH_MAX_BYTES = int(os.getenv("PUBSUB_BATCH_MAX_BYTES", str(1024 * 1024)))
+BATCH_MAX_LATENCY = float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", "0.05"))
+FLUSH_TIMEOUT = float(os.getenv("PUBSUB_FLUSH_TIMEOUT", "60"))
+
+_lock = threading.Lock()
+_client = None
+_pending = set()
+_stats = {"published": 0, "failed": 0}
+_failures = []
+
+
+class InMemoryPublisher:
+    """Stand-in for `pubsub_v1.PublisherClient` that records messages instead of sending them."""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def topic_path(self, project_id: str, topic_id: str) -> str:
+        return f"projects/{project_id}/topics/{topic_id}"
+
+    def publish(self, topic: str, data: bytes, **attributes) -> Future:
+        future = Future()
+        with self._lock:
+            self.messages.append({"topic": topic, "data": data, "attributes": attributes})
+            message_id = str(len(self.messages))
+        future.set_result(message_id)
+        return future
+
+
+def _create_client():
+    from shared.transport import TRANSPORT, BrokerPublisher, get_broker
+    if TRANSPORT != "pubsub":
+        return BrokerPublisher(get_broker())
+
+    # Honors PUBSUB_EMULATOR_HOST, so the same code runs against the local emulator
+    from google.cloud import pubsub_v1
+
+    batch_settings = pubsub_v1.types.BatchSettings(
+        max_messages=BATCH_MAX_MESSAGES,
+        max_bytes=BATCH_MAX_BYTES,
+        max_latency=BATCH_MAX_LATENCY,
+    )
+    return pubsub_v1.PublisherClient(batch_settings=batch_settings)
+
+
+def get_publisher():
+    """Return the process-wide publisher, creating it on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _create_client()
+        return _client
+
+
+def set_publisher(client):
+    """Replace the process-wide publisher (e.g. with InMemoryPublisher). Returns the previous one."""
+    global _client
+    with _lock:
+        previous, _client = _client, client
+    return previous
+
+
+def publish(project_id: str, topic_id: str, data: bytes, label: str = "message", **attributes):
+    """Queue a message on the shared publisher without waiting for the broker.
+
+    Completion is tracked through a done-callback; call `flush()` (also run at
+    exit) to wait for everything that is still in flight.
+    """
+    client = get_publisher()
+    future = client.publish(client.topic_path(project_id, topic_id), data=data, **attributes)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(lambda f: _on_done(f, label))
+    return future
+
+
+def _on_done(future, label: str):
+    error = future.exception()
+    with _lock:
+        _pending.discard(future)
+        if error is None:
+            _stats["published"] += 1
+        else:
+            _stats["failed"] += 1
+            _failures.append({"label": label, "error": str(error)})
+    if error is None:
+        print(f"📬 Published {label} (message ID: {future.result()})")
+    else:
+        print(f"❌ Failed to publish {label}: {error}")
+
+
+def publish_stats() -> dict:
+    with _lock:
+        return {**_stats, "pending": len(_pending), "failures": list(_failures)}
+
+
+def flush(timeout: float = FLUSH_TIMEOUT) -> dict:
+    """Wait until every queued message is acknowledged by the broker or has failed."""
+    deadline = time.monotonic() + timeout
+    with _lock:
+        pending = list(_pending)
+    for future in pending:
+        try:
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception:
+            pass  # failures are recorded by the done-callback
+
+    stats = publish_stats()
+    if stats["pending"]:
+        print(f"⏳ {stats['pending']} Pub/Sub message(s) still unacknowledged after {timeout:.0f}s.")
+    if stats["failures"]:
+        print(f"❌ {len(stats['failures'])} Pub/Sub publish(es) failed:")
+        for failure in stats["failures"]:
+            print(f"   - {failure['label']}: {failure['error']}")
+    return stats
+
+
+def _flush_at_exit():
+    with _lock:
+        has_pending = bool(_pending)
+    if has_pending:
+        flush()
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,10 @@
+# Gemini averages roughly four characters of source code per token. A cheap
+# estimate is enough for budgeting; exact counts would cost an API round trip.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of model tokens in `text`."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
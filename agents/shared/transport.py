@@ -0,0 +1,424 @@
+import base64
+import itertools
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from shared.cache import CACHE_ROOT
+
+# pubsub (default), memory (agents in one process) or file (durable queues on disk shared by local processes)
+TRANSPORT = os.getenv("AGENT_TRANSPORT", "pubsub").lower()
+TRANSPORT_DIR = os.getenv("AGENT_TRANSPORT_DIR") or os.path.join(CACHE_ROOT, "transport")
+# Deliveries of a nacked message before it is dropped (moved to dead/ by the file backend)
+MAX_DELIVERY_ATTEMPTS = int(os.getenv("AGENT_TRANSPORT_MAX_DELIVERIES", "5"))
+# File backend: a claimed message that is not settled within this many seconds is redelivered
+ACK_DEADLINE_SECONDS = float(os.getenv("AGENT_TRANSPORT_ACK_DEADLINE", "600"))
+POLL_SECONDS = float(os.getenv("AGENT_TRANSPORT_POLL_SECONDS", "0.2"))
+
+BACKENDS = ("pubsub", "memory", "file")
+if TRANSPORT not in BACKENDS:
+    raise EnvironmentError(f"❌ AGENT_TRANSPORT must be one of {', '.join(BACKENDS)}, not '{TRANSPORT}'.")
+
+
+def parse_routes(spec: str) -> dict:
+    """Parse "topic=sub1,sub2;topic2=sub3" into {topic: [subscriptions]}."""
+    routes = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        topic, _, subscriptions = entry.partition("=")
+        routes[topic.strip()] = [sub.strip() for sub in subscriptions.split(",") if sub.strip()]
+    return routes
+
+
+def default_routes() -> dict:
+    """Which subscriptions receive each topic, mirroring the Pub/Sub setup in the README.
+
+    AGENT_TRANSPORT_ROUTES replaces the map entirely, e.g.
+    "code_review_done=test_generator_sub;test_generation_done=cicd_listener_sub,security_agent_sub".
+    """
+    if os.getenv("AGENT_TRANSPORT_ROUTES"):
+        return parse_routes(os.environ["AGENT_TRANSPORT_ROUTES"])
+    return {
+        os.getenv("PUBSUB_TOPIC", "code_review_done"): [os.getenv("TEST_GEN_SUBSCRIPTION_ID", "test_generator_sub")],
+        os.getenv("TEST_GEN_OUTPUT_TOPIC", "test_generation_done"): [
+            os.getenv("CICD_SUBSCRIPTION_ID", "cicd_listener_sub"),
+            os.getenv("SECURITY_SUBSCRIPTION_ID", "security_agent_sub"),
+        ],
+    }
+
+
+class Message:
+    """A delivered message with the parts of the Pub/Sub message API the agents use."""
+
+    def __init__(self, data: bytes, attributes: dict, message_id: str, delivery_attempt: int, on_ack, on_nack):
+        self.data = data
+        self.attributes = attributes
+        self.message_id = message_id
+        self.delivery_attempt = delivery_attempt
+        self._on_ack = on_ack
+        self._on_nack = on_nack
+        self._lock = threading.Lock()
+        self.settled = False
+
+    def _settle(self, action):
+        with self._lock:
+            if self.settled:
+                return
+            self.settled = True
+        action()
+
+    def ack(self):
+        self._settle(self._on_ack)
+
+    def nack(self):
+        self._settle(self._on_nack)
+
+
+class InMemoryBroker:
+    """Topic fan-out onto one in-process queue per subscription.
+
+    Every routed copy stays outstanding until it is acked (or dropped after
+    MAX_DELIVERY_ATTEMPTS), so `wait_idle()` returns exactly when the
+    pipeline has nothing left to do.
+    """
+
+    def __init__(self, routes: dict = None):
+        self.routes = routes if routes is not None else default_routes()
+        self._queues = {}
+        self._ids = itertools.count(1)
+        self._idle = threading.Condition()
+        self._outstanding = 0
+        self._stats = {"published": 0, "delivered": 0, "acked": 0, "nacked": 0, "dropped": 0, "unrouted": 0}
+
+    def _queue(self, subscription_id: str) -> queue.Queue:
+        with self._idle:
+            return self._queues.setdefault(subscription_id, queue.Queue())
+
+    def _count(self, key: str, outstanding: int = 0):
+        with self._idle:
+            self._stats[key] += 1
+            self._outstanding += outstanding
+            if not self._outstanding:
+                self._idle.notify_all()
+
+    def publish(self, topic_id: str, data: bytes, attributes: dict) -> str:
+        message_id = str(next(self._ids))
+        subscriptions = self.routes.get(topic_id, [])
+        if not subscriptions:
+            print(f"⚠️ No subscription is routed from topic '{topic_id}'; message {message_id} dropped.")
+            self._count("unrouted")
+        for subscription_id in subscriptions:
+            self._count("published", outstanding=1)
+            self._queue(subscription_id).put((message_id, data, dict(attributes), 1))
+        return message_id
+
+    def pull(self, subscription_id: str, timeout: float):
+        try:
+            message_id, data, attributes, attempt = self._queue(subscription_id).get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self._count("delivered")
+
+        def nack():
+            if attempt >= MAX_DELIVERY_ATTEMPTS:
+                print(f"❌ Dropping message {message_id} on '{subscription_id}' after {attempt} deliveries.")
+                self._count("dropped", outstanding=-1)
+                return
+            self._count("nacked")
+            self._queue(subscription_id).put((message_id, data, attributes, attempt + 1))
+
+        return Message(data, attributes, message_id, attempt,
+                       on_ack=lambda: self._count("acked", outstanding=-1), on_nack=nack)
+
+    def outstanding(self) -> int:
+        with self._idle:
+            return self._outstanding
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._outstanding, timeout)
+
+    def stats(self) -> dict:
+        with self._idle:
+            return dict(self._stats, outstanding=self._outstanding)
+
+
+class FileBroker:
+    """Durable queues under `root`: <subscription>/ready, claimed and dead, one JSON file per message.
+
+    Publishing writes each copy atomically into ready/. A consumer claims a
+    message by renaming it into claimed/, which only one process can win, so
+    any number of local agent processes can share the directory. Acked
+    messages are deleted; claims older than ACK_DEADLINE_SECONDS (a consumer
+    that died) go back to ready/.
+    """
+
+    def __init__(self, root: str = TRANSPORT_DIR, routes: dict = None):
+        self.root = root
+        self.routes = routes if routes is not None else default_routes()
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "delivered": 0, "acked": 0, "nacked": 0, "dropped": 0, "unrouted": 0}
+        self._last_reclaim = {}
+
+    def _dir(self, subscription_id: str, state: str) -> str:
+        path = os.path.join(self.root, subscription_id, state)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _write(self, directory: str, name: str, record: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(directory), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    def publish(self, topic_id: str, data: bytes, attributes: dict) -> str:
+        message_id = uuid.uuid4().hex
+        subscriptions = self.routes.get(topic_id, [])
+        if not subscriptions:
+            print(f"⚠️ No subscription is routed from topic '{topic_id}'; message {message_id} dropped.")
+            self._count("unrouted")
+        # Names sort by publish time, so each subscription is consumed roughly in order
+        name = f"{time.time_ns():020d}-{message_id}.json"
+        record = {"id": message_id, "data": base64.b64encode(data).decode("ascii"),
+                  "attributes": dict(attributes), "attempt": 1}
+        for subscription_id in subscriptions:
+            self._write(self._dir(subscription_id, "ready"), name, record)
+            self._count("published")
+        return message_id
+
+    def _reclaim_expired(self, subscription_id: str):
+        now = time.time()
+        if now - self._last_reclaim.get(subscription_id, 0.0) < ACK_DEADLINE_SECONDS / 10:
+            return
+        self._last_reclaim[subscription_id] = now
+        claimed, ready = self._dir(subscription_id, "claimed"), self._dir(subscription_id, "ready")
+        for name in os.listdir(claimed):
+            try:
+                if now - os.path.getmtime(os.path.join(claimed, name)) > ACK_DEADLINE_SECONDS:
+                    os.rename(os.path.join(claimed, name), os.path.join(ready, name))
+                    print(f"⏳ Redelivering {name} on '{subscription_id}': its claim expired.")
+            except FileNotFoundError:
+                pass  # settled meanwhile
+
+    def _claim(self, subscription_id: str):
+        ready, claimed = self._dir(subscription_id, "ready"), self._dir(subscription_id, "claimed")
+        for name in sorted(os.listdir(ready)):
+            path = os.path.join(claimed, name)
+            try:
+                os.rename(os.path.join(ready, name), path)
+            except FileNotFoundError:
+                continue  # another consumer won it
+            os.utime(path)  # the claim's age starts now
+            with open(path, "r", encoding="utf-8") as f:
+                return name, path, json.load(f)
+        return None
+
+    def pull(self, subscription_id: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            self._reclaim_expired(subscription_id)
+            claim = self._claim(subscription_id)
+            if claim is not None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(POLL_SECONDS, remaining))
+        name, path, record = claim
+        self._count("delivered")
+
+        def ack():
+            os.remove(path)
+            self._count("acked")
+
+        def nack():
+            attempt = record["attempt"]
+            if attempt >= MAX_DELIVERY_ATTEMPTS:
+                print(f"❌ Moving message {record['id']} on '{subscription_id}' to dead/ after {attempt} deliveries.")
+                os.replace(path, os.path.join(self._dir(subscription_id, "dead"), name))
+                self._count("dropped")
+                return
+            self._write(self._dir(subscription_id, "ready"), name, dict(record, attempt=attempt + 1))
+            os.remove(path)
+            self._count("nacked")
+
+        return Message(base64.b64decode(record["data"]), record["attributes"], record["id"], record["attempt"],
+                       on_ack=ack, on_nack=nack)
+
+    def outstanding(self) -> int:
+        total = 0
+        for subscriptions in self.routes.values():
+            for subscription_id in subscriptions:
+                total += len(os.listdir(self._dir(subscription_id, "ready")))
+                total += len(os.listdir(self._dir(subscription_id, "claimed")))
+        return total
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.outstanding():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_SECONDS)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, outstanding=self.outstanding())
+
+
+_lock = threading.Lock()
+_broker = None
+
+
+def get_broker():
+    """The process-wide broker of the memory/file transport, created on first use (None for Pub/Sub)."""
+    global _broker
+    if TRANSPORT == "pubsub":
+        return None
+    with _lock:
+        if _broker is None:
+            _broker = InMemoryBroker() if TRANSPORT == "memory" else FileBroker()
+        return _broker
+
+
+def set_broker(broker):
+    """Replace the process-wide broker. Returns the previous one."""
+    global _broker
+    with _lock:
+        previous, _broker = _broker, broker
+    return previous
+
+
+class BrokerPublisher:
+    """`PublisherClient` look-alike that hands messages straight to a local broker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def topic_path(self, project_id: str, topic_id: str) -> str:
+        return f"projects/{project_id}/topics/{topic_id}"
+
+    def publish(self, topic: str, data: bytes, **attributes) -> Future:
+        future = Future()
+        try:
+            future.set_result(self.broker.publish(topic.rsplit("/", 1)[-1], data, attributes))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class LocalPull:
+    """Delivers a broker subscription to `callback(message)` on a thread pool.
+
+    Behaves like the StreamingPullFuture returned by `SubscriberClient.subscribe`:
+    `result(timeout)` blocks until cancelled, `cancel()` stops pulling and waits
+    for callbacks in flight. At most `max_messages` are leased at once; a
+    message the callback neither acks nor nacks is nacked.
+    """
+
+    def __init__(self, broker, subscription_id: str, callback, workers: int = 1, max_messages: int = None):
+        self.broker = broker
+        self.subscription_id = subscription_id
+        self.callback = callback
+        self._slots = threading.BoundedSemaphore(max_messages or workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=subscription_id)
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"pull-{subscription_id}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if not self._slots.acquire(timeout=POLL_SECONDS):
+                    continue
+                message = self.broker.pull(self.subscription_id, timeout=POLL_SECONDS)
+                if message is None:
+                    self._slots.release()
+                    continue
+                self._executor.submit(self._deliver, message)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._finished.set()
+
+    def _deliver(self, message: Message):
+        try:
+            self.callback(message)
+        except Exception as e:
+            print(f"❌ Subscriber callback on '{self.subscription_id}' failed: {e}")
+        finally:
+            message.nack()  # no-op once the callback settled it
+            self._slots.release()
+
+    def result(self, timeout: float = None):
+        if not self._finished.wait(timeout):
+            raise TimeoutError()
+
+    def cancel(self):
+        self._stop.set()
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def close(self):
+        self.cancel()
+        self.result()
+
+
+class PubSubPull:
+    """A Pub/Sub streaming pull together with the SubscriberClient that owns it."""
+
+    def __init__(self, project_id: str, subscription_id: str, callback, workers: int = None,
+                 max_messages: int = None, max_bytes: int = None, await_callbacks_on_shutdown: bool = False):
+        from google.cloud import pubsub_v1
+        from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+
+        options = {"await_callbacks_on_shutdown": await_callbacks_on_shutdown}
+        if max_messages or max_bytes:
+            limits = {key: value for key, value in (("max_messages", max_messages), ("max_bytes", max_bytes)) if value}
+            options["flow_control"] = pubsub_v1.types.FlowControl(**limits)
+        if workers:
+            options["scheduler"] = ThreadScheduler(
+                executor=ThreadPoolExecutor(max_workers=workers, thread_name_prefix=subscription_id))
+        self._client = pubsub_v1.SubscriberClient()
+        self._future = self._client.subscribe(self._client.subscription_path(project_id, subscription_id),
+                                              callback=callback, **options)
+
+    def result(self, timeout: float = None):
+        return self._future.result(timeout=timeout)
+
+    def cancel(self):
+        self._future.cancel()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def close(self):
+        self._client.close()
+
+
+def subscribe(project_id: str, subscription_id: str, callback, workers: int = None, max_messages: int = None,
+              max_bytes: int = None, await_callbacks_on_shutdown: bool = False):
+    """Start delivering `subscription_id` to `callback(message)` on the configured transport.
+
+    Returns a streaming-pull handle with `result(timeout)`, `cancel()`,
+    `done()` and `close()`; `result` raises TimeoutError while still running.
+    """
+    if TRANSPORT == "pubsub":
+        return PubSubPull(project_id, subscription_id, callback, workers, max_messages, max_bytes,
+                          await_callbacks_on_shutdown)
+    return LocalPull(get_broker(), subscription_id, callback, workers or 1, max_messages)
+
+
+def drain(timeout: float = None) -> bool:
+    """Wait until every routed message has been settled. Always False for Pub/Sub, which cannot tell."""
+    broker = get_broker()
+    return broker.wait_idle(timeout) if broker is not None else False
@@ -0,0 +1,76 @@
+"""Message size and stale-message filter cost: legacy JSON bodies vs the shared codec envelope.
+
+Usage: python benchmarks/codec_bench.py [--iterations N]
+
+Uses a representative test result (report, output and review summary);
+nothing talks to Google Cloud.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+from shared.codec import decode, encode, run_id_of  # noqa: E402
+
+
+class Message:
+    def __init__(self, data: bytes, attributes: dict = None):
+        self.data = data
+        self.attributes = attributes or {}
+
+
+def sample_result() -> dict:
+    tests = [{"id": f"test_app.TestApp.test_case_{i}", "status": "passed" if i % 5 else "failed",
+              "duration_seconds": 0.001, "message": "" if i % 5 else "AssertionError: 3 != 4"} for i in range(40)]
+    output = "\n".join(f"test_case_{i} (test_app.TestApp.test_case_{i}) ... ok" for i in range(40))
+    return {
+        "file_path": "src/app/services/payments.py",
+        "language": "python",
+        "test_output": output + "\n" + "-" * 70 + "\nRan 40 tests in 0.040s\n\nFAILED (failures=8)",
+        "test_run": {"status": "failed", "returncode": 1, "duration_seconds": 0.41},
+        "test_report": {"version": 1, "status": "failed",
+                        "summary": {"total": 40, "passed": 32, "failed": 8, "error": 0, "skipped": 0},
+                        "tests": tests},
+        "dependencies": ["requests", "pydantic"],
+        "review_summary": {"issues": [{"line": i, "severity": "medium", "message": "Consider validating the input "
+                                       "amount before converting currencies."} for i in range(12)],
+                           "summary": "Mostly fine; input validation is missing in several places."},
+        "code_ref": {"digest": "ab" * 32, "size": 18234, "encoding": "utf-8"},
+        "run_id": "1234567890",
+    }
+
+
+def per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = sample_result()
+    legacy = Message(json.dumps(payload).encode("utf-8"))
+    body, attributes = encode(payload)
+    envelope = Message(body, attributes)
+
+    legacy_filter = per_call_us(lambda: json.loads(legacy.data.decode("utf-8")).get("run_id") != "other",
+                                args.iterations)
+    envelope_filter = per_call_us(lambda: run_id_of(envelope) != "other", args.iterations)
+    envelope_decode = per_call_us(lambda: decode(envelope.data, envelope.attributes), args.iterations // 10)
+
+    print(f"{'':<22}{'legacy':>12}{'envelope':>12}")
+    print(f"{'body bytes':<22}{len(legacy.data):>12}{len(envelope.data):>12}"
+          f"   ({len(legacy.data) / len(envelope.data):.1f}x smaller)")
+    print(f"{'stale filter (us)':<22}{legacy_filter:>12.2f}{envelope_filter:>12.2f}")
+    print(f"{'full decode (us)':<22}{legacy_filter:>12.2f}{envelope_decode:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
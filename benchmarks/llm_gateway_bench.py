@@ -0,0 +1,79 @@
+"""Model calls under a concurrency quota and with a slow tail: direct calls vs the shared LLM gateway.
+
+Usage: python benchmarks/llm_gateway_bench.py [--calls N] [--workers N] [--capacity N]
+
+Runs against the gateway's FakeModel (simulated latency, 429s beyond
+`capacity` concurrent calls, a share of slow calls); nothing talks to Vertex AI.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+from shared.llm_gateway import AdaptiveLimiter, FakeModel, LLMGateway  # noqa: E402
+
+
+def run(call, calls: int, workers: int) -> dict:
+    """Issue `calls` calls from `workers` threads; returns successes, wall time and per-call latencies."""
+    def one(_):
+        started = time.perf_counter()
+        try:
+            call("prompt")
+            return time.perf_counter() - started
+        except Exception:
+            return None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = [latency for latency in pool.map(one, range(calls)) if latency is not None]
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "seconds": time.perf_counter() - started,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0,
+    }
+
+
+def gateway(model, initial: int = 4, **kwargs) -> LLMGateway:
+    limiter = AdaptiveLimiter(initial=initial, minimum=1, maximum=32, latency_target=0)
+    return LLMGateway("bench", model, limiter=limiter, max_attempts=8, timeout=30, **kwargs)
+
+
+def report(label: str, result: dict, calls: int, extra: str = ""):
+    print(f"{label:<28}{result['ok']:>6}/{calls:<6}{result['seconds']:>9.2f}s"
+          f"{result['ok'] / result['seconds']:>10.1f}/s{result['p99'] * 1000:>10.0f}ms  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent calls the fake quota allows")
+    args = parser.parse_args()
+
+    print(f"{'':<28}{'ok':>13}{'wall':>10}{'rate':>12}{'p99':>10}")
+    print(f"Quota of {args.capacity} concurrent calls, {args.workers} callers:")
+    model = FakeModel(latency=0.05, capacity=args.capacity, seed=1)
+    report("  direct", run(model.generate_content, args.calls, args.workers), args.calls,
+           f"{model.rejected} rejected")
+    model = FakeModel(latency=0.05, capacity=args.capacity, seed=1)
+    llm = gateway(model)
+    report("  gateway (AIMD + retries)", run(llm.generate_content, args.calls, args.workers), args.calls,
+           f"{model.rejected} rejected, limit {llm.limiter.stats()['limit']}")
+
+    # Hedges only go out while the limit has room, so the callers stay below it here
+    callers = max(1, args.workers // 4)
+    print(f"5% of calls take 1s, no quota, {callers} callers:")
+    for label, hedge_after in (("  gateway", 0), ("  gateway + hedge at 0.2s", 0.2)):
+        llm = gateway(FakeModel(latency=0.05, slow_rate=0.05, slow_latency=1.0, seed=2), initial=32,
+                      hedge_after=hedge_after)
+        result = run(llm.generate_content, args.calls, callers)
+        stats = llm.stats()
+        report(label, result, args.calls, f"{stats['hedges']} hedges, {stats['hedge_wins']} won")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Startup latency of each agent: interpreter start to an imported, ready-to-work `main` module.
+
+Usage: python benchmarks/startup_bench.py [--runs N] [--importtime] [agent ...]
+
+Each run is a fresh interpreter with dummy project settings, so nothing here
+talks to Google Cloud. `import` is the time spent importing main.py,
+`process` the wall time of the whole interpreter. --importtime prints the
+slowest imports of one extra run (python -X importtime).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+AGENTS = ["code-review-agent", "Test_generator", "CICD_agent", "SecurityAgent"]
+PROBE = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def bench_env(cache_dir: str) -> dict:
+    env = os.environ.copy()
+    env.update({
+        "PROJECT_ID": env.get("PROJECT_ID", "startup-bench"),
+        "VERTEX_PROJECT_ID": env.get("VERTEX_PROJECT_ID", "startup-bench"),
+        "VERTEX_LOCATION": env.get("VERTEX_LOCATION", "us-central1"),
+        "PUBSUB_TOPIC": env.get("PUBSUB_TOPIC", "startup-bench"),
+        "AGENT_CACHE_DIR": cache_dir,
+    })
+    return env
+
+
+def run_once(agent_dir: str, env: dict) -> tuple:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=agent_dir, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1]), wall
+
+
+def slowest_imports(agent_dir: str, env: dict, limit: int = 10) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=agent_dir, env=env,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <module>"; the header row is not numeric
+        fields = line.partition("import time:")[2].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        rows.append((int(fields[1]), fields[2].strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("agents", nargs="*", default=AGENTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as cache_dir:
+        env = bench_env(cache_dir)
+        print(f"{'agent':<20}{'import median':>15}{'import min':>12}{'process median':>16}")
+        for agent in args.agents:
+            agent_dir = os.path.join(REPO_ROOT, "agents", agent)
+            try:
+                samples = [run_once(agent_dir, env) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{agent:<20}failed: {e}")
+                continue
+            imports = [imp for imp, _ in samples]
+            walls = [wall for _, wall in samples]
+            print(f"{agent:<20}{statistics.median(imports) * 1000:>13.1f}ms{min(imports) * 1000:>10.1f}ms"
+                  f"{statistics.median(walls) * 1000:>14.1f}ms")
+            if args.importtime:
+                for cumulative_us, name in slowest_imports(agent_dir, env):
+                    print(f"    {cumulative_us / 1000:>8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Throughput of the local transports over the pipeline's two hops (review -> tests -> CI/CD + security).
+
+Usage: python benchmarks/transport_bench.py [--messages N] [--size BYTES] [transport ...]
+
+Each run relays N messages through the same topic/subscription map the
+agents use, with no-op agents, so the numbers are pure transport overhead.
+Pub/Sub is not measured here; it needs a project (or the emulator).
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRANSPORTS = ["memory", "file"]
+
+PROBE = """
+import sys, time
+from shared import transport
+from shared.publisher import publish, flush
+
+count, size = int(sys.argv[1]), int(sys.argv[2])
+
+def relay(message):
+    publish("bench", "test_generation_done", message.data, label="test result")
+    message.ack()
+
+subscriptions = [
+    transport.subscribe("bench", "test_generator_sub", relay, workers=4),
+    transport.subscribe("bench", "cicd_listener_sub", lambda message: message.ack()),
+    transport.subscribe("bench", "security_agent_sub", lambda message: message.ack()),
+]
+payload = b"x" * size
+started = time.perf_counter()
+for _ in range(count):
+    publish("bench", "code_review_done", payload, label="review")
+flush()
+transport.drain()
+elapsed = time.perf_counter() - started
+for subscription in subscriptions:
+    subscription.close()
+print(elapsed)
+"""
+
+
+def run(transport: str, messages: int, size: int, queue_dir: str) -> float:
+    env = dict(os.environ, AGENT_TRANSPORT=transport, AGENT_TRANSPORT_DIR=queue_dir, AGENT_TRANSPORT_POLL_SECONDS="0.01",
+               AGENT_TRANSPORT_ROUTES="", PUBSUB_TOPIC="code_review_done", TEST_GEN_OUTPUT_TOPIC="test_generation_done")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.join(REPO_ROOT, "agents"), env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", PROBE, str(messages), str(size)], env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "run failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transports", nargs="*", default=TRANSPORTS)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=4096, help="Payload bytes per message")
+    args = parser.parse_args()
+
+    print(f"{'transport':<12}{'seconds':>10}{'messages/s':>14}")
+    for transport in args.transports:
+        with tempfile.TemporaryDirectory(prefix="transport-bench-") as queue_dir:
+            try:
+                elapsed = run(transport, args.messages, args.size, queue_dir)
+            except RuntimeError as e:
+                print(f"{transport:<12}failed: {e}")
+                continue
+        print(f"{transport:<12}{elapsed:>10.3f}{args.messages / elapsed:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
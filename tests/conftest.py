@@ -0,0 +1,44 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+# The agents import shared code as `shared.<module>` with agents/ on sys.path (see each agent's config.py)
+AGENTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "agents"))
+if AGENTS_DIR not in sys.path:
+    sys.path.insert(0, AGENTS_DIR)
+
+# Keep caches, spools and lease files written by agent modules out of the checkout
+os.environ.setdefault("AGENT_CACHE_DIR", tempfile.mkdtemp(prefix="agent-cache-"))
+
+_agent_modules = {}
+
+
+def load_agent_module(agent: str, module: str = "main"):
+    """Import agents/<agent>/<module>.py once per session.
+
+    Every agent has its own `config`, `utils` and `prompts`, so the agent's
+    directory goes first on sys.path while it loads and its modules are taken
+    out of sys.modules again afterwards, leaving other agents unaffected.
+    """
+    key = (agent, module)
+    if key in _agent_modules:
+        return _agent_modules[key]
+    os.environ.setdefault("VERTEX_PROJECT_ID", "test-project")
+    agent_dir = os.path.join(AGENTS_DIR, agent)
+    local = {os.path.splitext(name)[0] for name in os.listdir(agent_dir) if name.endswith(".py")}
+    saved = {name: sys.modules.pop(name) for name in local if name in sys.modules}
+    sys.path.insert(0, agent_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(f"{agent.replace('-', '_')}_{module}",
+                                                      os.path.join(agent_dir, f"{module}.py"))
+        loaded = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = loaded  # so its functions pickle for process pools
+        spec.loader.exec_module(loaded)
+    finally:
+        sys.path.remove(agent_dir)
+        for name in local:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+    _agent_modules[key] = loaded
+    return loaded
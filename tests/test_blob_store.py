@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+import pytest
+
+from shared import blob_store
+from shared.blob_store import BlobStore, LocalBlobBackend, resolve_code
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_STORE_URI", "file://" + str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "_store", None)
+    return blob_store.get_store()
+
+
+def test_resolve_code_round_trips_through_a_code_ref(store):
+    code = "def f():\n    return 'héllo'\n"
+    ref = store.put_text(code)
+    assert ref == {"digest": hashlib.sha256(code.encode()).hexdigest(), "size": len(code.encode()), "encoding": "utf-8"}
+    assert resolve_code({"file_name": "a.py", "code_ref": ref}) == code
+
+
+def test_resolve_code_falls_back_to_inline_code(store):
+    assert resolve_code({"file_name": "a.py", "code": "x = 1\n"}) == "x = 1\n"
+    assert resolve_code({"file_name": "a.py"}) is None
+
+
+def test_identical_contents_are_stored_once(tmp_path):
+    store = BlobStore(LocalBlobBackend(str(tmp_path)))
+    first, second = store.put_text("same"), store.put_text("same")
+    assert first == second
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 1
+
+
+def test_reads_fall_through_the_lru_to_the_backend(tmp_path):
+    store = BlobStore(LocalBlobBackend(str(tmp_path)), cache_entries=1)
+    old, new = store.put_text("old"), store.put_text("new")
+    assert list(store._cache) == [new["digest"]]
+    assert store.resolve_text(old) == "old"
+    assert list(store._cache) == [old["digest"]]
+
+
+def test_corrupt_blob_is_rejected(tmp_path):
+    backend = LocalBlobBackend(str(tmp_path))
+    ref = BlobStore(backend).put_text("original")
+    with open(backend._path(ref["digest"]), "wb") as f:
+        f.write(b"tampered")
+    with pytest.raises(ValueError, match="corrupt"):
+        BlobStore(backend).resolve_text(ref)
+
+
+def test_missing_blob_raises(store):
+    with pytest.raises(FileNotFoundError):
+        resolve_code({"code_ref": {"digest": "ab" + "0" * 62}})
+
+
+def test_unknown_scheme_is_refused(monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_STORE_URI", "s3://bucket/blobs")
+    monkeypatch.setattr(blob_store, "_store", None)
+    with pytest.raises(ValueError, match="s3://"):
+        blob_store.get_store()
@@ -0,0 +1,83 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from shared.bq_writer import BigQueryWriter, replay_spool
+
+SCHEMA = [SimpleNamespace(name="file_path", mode="REQUIRED"), SimpleNamespace(name="status", mode="NULLABLE")]
+
+
+class FakeClient:
+    def __init__(self, writer_box=None):
+        self.writer_box = writer_box
+        self.inserted = []
+        self.lock_held_during_lookup = None
+
+    def get_table(self, table_id):
+        writer = self.writer_box[0] if self.writer_box else None
+        if writer is not None:
+            self.lock_held_during_lookup = writer._lock.locked()
+        return SimpleNamespace(schema=SCHEMA)
+
+    def insert_rows_json(self, table_id, rows):
+        self.inserted.extend(rows)
+        return []
+
+
+def writer_for(tmp_path, client):
+    return BigQueryWriter("events", flush_rows=100, flush_interval=60, spool_dir=str(tmp_path),
+                          client_factory=lambda: client)
+
+
+def test_schema_is_loaded_without_holding_the_buffer_lock(tmp_path):
+    box = [None]
+    client = FakeClient(box)
+    writer = box[0] = writer_for(tmp_path, client)
+    writer.add({"file_path": "a.py", "status": "PASSED", "extra": 1})
+    assert client.lock_held_during_lookup is False
+    assert writer.flush() == 1 and client.inserted == [{"file_path": "a.py", "status": "PASSED"}]
+    writer.close()
+
+
+def test_row_missing_a_required_field_is_spooled_not_raised(tmp_path):
+    client = FakeClient()
+    writer = writer_for(tmp_path, client)
+    writer.add({"status": "PASSED"})
+    writer.add({"file_path": "b.py"})
+    assert writer.flush() == 1 and writer.spooled == 1
+    with open(tmp_path / "events.jsonl") as f:
+        assert [json.loads(line) for line in f] == [{"status": "PASSED"}]
+    writer.close()
+
+
+def test_schema_is_fetched_once_under_concurrent_adds(tmp_path):
+    lookups = []
+    client = FakeClient()
+    client.get_table = lambda table_id: lookups.append(table_id) or SimpleNamespace(schema=SCHEMA)
+    writer = writer_for(tmp_path, client)
+    threads = [threading.Thread(target=writer.add, args=({"file_path": f"{i}.py"},)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert lookups == ["events"] and writer.flush() == 8
+    writer.close()
+
+
+def test_replay_moves_corrupt_lines_aside(tmp_path):
+    (tmp_path / "events.jsonl").write_text('{"file_path": "a.py"}\n{"file_path": \n\n{"file_path": "b.py"}\n')
+    client = FakeClient()
+    assert replay_spool(str(tmp_path), client_factory=lambda: client) == {"events": 2}
+    assert client.inserted == [{"file_path": "a.py"}, {"file_path": "b.py"}]
+    assert (tmp_path / "events.jsonl.bad").read_text() == '{"file_path": \n'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["events.jsonl.bad"]
+
+
+def test_replay_sends_rows_left_by_an_interrupted_replay(tmp_path):
+    (tmp_path / "events.jsonl.replaying").write_text('{"file_path": "old.py"}\n')
+    (tmp_path / "events.jsonl").write_text('{"file_path": "new.py"}\n')
+    (tmp_path / "other.jsonl.replaying").write_text('{"file_path": "c.py"}\n')
+    client = FakeClient()
+    assert replay_spool(str(tmp_path), client_factory=lambda: client) == {"events": 2, "other": 1}
+    assert client.inserted == [{"file_path": "old.py"}, {"file_path": "new.py"}, {"file_path": "c.py"}]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,73 @@
+import os
+import time
+
+from shared.cache import DiskCache, make_key
+
+
+def test_make_key_is_stable_and_length_prefixed():
+    assert make_key("a", {"x": 1, "y": 2}) == make_key("a", {"y": 2, "x": 1})
+    assert make_key("ab", "c") != make_key("a", "bc")
+    assert make_key("a", b"a") == make_key("a", "a")
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = make_key("review", "code")
+    assert cache.get(key) is None
+    cache.put(key, {"issues": [], "summary": "ok"}, meta={"file_path": "a.py"})
+    assert cache.get(key) == {"issues": [], "summary": "ok"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1, "evictions": 0, "hit_rate": 0.5}
+    assert [(k, entry["meta"]) for k, entry in cache.entries()] == [(key, {"file_path": "a.py"})]
+
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = make_key("x")
+    cache.put(key, 1)
+    path = cache._path(key)
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert cache.get(key, "default") == "default"
+    assert not os.path.exists(path)
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = DiskCache(str(tmp_path), max_age_seconds=60)
+    key = make_key("old")
+    cache.put(key, "value")
+    old = time.time() - 120
+    os.utime(cache._path(key), (old, old))
+    assert cache.get(key) is None
+    assert list(cache.entries()) == []
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entries=2, prune_every=1000)
+    keys = [make_key(i) for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, key)
+        past = time.time() - age
+        os.utime(cache._path(key), (past, past))
+    assert cache.get(keys[0]) == keys[0]  # using it makes it the most recent
+
+    assert cache.prune() == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == keys[0] and cache.get(keys[2]) == keys[2]
+
+
+def test_prune_runs_every_n_writes(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entries=1, prune_every=3)
+    for i in range(3):
+        cache.put(make_key(i), i)
+    assert len(list(cache.entries())) == 1
+    assert cache.stats()["evictions"] == 2
+
+
+def test_delete_and_clear(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    for i in range(3):
+        cache.put(make_key(i), i)
+    assert cache.delete(make_key(0))
+    assert not cache.delete(make_key(0))
+    assert cache.clear() == 2
+    assert list(cache.entries()) == []
@@ -0,0 +1,99 @@
+from shared.chunking import Chunk, chunk_source, file_issue_lines, issues_in_chunk, map_chunks
+
+
+def function(name, body_lines=10, params=""):
+    return [f"def {name}({params}):"] + [f"    value = {i} * 1234567890" for i in range(body_lines)] + ["    return value", ""]
+
+
+def method(name, body_lines=10):
+    return ["    " + line if line else line for line in function(name, body_lines, "self")]
+
+
+def assert_covers(chunks, lines):
+    assert chunks[0].start_line == 1 and chunks[-1].end_line == len("\n".join(lines).splitlines())
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.start_line == previous.end_line + 1
+
+
+def test_small_source_is_one_chunk():
+    code = "\n".join(function("a"))
+    assert chunk_source(code, "python", 1000) == [Chunk(1, len(code.splitlines()), code)]
+
+
+def test_python_splits_at_top_level_definitions():
+    lines = function("a") + function("b") + function("c")
+    chunks = chunk_source("\n".join(lines), "python", 100)
+    assert_covers(chunks, lines)
+    assert len(chunks) == 3
+    assert all(lines[chunk.start_line - 1].startswith("def ") for chunk in chunks)
+    assert all(chunk.context_lines == 0 for chunk in chunks)
+
+
+def test_class_within_budget_is_not_split():
+    lines = ["class Small:"] + method("m", 2) + function("a") + function("b")
+    chunks = chunk_source("\n".join(lines), "python", 150)
+    assert chunks[0].start_line == 1
+    assert chunks[0].end_line >= len(["class Small:"] + method("m", 2))
+
+
+def test_oversized_class_is_split_at_members_with_its_header():
+    lines = ["@dataclass", "class Big(Base):", '    """Doc."""'] + method("a") + method("b") + method("c")
+    chunks = chunk_source("\n".join(lines), "python", 150)
+    assert_covers(chunks, lines)
+    assert chunks[0].context_lines == 0
+    for chunk in chunks[1:]:
+        assert chunk.context_lines == 2
+        assert chunk.text.startswith("@dataclass\nclass Big(Base):\n")
+        # line 1 of the text is the header, the first member line maps back to start_line
+        assert chunk.start_line - chunk.line_offset == chunk.context_lines + 1
+
+
+def test_issue_lines_round_trip_through_a_chunk():
+    lines = ["class Big:"] + method("a") + method("b") + method("c")
+    chunk = chunk_source("\n".join(lines), "python", 150)[-1]
+    issue = {"line": chunk.start_line + 1, "description": "x"}
+    relative = issues_in_chunk([issue, {"line": 1}, {"line": "n/a"}], chunk)
+    assert relative == [{"line": chunk.start_line + 1 - chunk.line_offset, "description": "x"}]
+    assert chunk.text.splitlines()[relative[0]["line"] - 1] == lines[issue["line"] - 1]
+    assert file_issue_lines(relative, chunk) == [issue]
+
+
+def test_issues_on_a_split_class_header_map_to_the_header_lines():
+    lines = ["import os", "", "@dataclass", "class Big(Base):", '    """Doc."""'] + method("a") + method("b")
+    chunk = chunk_source("\n".join(lines), "python", 150)[-1]
+    assert (chunk.context_lines, chunk.header_start) == (2, 3)
+    issues = file_issue_lines([{"line": 1}, {"line": 2}, {"line": 3}], chunk)
+    assert [lines[issue["line"] - 1] for issue in issues] == ["@dataclass", "class Big(Base):", lines[chunk.start_line - 1]]
+
+
+def test_oversized_definition_is_split_by_lines():
+    lines = function("huge", 60)
+    chunks = chunk_source("\n".join(lines), "python", 100)
+    assert len(chunks) > 1
+    assert_covers(chunks, lines)
+
+
+def test_other_languages_split_at_column_zero_definitions():
+    lines = []
+    for name in "abc":
+        lines += [f"function {name}() {{"] + [f"  const v{i} = {i} * 1234567890;" for i in range(10)] + ["}"]
+    chunks = chunk_source("\n".join(lines), "javascript", 150)
+    assert_covers(chunks, lines)
+    assert all(lines[chunk.start_line - 1].startswith("function ") for chunk in chunks)
+
+
+def test_invalid_python_falls_back_to_generic_boundaries():
+    lines = function("a") + ["def broken(:"] + function("b")
+    chunks = chunk_source("\n".join(lines), "python", 150)
+    assert_covers(chunks, lines)
+
+
+def test_map_chunks_keeps_order_and_isolates_failures():
+    def work(chunk):
+        if chunk == 2:
+            raise ValueError("boom")
+        return chunk * 10
+
+    results = map_chunks(work, [1, 2, 3], max_workers=3)
+    assert [(chunk, result) for chunk, result, _ in results] == [(1, 10), (2, None), (3, 30)]
+    assert isinstance(results[1][2], ValueError)
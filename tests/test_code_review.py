@@ -0,0 +1,40 @@
+from concurrent.futures import Future
+
+from conftest import load_agent_module
+
+main = load_agent_module("code-review-agent")
+
+
+def test_review_files_turns_an_escaped_exception_into_an_error_outcome(monkeypatch):
+    outcomes, manifests = [], []
+    monkeypatch.setattr(main, "publish_manifest", lambda paths, run_id: manifests.append(list(paths)))
+
+    def publish_outcome(kind, path, reason, run_id):
+        outcomes.append((kind, path, str(reason)))
+
+    def review_code(path, run_id):
+        if path == "b.py":
+            # e.g. publish_outcome failing inside review_code's own error handling
+            raise ConnectionError("publisher down")
+
+    monkeypatch.setattr(main, "publish_outcome", publish_outcome)
+    monkeypatch.setattr(main, "review_code", review_code)
+    main.review_files(["a.py", "b.py", "c.py"], run_id="r1")
+    assert manifests == [["a.py", "b.py", "c.py"]]
+    assert outcomes == [(main.ERROR, "b.py", "publisher down")]
+
+
+def test_settle_futures_survives_a_failing_outcome_publish(monkeypatch):
+    failed = Future()
+    failed.set_exception(RuntimeError("boom"))
+    done = Future()
+    done.set_result(None)
+    calls = []
+
+    def publish_outcome(kind, path, reason, run_id):
+        calls.append(path)
+        raise ConnectionError("still down")
+
+    monkeypatch.setattr(main, "publish_outcome", publish_outcome)
+    main.settle_futures({failed: ["a.py"], done: ["b.py"]}, "r1")
+    assert calls == ["a.py"]
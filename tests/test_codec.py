@@ -0,0 +1,57 @@
+import zlib
+
+import pytest
+
+from shared import codec
+from shared.codec import JSON, JSON_ZLIB, SCHEMA_VERSION, decode, decode_message, encode, routing, run_id_of
+
+
+class Message:
+    def __init__(self, data, attributes=None):
+        self.data = data
+        self.attributes = attributes
+
+
+def test_small_payload_is_plain_json():
+    payload = {"kind": "result", "run_id": "r1", "file_path": "a.py", "ok": True}
+    body, attributes = encode(payload)
+    assert attributes == {"schema": SCHEMA_VERSION, "encoding": JSON, "kind": "result", "run_id": "r1",
+                          "file_path": "a.py"}
+    assert decode(body, attributes) == payload
+
+
+def test_large_payload_is_compressed_and_round_trips():
+    payload = {"file_path": "a.py", "code": "print('héllo')\n" * 200}
+    body, attributes = encode(payload)
+    assert attributes["encoding"] == JSON_ZLIB
+    assert len(body) < len(payload["code"])
+    assert decode_message(Message(body, attributes)) == payload
+
+
+def test_compression_threshold(monkeypatch):
+    monkeypatch.setattr(codec, "COMPRESS_MIN_BYTES", 10_000)
+    assert encode({"code": "x" * 1000})[1]["encoding"] == JSON
+
+
+def test_legacy_messages_without_attributes_decode_as_json():
+    assert decode_message(Message(b'{"file_path": "a.py"}')) == {"file_path": "a.py"}
+    assert routing(Message(b"{}")) == {} and run_id_of(Message(b"{}")) is None
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError, match="unknown message encoding"):
+        decode(zlib.compress(b"{}"), {"encoding": "json+brotli"})
+
+
+def test_unsupported_schema_is_rejected():
+    body, attributes = encode({"file_path": "a.py"})
+    with pytest.raises(ValueError, match="unsupported message schema '2'"):
+        decode(body, dict(attributes, schema="2"))
+
+
+def test_routing_reads_attributes_only():
+    body, attributes = encode({"run_id": "r1", "file_path": "x" * 2000, "language": "python"})
+    assert "file_path" not in attributes  # over the Pub/Sub attribute limit
+    message = Message(b"not decoded", attributes)
+    assert routing(message) == {"run_id": "r1", "language": "python", "schema": SCHEMA_VERSION}
+    assert run_id_of(message) == "r1"
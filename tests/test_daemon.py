@@ -0,0 +1,53 @@
+import socket
+import threading
+
+import pytest
+
+from shared.daemon import serve, submit
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+
+
+def start(path, handler):
+    thread = threading.Thread(target=serve, args=(str(path), handler), kwargs={"name": "test"}, daemon=True)
+    thread.start()
+    for _ in range(200):
+        try:
+            if submit(str(path), {"command": "ping"}, timeout=1)["ok"]:
+                return thread
+        except OSError:
+            threading.Event().wait(0.01)
+    raise AssertionError("daemon did not start")
+
+
+def test_requests_are_handled_and_failures_reported(tmp_path):
+    path = tmp_path / "d.sock"
+
+    def handler(request):
+        if not request["files"]:
+            raise ValueError("no files")
+        return {"files": len(request["files"])}
+
+    thread = start(path, handler)
+    assert submit(str(path), {"files": ["a.py", "b.py"]}) == {"ok": True, "result": {"files": 2}}
+    assert submit(str(path), {"files": []}) == {"ok": False, "error": "ValueError: no files"}
+    assert submit(str(path), {"command": "shutdown"})["ok"]
+    thread.join(timeout=5)
+    assert not thread.is_alive() and not path.exists()
+
+
+def test_a_second_daemon_is_refused_and_a_stale_socket_replaced(tmp_path):
+    path = tmp_path / "d.sock"
+    thread = start(path, lambda request: None)
+    with pytest.raises(RuntimeError, match="already listening"):
+        serve(str(path), lambda request: None)
+    submit(str(path), {"command": "shutdown"})
+    thread.join(timeout=5)
+
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))  # left behind by a daemon that died
+    stale.close()
+    thread = start(path, lambda request: "fresh")
+    assert submit(str(path), {})["result"] == "fresh"
+    submit(str(path), {"command": "shutdown"})
+    thread.join(timeout=5)
@@ -0,0 +1,88 @@
+import subprocess
+
+import pytest
+
+from conftest import load_agent_module
+
+diff_review = load_agent_module("code-review-agent", "diff_review")
+
+BASE = "\n".join([
+    "import os",                  # 1
+    "",                           # 2
+    "class Store:",               # 3
+    "    def get(self, key):",    # 4
+    "        return key",         # 5
+    "",                           # 6
+    "    def put(self, key):",    # 7
+    "        pass",               # 8
+    "",                           # 9
+    "def helper():",              # 10
+    "    return 1",               # 11
+    "",                           # 12
+    "VALUE = 1",                  # 13
+    "OTHER = 2",                  # 14
+]) + "\n"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git = ["git", "-C", str(tmp_path), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    (tmp_path / "store.py").write_text(BASE)
+    (tmp_path / "gone.py").write_text("x = 1\n")
+    subprocess.run(git + ["add", "."], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "base"], check=True)
+    return tmp_path
+
+
+def test_hunks_of_added_changed_and_deleted_lines(repo):
+    lines = BASE.splitlines()
+    lines[4] = "        return key.upper()"             # change line 5
+    lines.insert(9, "    # new comment")                # insert before helper: new line 10
+    del lines[13]                                        # drop VALUE = 1 (was line 13, now 14)
+    (repo / "store.py").write_text("\n".join(lines) + "\n")
+    assert diff_review.changed_line_ranges(str(repo), "HEAD", str(repo / "store.py")) == [(5, 5), (10, 10), (13, 13)]
+
+
+def test_changed_files_include_untracked_and_skip_deleted(repo):
+    (repo / "store.py").write_text(BASE + "NEW = 3\n")
+    (repo / "gone.py").unlink()
+    (repo / "fresh.py").write_text("y = 2\n")
+    assert diff_review.changed_files(str(repo), "HEAD") == ["store.py", "fresh.py"]
+    assert diff_review.is_untracked(str(repo), str(repo / "fresh.py"))
+    assert not diff_review.is_untracked(str(repo), str(repo / "store.py"))
+
+
+def test_changes_grow_to_their_innermost_block():
+    assert diff_review.expand_to_enclosing_blocks(BASE, "python", [(5, 5)]) == [(4, 5)]
+    assert diff_review.expand_to_enclosing_blocks(BASE, "python", [(3, 3)]) == [(3, 8)]
+    # two changes in one block are merged, and adjacent ranges join up
+    assert diff_review.expand_to_enclosing_blocks(BASE, "python", [(5, 5), (8, 8), (11, 11)]) == [(4, 5), (7, 8), (10, 11)]
+
+
+def test_module_level_changes_keep_context_and_touched_blocks():
+    assert diff_review.expand_to_enclosing_blocks(BASE, "python", [(13, 13)]) == [(10, 14)]
+    assert diff_review.expand_to_enclosing_blocks(BASE, "python", [(5, 11)]) == [(2, 14)]
+
+
+def test_unparseable_sources_fall_back_to_fixed_context():
+    code = "\n".join(f"line {i}" for i in range(1, 41))
+    assert diff_review.expand_to_enclosing_blocks(code, "go", [(20, 20)]) == [(5, 35)]
+    assert diff_review.expand_to_enclosing_blocks("def broken(:\n" + code, "python", [(2, 2)]) == [(1, 17)]
+
+
+def test_excerpt_maps_lines_back_to_the_file():
+    excerpt, line_map = diff_review.build_excerpt(BASE, [(4, 5), (10, 11)])
+    assert excerpt.splitlines() == ["    def get(self, key):", "        return key", "...", "def helper():", "    return 1"]
+    assert line_map == [4, 5, None, 10, 11]
+    assert diff_review.excerpt_lines_for([(5, 5), (11, 11)], line_map) == [2, 5]
+    review = {"issues": [{"line": 2}, {"line": "4"}, {"line": 3}, {"line": 99}, {"line": "n/a"}]}
+    assert [issue["line"] for issue in diff_review.remap_issue_lines(review, line_map)["issues"]] == [5, 10, None, None, "n/a"]
+
+
+def test_split_ranges_groups_by_token_budget():
+    code = "\n".join(f"def f{i}():\n    return {'x' * 200!r}\n" for i in range(6))
+    ranges = [(1, 2), (4, 5), (7, 8), (10, 11), (13, 14), (16, 17)]
+    groups = diff_review.split_ranges(code, "python", ranges, max_tokens=130)
+    assert [r for group in groups for r in group] == ranges
+    assert len(groups) == 3
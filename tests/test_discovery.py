@@ -0,0 +1,57 @@
+import os
+import subprocess
+
+import pytest
+
+from shared.discovery import IgnoreRules, git_blob_sha, iter_source_files, read_file_list
+
+
+def write(root, rel_path, text="x = 1\n"):
+    path = os.path.join(root, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def found(root, **kwargs):
+    return sorted(os.path.relpath(path, root).replace(os.sep, "/")
+                  for path in iter_source_files(str(root), (".py",), **kwargs))
+
+
+def test_ignore_rules():
+    rules = IgnoreRules(["# comment", "*.log", "build/", "/top.py", "docs/**/*.py", "!keep.log"])
+    assert rules.matches("a/b/debug.log")
+    assert not rules.matches("a/keep.log")          # negation, last match wins
+    assert rules.matches("build", is_dir=True)
+    assert not rules.matches("build")               # directory-only pattern
+    assert rules.matches("top.py") and not rules.matches("sub/top.py")  # anchored
+    assert rules.matches("docs/x/y/conf.py") and rules.matches("docs/conf.py")
+
+
+@pytest.mark.parametrize("use_git", [False, True])
+def test_iter_source_files_applies_gitignore(tmp_path, use_git):
+    if use_git:
+        subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    write(tmp_path, ".gitignore", "generated/\n*_pb2.py\n")
+    write(tmp_path, ".agentignore", "legacy.py\n")
+    for rel_path in ("app/main.py", "app/api_pb2.py", "generated/out.py", "legacy.py",
+                     "node_modules/pkg/index.py", "venv/lib/site.py", "env/lib/site.py", "notes.txt"):
+        write(tmp_path, rel_path)
+    write(tmp_path, "env/pyvenv.cfg", "home = /usr/bin\n")
+    with open(os.path.join(tmp_path, "app", "blob.py"), "wb") as f:
+        f.write(b"\0\1binary")
+    write(tmp_path, "app/big.py", "x" * 2000)
+
+    assert found(tmp_path, use_git=use_git, max_bytes=1000) == ["app/main.py"]
+
+
+def test_git_blob_sha_matches_git(tmp_path):
+    path = write(tmp_path, "a.py", "print('hi')\n")
+    expected = subprocess.check_output(["git", "hash-object", path], text=True).strip()
+    assert git_blob_sha(b"print('hi')\n") == expected
+
+
+def test_read_file_list(tmp_path):
+    path = write(tmp_path, "files.txt", "a.py\n\n# comment\n b.py \na.py\n")
+    assert read_file_list(path) == ["a.py", "b.py"]
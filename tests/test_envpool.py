@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import time
+
+from conftest import load_agent_module
+
+envpool = load_agent_module("Test_generator", "envpool")
+
+
+class FakePool(envpool.EnvPool):
+    """Builds a placeholder environment instead of a virtualenv."""
+
+    def _build(self, env_dir, requirements):
+        os.makedirs(os.path.dirname(self._env_python(env_dir)), exist_ok=True)
+        with open(os.path.join(env_dir, envpool.FREEZE_FILE), "w") as f:
+            f.write("\n".join(f"{req}==1.0" for req in requirements))
+        with open(os.path.join(env_dir, envpool.READY_MARKER), "w") as f:
+            f.write("100")
+
+
+def make_pool(tmp_path, **kwargs):
+    return FakePool(str(tmp_path / "envs"), str(tmp_path / "wheels"), **kwargs)
+
+
+def env_exists(pool, requirements):
+    return os.path.isdir(pool._env_dir(envpool.requirements_key(requirements)))
+
+
+def age(pool, requirements, seconds):
+    marker = os.path.join(pool._env_dir(envpool.requirements_key(requirements)), envpool.READY_MARKER)
+    os.utime(marker, (time.time() - seconds, time.time() - seconds))
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_environments_are_built_once_and_reused(tmp_path):
+    pool = make_pool(tmp_path)
+    first = pool.python_for(["Requests", "six"])
+    assert pool.python_for(["six", "requests "]) == first
+    assert (pool.builds, pool.hits) == (1, 1)
+    assert pool.installed(["six", "requests"]) == ["requests==1.0", "six==1.0"]
+    assert pool.python_for([]) == sys.executable and pool.lease([]).path is None
+
+
+def test_least_recently_used_environment_is_evicted(tmp_path):
+    pool = make_pool(tmp_path, max_envs=2)
+    pool.python_for(["a"])
+    age(pool, ["a"], 300)
+    pool.python_for(["b"])
+    age(pool, ["b"], 200)
+    pool.python_for(["a"])  # use refreshes a
+    pool.python_for(["c"])
+    assert [env_exists(pool, [name]) for name in "abc"] == [True, False, True]
+
+
+def test_size_budget_evicts_too(tmp_path):
+    pool = make_pool(tmp_path, max_bytes=250)
+    for index, name in enumerate("abc"):
+        pool.python_for([name])
+        age(pool, [name], 300 - index)
+    assert [env_exists(pool, [name]) for name in "abc"] == [False, True, True]
+
+
+def test_leased_environments_are_never_evicted(tmp_path):
+    pool = make_pool(tmp_path, max_envs=1)
+    lease = pool.lease(["a"])
+    age(pool, ["a"], 300)
+    assert os.path.basename(lease.path).startswith(f"{os.getpid()}-")
+    pool.python_for(["b"])
+    age(pool, ["b"], 200)
+    pool.python_for(["c"])
+    assert [env_exists(pool, [name]) for name in "abc"] == [True, False, True]
+
+    lease.release()
+    assert lease.path is None
+    pool.python_for(["d"])
+    assert [env_exists(pool, [name]) for name in "abcd"] == [False, False, False, True]
+
+
+def test_leases_of_dead_processes_are_cleaned_up(tmp_path):
+    pool = make_pool(tmp_path, max_envs=1)
+    pool.python_for(["a"])
+    age(pool, ["a"], 300)
+    lease_dir = pool._lease_dir(envpool.requirements_key(["a"]))
+    os.makedirs(lease_dir)
+    stale = os.path.join(lease_dir, f"{dead_pid()}-crashed")
+    open(stale, "w").close()
+    pool.python_for(["b"])
+    assert not env_exists(pool, ["a"]) and not os.path.exists(stale)
+
+
+def test_old_leases_expire_even_if_their_pid_is_alive(tmp_path):
+    pool = make_pool(tmp_path)
+    lease = pool.lease(["a"])
+    key = envpool.requirements_key(["a"])
+    assert pool._leased(key)
+    old = time.time() - envpool.STALE_LEASE_SECONDS - 1
+    os.utime(lease.path, (old, old))
+    assert not pool._leased(key) and not os.path.exists(lease.path)
+
+
+def test_lease_is_a_context_manager(tmp_path):
+    pool = make_pool(tmp_path)
+    with pool.lease(["a"]) as lease:
+        path = lease.path
+        assert os.path.exists(path) and lease.python == pool.python_for(["a"])
+    assert not os.path.exists(path)
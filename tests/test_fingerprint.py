@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agents", "CICD_agent"))
+
+from fingerprint import SummaryDeduper, failure_signature, normalize, output_signature  # noqa: E402
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("File /home/runner/work/app/utils.py, line 12", "File utils.py, line N"),
+    (r"C:\Users\ci\app\utils.py:40: AssertionError", "utils.py:N: AssertionError"),
+    ("see ./src/app.js and ~/logs/run.txt", "see app.js and run.txt"),
+    ("pkg/mod.py failed", "mod.py failed"),
+    ("expected 3/4 of the calls", "expected 3/4 of the calls"),
+    ("read/write error on a/b", "read/write error on a/b"),
+    ("version 1.5/2.0", "version 1.5/2.0"),
+    ("see https://example.com/docs/page.html", "see https://example.com/docs/page.html"),
+    ("object at 0x7f3a2b at 2024-05-01T10:20:30Z took 1.5s", "object at 0x? at <time> took <duration>"),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+def test_output_signature_ignores_run_specific_noise():
+    first = "Traceback...\n  File \"/tmp/run-1/test_a.py\", line 3\nModuleNotFoundError: No module named 'foo'\n"
+    second = "Traceback...\n  File \"/tmp/run-2/test_a.py\", line 9\nModuleNotFoundError: No module named 'foo'\n"
+    other = "ModuleNotFoundError: No module named 'bar'\n"
+    assert output_signature(first) == output_signature(second)
+    assert output_signature(first) != output_signature(other)
+
+
+def test_failure_signature_ignores_test_ids_and_passes():
+    report = {"tests": [{"id": "a", "status": "failed", "message": "assert 1 == 2 in /x/test_a.py:3"},
+                        {"id": "b", "status": "passed", "message": ""}]}
+    renamed = {"tests": [{"id": "c", "status": "failed", "message": "assert 1 == 2 in /y/test_a.py:8"}]}
+    assert failure_signature(report) == failure_signature(renamed)
+
+
+def test_summary_deduper_reuses_cached_summaries(tmp_path):
+    from shared.cache import DiskCache
+
+    calls = []
+    deduper = SummaryDeduper("model", cache=DiskCache(str(tmp_path)))
+    compute = lambda: calls.append(1) or "summary"  # noqa: E731
+    assert deduper.summarize("sig", False, compute) == "summary"
+    assert SummaryDeduper("model", cache=DiskCache(str(tmp_path))).summarize("sig", False, compute) == "summary"
+    assert len(calls) == 1
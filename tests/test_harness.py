@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agents", "Test_generator"))
+
+import harness  # noqa: E402
+
+
+def run(tmp_path, source: str) -> dict:
+    test_path = tmp_path / "test_generated.py"
+    test_path.write_text(source)
+    report_path = tmp_path / "report.json"
+    harness.main(str(test_path), str(report_path))
+    return json.loads(report_path.read_text())
+
+
+def test_collects_pytest_style_functions_and_classes(tmp_path):
+    report = run(tmp_path, (
+        "import unittest\n"
+        "from os.path import join as test_imported\n"
+        "def test_ok():\n    assert 1 + 1 == 2\n"
+        "def test_bad():\n    assert 1 == 2\n"
+        "def test_fixture(tmp_path):\n    pass\n"
+        "class TestPlain:\n"
+        "    def setup_method(self, method):\n        self.value = 3\n"
+        "    def test_value(self):\n        assert self.value == 3\n"
+        "class TestCaseStyle(unittest.TestCase):\n"
+        "    def test_case(self):\n        self.assertTrue(True)\n"
+    ))
+    statuses = {test["id"]: test["status"] for test in report["tests"]}
+    assert statuses == {
+        "test_generated.test_ok": "passed",
+        "test_generated.test_bad": "failed",
+        "test_generated.test_fixture": "skipped",
+        "test_generated.TestPlain.test_value": "passed",
+        "test_generated.TestCaseStyle.test_case": "passed",
+    }
+    assert report["status"] == "failed"
+
+
+def test_module_without_tests_reports_no_tests(tmp_path):
+    report = run(tmp_path, "def helper():\n    return 1\n")
+    assert report["status"] == "no_tests" and report["summary"]["total"] == 0
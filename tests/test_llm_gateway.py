@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shared import llm_gateway
+from shared.llm_gateway import (
+    FATAL, OK, OVERLOADED, RETRYABLE, AdaptiveLimiter, FakeError, FakeModel, LLMGateway, classify, fake_review,
+)
+
+
+class ScriptedModel:
+    """Answers (or raises) the scripted steps in order; a step is (delay, result)."""
+
+    def __init__(self, *steps, default=(0, "ok")):
+        self.steps = list(steps)
+        self.default = default
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+            delay, result = self.steps.pop(0) if self.steps else self.default
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return llm_gateway.FakeResponse(result)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "backoff_delay", lambda attempt: 0)
+
+
+def gateway(model, **kwargs):
+    kwargs.setdefault("hedge_after", 0)
+    return LLMGateway("test", model, limiter=AdaptiveLimiter(initial=4, maximum=8, latency_target=0), **kwargs)
+
+
+def test_classify():
+    assert classify(FakeError(429, "quota")) == OVERLOADED
+    assert classify(FakeError(503, "unavailable")) == OVERLOADED
+    assert classify(FakeError(500, "internal")) == RETRYABLE
+    assert classify(TimeoutError()) == RETRYABLE
+    assert classify(FakeError(400, "bad request")) == FATAL
+    assert classify(ValueError("blocked")) == FATAL
+
+
+def test_retries_transient_errors():
+    model = ScriptedModel((0, FakeError(429, "quota")), (0, FakeError(500, "internal")), (0, "answer"))
+    llm = gateway(model)
+    assert llm.generate_text("p") == "answer"
+    stats = llm.stats()
+    assert (stats["attempts"], stats["retries"], stats["throttled"], stats["ok"]) == (3, 2, 1, 1)
+
+
+def test_fatal_errors_are_not_retried():
+    llm = gateway(ScriptedModel((0, FakeError(400, "bad request"))))
+    with pytest.raises(FakeError):
+        llm.generate_text("p")
+    assert (llm.stats()["attempts"], llm.stats()["failed"]) == (1, 1)
+
+
+def test_gives_up_after_max_attempts():
+    llm = gateway(ScriptedModel(default=(0, FakeError(500, "internal"))), max_attempts=3)
+    with pytest.raises(FakeError):
+        llm.generate_text("p")
+    assert (llm.stats()["attempts"], llm.stats()["failed"]) == (3, 1)
+
+
+def test_timeout_is_retried():
+    llm = gateway(ScriptedModel((1, "late"), (0, "answer")), timeout=0.1)
+    assert llm.generate_text("p") == "answer"
+    assert llm.stats()["timeouts"] == 1
+
+
+def test_waiting_for_a_slot_does_not_count_against_the_timeout():
+    limiter = AdaptiveLimiter(initial=1, maximum=1, latency_target=0)
+    llm = LLMGateway("test", ScriptedModel((0.1, "answer")), limiter=limiter, timeout=0.2, hedge_after=0)
+    limiter.acquire()  # saturated by another caller for longer than the timeout
+    holder = threading.Timer(0.3, limiter.release, args=(OK, 0.3))
+    holder.start()
+    assert llm.generate_text("p") == "answer"
+    holder.join()
+    assert (llm.stats()["timeouts"], llm.stats()["attempts"]) == (0, 1)
+
+
+def test_hedged_call_wins_over_a_slow_primary():
+    llm = gateway(ScriptedModel((1, "slow"), (0, "fast")), hedge_after=0.05)
+    assert llm.generate_text("p") == "fast"
+    assert (llm.stats()["hedges"], llm.stats()["hedge_wins"]) == (1, 1)
+
+
+def test_no_hedge_for_fast_calls():
+    llm = gateway(ScriptedModel((0, "fast")), hedge_after=0.5)
+    assert llm.generate_text("p") == "fast"
+    assert llm.stats()["hedges"] == 0
+
+
+def test_generate_json_asks_again_for_invalid_json():
+    model = ScriptedModel((0, "Sure! Here it is"), (0, '{"issues": []}'))
+    llm = gateway(model)
+    assert llm.generate_json("p") == {"issues": []}
+    assert model.prompts[1] == "p" + llm_gateway.JSON_REMINDER
+    assert llm.stats()["json_retries"] == 1
+
+    with pytest.raises(ValueError):
+        gateway(ScriptedModel(default=(0, "no json"))).generate_json("p")
+
+
+def test_limiter_is_additive_increase_multiplicative_decrease():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8, latency_target=1.0)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(OK, 0.0)
+    assert 4.9 < limiter.limit < 5.0  # about +1 per round of calls
+
+    limiter.acquire()
+    limiter.release(OVERLOADED, 0.0)
+    assert 2.45 < limiter.limit < 2.5
+
+
+def test_limiter_shrinks_gently_on_slow_calls():
+    limiter = AdaptiveLimiter(initial=4, maximum=8, latency_target=1.0)
+    limiter.acquire()
+    limiter.release(OK, 2.0)
+    assert limiter.limit == pytest.approx(3.6)
+
+
+def test_limiter_counts_a_burst_of_throttling_once():
+    limiter = AdaptiveLimiter(initial=8, maximum=8, latency_target=0)
+    limiter.acquire()
+    limiter.release(OK, 10.0)  # average latency sets the cool-down between decreases
+    for _ in range(3):
+        limiter.acquire()
+    for _ in range(3):
+        limiter.release(OVERLOADED, 0.0)
+    assert limiter.limit == 4
+    assert limiter.stats()["decreases"] == 1
+
+
+def test_limiter_blocks_at_the_limit():
+    limiter = AdaptiveLimiter(initial=1, maximum=1)
+    limiter.acquire()
+    assert not limiter.try_acquire()
+    limiter.release(OK, 0.0)
+    assert limiter.try_acquire()
+
+
+def test_gateway_adapts_to_a_fake_quota():
+    model = FakeModel(latency=0.02, capacity=2)
+    llm = LLMGateway("test", model, limiter=AdaptiveLimiter(initial=8, maximum=8, latency_target=0),
+                     max_attempts=50, hedge_after=0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(lambda i: llm.generate_json(f"review {i}"), range(24)))
+    assert answers == [json.loads(fake_review("x"))] * 24
+    assert model.rejected > 0
+    assert llm.stats()["throttled"] == model.rejected
+    assert llm.limiter.stats()["decreases"] >= 1
+
+
+def test_fake_review_answers_packed_prompts_per_file():
+    packed = json.loads(fake_review('<file id="a.py">x</file><file id="b.py">y</file>'))
+    assert sorted(packed["files"]) == ["a.py", "b.py"]
@@ -0,0 +1,88 @@
+import threading
+
+from shared.manifest import (
+    ERROR, MANIFEST, RESULT, SKIPPED, RunTracker, build_manifest, build_outcome, current_run_id, kind_of,
+    run_id_is_explicit, wait_for_run,
+)
+
+
+class FakeStream:
+    def __init__(self, done=False):
+        self._done = done
+        self.cancelled = self.closed = False
+
+    def done(self):
+        return self._done
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        self.closed = True
+
+
+def test_build_manifest_and_outcome():
+    manifest = build_manifest("r1", ["b.py", "a.py", "a.py"], "code_review")
+    assert (kind_of(manifest), manifest["files"], manifest["producer"]) == (MANIFEST, ["a.py", "b.py"], "code_review")
+    outcome = build_outcome(SKIPPED, "a.py", "r1", "review", ValueError("empty"))
+    assert kind_of(outcome) == SKIPPED and outcome["reason"] == "empty"
+    assert kind_of({"file_path": "a.py"}) == RESULT
+
+
+def test_tracker_completes_once_every_file_is_settled():
+    tracker = RunTracker("r1")
+    tracker.settle("a.py")  # results may arrive before the manifest
+    assert not tracker.complete()
+    tracker.add_manifest(build_manifest("r1", ["a.py", "b.py"], "code_review"))
+    assert tracker.missing() == ["b.py"]
+    tracker.settle("b.py")
+    tracker.settle("b.py")  # redelivery
+    assert tracker.complete()
+    assert tracker.report() == {"run_id": "r1", "manifest_received": True, "expected": 2, "settled": 2, "missing": []}
+
+
+def test_manifests_of_one_run_are_merged():
+    tracker = RunTracker("r1")
+    tracker.add_manifest(build_manifest("r1", ["a.py"], "first"))
+    tracker.add_manifest(build_manifest("r1", ["b.py"], "second"))
+    tracker.settle("a.py")
+    assert tracker.missing() == ["b.py"]
+
+
+def test_empty_manifest_completes_immediately():
+    tracker = RunTracker("r1")
+    tracker.add_manifest(build_manifest("r1", [], "code_review"))
+    assert tracker.wait(timeout=0)
+
+
+def test_tracks_only_its_run():
+    tracker = RunTracker("r1")
+    assert tracker.tracks({"run_id": "r1"}) and not tracker.tracks({"run_id": "r2", "kind": ERROR})
+    assert RunTracker("manual").tracks({})
+
+
+def test_unset_run_id_is_manual_and_not_explicit(monkeypatch):
+    monkeypatch.delenv("RUN_ID", raising=False)
+    assert (current_run_id(), run_id_is_explicit()) == ("manual", False)
+    # a "manual" tracker completes on the first ad-hoc manifest, which must not end a listener without RUN_ID
+    tracker = RunTracker(current_run_id())
+    tracker.add_manifest(build_manifest("manual", [], "test_generator"))
+    assert tracker.complete()
+    monkeypatch.setenv("RUN_ID", "r1")
+    assert (current_run_id(), run_id_is_explicit()) == ("r1", True)
+
+
+def test_wait_for_run_returns_when_complete():
+    tracker = RunTracker("r1")
+    tracker.add_manifest(build_manifest("r1", ["a.py"], "code_review"))
+    threading.Timer(0.05, tracker.settle, ["a.py"]).start()
+    stream = FakeStream()
+    assert wait_for_run(tracker, stream, deadline_seconds=5)
+    assert stream.cancelled and stream.closed
+
+
+def test_wait_for_run_stops_at_the_deadline_or_a_dead_stream():
+    tracker = RunTracker("r1")
+    tracker.add_manifest(build_manifest("r1", ["a.py"], "code_review"))
+    assert not wait_for_run(tracker, FakeStream(), deadline_seconds=0.05)
+    assert not wait_for_run(tracker, FakeStream(done=True), deadline_seconds=5)
@@ -0,0 +1,101 @@
+from shared.cache import DiskCache
+
+from conftest import load_agent_module
+
+packing = load_agent_module("code-review-agent", "packing")
+main = load_agent_module("code-review-agent")
+
+REVIEW = {"issues": [{"type": "bug", "line": 1, "description": "x"}], "summary": "ok"}
+
+
+def files(count=3):
+    return packing.make_packed_files([(f"f{i}.py", "python", f"x = {i}\n") for i in range(count)])
+
+
+def test_pack_files_respects_budget_and_file_limit():
+    packed = packing.make_packed_files([(f"f{i}.py", "python", "x" * 40 * i) for i in range(1, 6)])
+    bins = packing.pack_files(packed, budget_tokens=60, max_files=2, overhead_tokens=5)
+    assert sorted(f.path for pack in bins for f in pack) == sorted(f.path for f in packed)
+    assert all(len(pack) <= 2 for pack in bins)
+    assert all(sum(f.tokens + 5 for f in pack) <= 60 for pack in bins if len(pack) > 1)
+
+
+def test_split_packed_response_returns_valid_sections_and_failed_files():
+    pack = files()
+    parsed = {"files": {"F1": REVIEW, "F2": {"issues": "not a list", "summary": "bad"}}}
+    reviews, failed = packing.split_packed_response(parsed, pack)
+    assert reviews == {"f0.py": REVIEW}
+    assert [f.path for f in failed] == ["f1.py", "f2.py"]
+
+
+def test_split_packed_response_fails_every_file_on_a_malformed_answer():
+    pack = files(2)
+    for parsed in (None, [], {"files": []}, {"reviews": {}}):
+        assert packing.split_packed_response(parsed, pack) == ({}, pack)
+
+
+class Recorder:
+    def __init__(self, monkeypatch, answer):
+        self.published, self.outcomes, self.single, self.prompts = {}, [], [], []
+        monkeypatch.setattr(main, "publish_review",
+                            lambda path, language, code, review, **kwargs: self.published.__setitem__(path, review))
+        monkeypatch.setattr(main, "publish_outcome", lambda kind, path, reason, run_id: self.outcomes.append(path))
+        monkeypatch.setattr(main, "review_source", self.review_source)
+        monkeypatch.setattr(main.model, "generate_json", self.generate_json)
+        self.answer = answer
+
+    def generate_json(self, prompt, parse=None):
+        self.prompts.append(prompt)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer
+
+    def review_source(self, path, code, language):
+        self.single.append(path)
+        return {"issues": [], "summary": f"alone: {path}"}
+
+
+def test_review_pack_retries_missing_sections_on_their_own(monkeypatch):
+    monkeypatch.setattr(main, "REVIEW_CACHE_ENABLED", False)
+    recorder = Recorder(monkeypatch, {"files": {"F1": REVIEW, "F3": "garbage"}})
+    main.review_pack(files(), run_id="r1")
+    assert recorder.single == ["f1.py", "f2.py"]
+    assert recorder.published == {"f0.py": REVIEW, "f1.py": {"issues": [], "summary": "alone: f1.py"},
+                                  "f2.py": {"issues": [], "summary": "alone: f2.py"}}
+
+
+def test_review_pack_retries_every_file_when_the_request_fails(monkeypatch):
+    monkeypatch.setattr(main, "REVIEW_CACHE_ENABLED", False)
+    recorder = Recorder(monkeypatch, RuntimeError("quota"))
+    main.review_pack(files(2), run_id="r1")
+    assert recorder.single == ["f0.py", "f1.py"] and recorder.outcomes == []
+
+
+def test_packed_answers_are_not_cached_as_single_file_reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "REVIEW_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "review_cache", DiskCache(str(tmp_path)))
+    pack = files(2)
+    recorder = Recorder(monkeypatch, {"files": {"F1": REVIEW, "F2": REVIEW}})
+    main.review_pack(pack, run_id="r1")
+    main.review_pack(pack, run_id="r1")
+    assert len(recorder.prompts) == 1  # the second pack is answered from the cache
+    for packed in pack:
+        assert main.lookup_cached_review(main.build_code_review_prompt(packed.code, packed.language)) is None
+
+
+def test_a_pack_that_raises_settles_each_of_its_files(tmp_path, monkeypatch):
+    paths = []
+    for name in ("a.py", "b.py"):
+        (tmp_path / name).write_text("x = 1\n")
+        paths.append(str(tmp_path / name))
+    outcomes = []
+    monkeypatch.setattr(main, "REVIEW_CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "publish_manifest", lambda paths, run_id: None)
+    monkeypatch.setattr(main, "publish_outcome", lambda kind, path, reason, run_id: outcomes.append((kind, path)))
+
+    def review_pack(pack, run_id):
+        raise ConnectionError("publisher down")
+
+    monkeypatch.setattr(main, "review_pack", review_pack)
+    main.review_files_packed(paths, run_id="r1")
+    assert sorted(outcomes) == [(main.ERROR, path) for path in sorted(paths)]
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from conftest import load_agent_module
+
+pipeline = load_agent_module("code-review-agent", "pipeline")
+Stage, run_pipeline, percentile = pipeline.Stage, pipeline.run_pipeline, pipeline.percentile
+
+
+def by_stage(summaries):
+    return {s["stage"]: s for s in summaries}
+
+
+def test_every_item_passes_through_every_stage():
+    results, lock = [], threading.Lock()
+
+    def collect(item):
+        with lock:
+            results.append(item)
+        return item
+
+    summaries = run_pipeline(range(50), [Stage("double", lambda x: x * 2, workers=4),
+                                         Stage("inc", lambda x: x + 1, workers=3),
+                                         Stage("collect", collect)], queue_size=2)
+    assert sorted(results) == [x * 2 + 1 for x in range(50)]
+    assert [s["stage"] for s in summaries] == ["discover", "double", "inc", "collect"]
+    assert all(s["items"] == 50 and s["errors"] == 0 for s in summaries)
+
+
+def test_none_drops_an_item_and_errors_go_to_the_handler():
+    failures, seen = [], []
+
+    def check(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return None if item % 2 else item
+
+    summaries = by_stage(run_pipeline(range(6), [Stage("check", check, workers=2), Stage("sink", seen.append)],
+                                      on_error=lambda stage, item, error: failures.append((stage, item, str(error)))))
+    assert sorted(seen) == [0, 2, 4]
+    assert failures == [("check", 3, "bad item")]
+    assert (summaries["check"]["errors"], summaries["check"]["dropped"]) == (1, 2)
+    assert summaries["sink"]["items"] == 3
+
+
+def test_a_failing_handler_or_source_does_not_stop_the_pipeline():
+    def source():
+        yield 1
+        yield 2
+        raise OSError("disk gone")
+
+    def handler(stage, item, error):
+        raise RuntimeError("handler broke")
+
+    seen = []
+    summaries = by_stage(run_pipeline(source(), [Stage("fail", lambda x: 1 / (x - 1)), Stage("sink", seen.append)],
+                                      on_error=handler))
+    assert seen == [1.0]
+    assert (summaries["discover"]["items"], summaries["discover"]["errors"]) == (3, 1)
+    assert summaries["fail"]["errors"] == 1
+
+
+def test_bounded_queues_hold_back_a_fast_source():
+    produced, lock = [], threading.Lock()
+
+    def source():
+        for item in range(20):
+            with lock:
+                produced.append(item)
+            yield item
+
+    backlog = []
+
+    def slow(item):
+        time.sleep(0.005)
+        with lock:
+            backlog.append(len(produced) - item)
+        return item
+
+    run_pipeline(source(), [Stage("slow", slow)], queue_size=2)
+    # the source never gets more than the queue plus the item in hand ahead of the consumer
+    assert max(backlog) <= 4
+
+
+def test_empty_source_finishes():
+    summaries = run_pipeline([], [Stage("a", lambda x: x, workers=3), Stage("b", lambda x: x, workers=2)])
+    assert all(s["items"] == 0 and s["throughput_per_s"] == 0.0 for s in summaries)
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 100)) == (50, 95, 100)
+    assert percentile([7], 95) == 7 and percentile([], 50) == 0.0
@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+from shared.prompt_budget import (
+    TRACEBACK_START, PromptBudget, collapse_repeated_frames, collapse_repeated_lines,
+    collapse_repeated_tracebacks, compact_json, compress_test_output, fit_json, keep_head_and_tail, trim_review,
+)
+from shared.tokens import estimate_tokens
+
+LINES = [f"line {i:03}" for i in range(200)]
+
+
+def traceback(error: str, frames=("a.py", "b.py")) -> str:
+    body = "".join(f'  File "{name}", line 1, in f\n    call()\n' for name in frames)
+    return f"{TRACEBACK_START}\n{body}{error}\n"
+
+
+def split_cut(text: str):
+    head, rest = text.split("\n... [")
+    omitted, tail = rest.split(" lines omitted] ...\n")
+    return head, int(omitted), tail
+
+
+def test_keep_head_and_tail_leaves_short_text_alone():
+    text = "\n".join(LINES[:5])
+    assert keep_head_and_tail(text, estimate_tokens(text)) == text
+
+
+@pytest.mark.parametrize("max_tokens", [40, 100, 300])
+def test_keep_head_and_tail_cuts_whole_lines_and_counts_them(max_tokens):
+    text = "\n".join(LINES)
+    head, omitted, tail = split_cut(keep_head_and_tail(text, max_tokens))
+    head_lines, tail_lines = head.split("\n"), tail.split("\n")
+    assert head_lines == LINES[:len(head_lines)]
+    assert tail_lines == LINES[-len(tail_lines):]
+    assert len(head_lines) + omitted + len(tail_lines) == len(LINES)
+    assert estimate_tokens(keep_head_and_tail(text, max_tokens)) <= max_tokens
+    assert len(tail_lines) > len(head_lines)
+
+
+def test_keep_head_and_tail_cuts_a_single_long_line_by_characters():
+    text = "x" * 1000
+    head, omitted, tail = split_cut(keep_head_and_tail(text, 50))
+    assert omitted == 0
+    assert text.startswith(head) and text.endswith(tail) and head and tail
+    assert len(head) + len(tail) <= 50 * 4
+
+
+def test_keep_head_and_tail_with_a_budget_smaller_than_the_marker():
+    head, omitted, tail = split_cut(keep_head_and_tail("\n".join(LINES), 10))
+    assert (head, tail) == ("", "")
+    assert omitted == len(LINES) - 2
+
+
+def test_collapse_repeated_lines_only_collapses_long_runs():
+    lines = ["a", "b", "b", "c", "c", "c", "c", "d"]
+    assert collapse_repeated_lines(lines) == ["a", "b", "b", "c", "[previous line repeated 3 more times]", "d"]
+    assert collapse_repeated_lines(["x"] * 3, min_run=4) == ["x"] * 3
+
+
+def test_collapse_repeated_frames_counts_recursion():
+    frame = ['  File "r.py", line 2, in f', "    return f(n - 1)"]
+    lines = ["Traceback (most recent call last):"] + frame * 4 + ["RecursionError: too deep"]
+    assert collapse_repeated_frames(lines) == (
+        ["Traceback (most recent call last):"] + frame
+        + ["  [previous frame repeated 3 more times]", "RecursionError: too deep"]
+    )
+
+
+def test_collapse_repeated_frames_keeps_repeated_plain_lines():
+    assert collapse_repeated_frames(["ok", "ok", "ok"]) == ["ok", "ok", "ok"]
+
+
+def test_collapse_repeated_tracebacks_keeps_first_copy_of_each():
+    first, second = traceback("ValueError: boom"), traceback("KeyError: 'k'")
+    text = "start\n" + first + "after one\n" + first + "after two\n" + second + first + "end"
+    assert collapse_repeated_tracebacks(text) == (
+        "start\n" + first + "after one\n"
+        + "[traceback identical to #1 omitted]\nafter two\n"
+        + second
+        + "[traceback identical to #1 omitted]\nend"
+    )
+
+
+def test_collapse_repeated_tracebacks_distinguishes_exception_lines():
+    text = traceback("ValueError: one") + traceback("ValueError: two")
+    assert collapse_repeated_tracebacks(text) == text
+
+
+def test_collapse_repeated_tracebacks_without_tracebacks_is_unchanged():
+    assert collapse_repeated_tracebacks("1 passed\n") == "1 passed\n"
+
+
+def test_compress_test_output_shrinks_noise_and_keeps_the_verdict():
+    noise = "".join(traceback("ValueError: boom") for _ in range(50))
+    text = "collected 3 items\n" + "." * 10 + "\n" * 5 + noise + "\n".join(LINES) + "\n3 failed in 0.5s"
+    compressed = compress_test_output(text, 120)
+    assert compressed.startswith("collected 3 items")
+    assert compressed.endswith("3 failed in 0.5s")
+    assert compressed.count(TRACEBACK_START) <= 1
+    assert estimate_tokens(compressed) <= 120
+
+
+def test_compress_test_output_handles_empty_output():
+    assert compress_test_output("", 10) == ""
+    assert compress_test_output(None, 10) == ""
+
+
+def test_fit_json_drops_from_the_longest_list_and_records_counts():
+    value = {"name": "x", "long": [f"item {i}" * 5 for i in range(40)], "short": [1, 2, 3]}
+    fitted = fit_json(value, 60)
+    assert estimate_tokens(compact_json(fitted)) <= 60
+    assert fitted["short"] == [1, 2, 3]
+    assert fitted["long"] == value["long"][:len(fitted["long"])]
+    assert fitted["long_omitted"] == 40 - len(fitted["long"])
+    assert "short_omitted" not in fitted
+    assert len(value["long"]) == 40
+
+
+def test_fit_json_leaves_fitting_values_alone():
+    value = {"a": [1, 2], "b": "c"}
+    assert fit_json(value, 100) == value
+
+
+def test_fit_json_stops_when_nothing_is_left_to_drop():
+    value = {"text": "x" * 1000, "items": [1]}
+    assert fit_json(value, 10) == {"text": "x" * 1000, "items": [], "items_omitted": 1}
+
+
+def test_trim_review_keeps_only_prompt_fields():
+    review = {"issues": [{"type": "bug", "line": 3, "description": "off by one", "severity": "high", "fix": ""},
+                         "not an issue", {"type": "style", "line": None}],
+              "summary": "fine", "model": "m"}
+    assert trim_review(review, 1000) == {
+        "issues": [{"type": "bug", "line": 3, "description": "off by one"}, {"type": "style"}],
+        "summary": "fine",
+    }
+    assert trim_review({}, 10) == {}
+
+
+def test_trim_review_shortens_then_drops_trailing_issues():
+    review = {"issues": [{"type": "bug", "line": i, "description": "d" * 1000} for i in range(30)],
+              "summary": "s" * 5000}
+    trimmed = trim_review(review, 400)
+    assert estimate_tokens(compact_json(trimmed)) <= 400
+    assert all(len(issue["description"]) <= 240 for issue in trimmed["issues"])
+    assert len(trimmed["summary"]) <= 400 * 4 // 3
+    assert [issue["line"] for issue in trimmed["issues"]] == list(range(len(trimmed["issues"])))
+    assert trimmed["issues_omitted"] == 30 - len(trimmed["issues"])
+
+
+def test_prompt_budget_records_savings_per_prompt():
+    budget = PromptBudget("agent", 1000)
+    review = {"issues": [{"type": "bug", "line": 1, "description": "d", "extra": "x" * 400}], "summary": "ok"}
+    section = budget.review(review)
+    assert json.loads(section) == {"issues": [{"type": "bug", "line": 1, "description": "d"}], "summary": "ok"}
+    budget.finish("prompt " + section)
+    budget.finish("x" * 5000)
+    stats = budget.stats()
+    assert (stats["calls"], stats["over_budget"]) == (2, 1)
+    assert stats["tokens_saved"] > 100
+    assert stats["max_prompt_tokens"] == estimate_tokens("x" * 5000)
@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from shared import publisher
+
+
+class DeferredPublisher(publisher.InMemoryPublisher):
+    """Hands out futures the test settles itself, like a broker acknowledging later."""
+
+    def __init__(self):
+        super().__init__()
+        self.futures = []
+
+    def publish(self, topic, data, **attributes):
+        super().publish(topic, data, **attributes)
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(publisher, "_pending", set())
+    monkeypatch.setattr(publisher, "_stats", {"published": 0, "failed": 0})
+    monkeypatch.setattr(publisher, "_failures", [])
+    previous = publisher.set_publisher(None)
+    yield
+    publisher.set_publisher(previous)
+
+
+def test_in_memory_publisher_records_messages(fresh):
+    client = publisher.InMemoryPublisher()
+    assert publisher.set_publisher(client) is None
+    future = publisher.publish("proj", "topic", b"payload", label="review of a.py", encoding="json")
+    assert future.result() == "1"
+    assert client.messages == [{"topic": "projects/proj/topics/topic", "data": b"payload",
+                                "attributes": {"encoding": "json"}}]
+    assert publisher.flush(timeout=1) == {"published": 1, "failed": 0, "pending": 0, "failures": []}
+
+
+def test_flush_waits_for_in_flight_messages_and_records_failures(fresh):
+    client = DeferredPublisher()
+    publisher.set_publisher(client)
+    publisher.publish("proj", "topic", b"1", label="first")
+    publisher.publish("proj", "topic", b"2", label="second")
+    assert publisher.publish_stats()["pending"] == 2
+
+    def acknowledge():
+        time.sleep(0.05)
+        client.futures[0].set_result("m1")
+        client.futures[1].set_exception(RuntimeError("permission denied"))
+
+    threading.Thread(target=acknowledge).start()
+    stats = publisher.flush(timeout=5)
+    assert (stats["published"], stats["failed"], stats["pending"]) == (1, 1, 0)
+    assert stats["failures"] == [{"label": "second", "error": "permission denied"}]
+
+
+def test_flush_gives_up_at_its_timeout(fresh):
+    client = DeferredPublisher()
+    publisher.set_publisher(client)
+    publisher.publish("proj", "topic", b"1", label="stuck")
+    started = time.monotonic()
+    assert publisher.flush(timeout=0.1)["pending"] == 1
+    assert time.monotonic() - started < 2
+    client.futures[0].set_result("late")
+    assert publisher.publish_stats()["pending"] == 0
+
+
+def test_one_client_is_shared_across_threads(fresh, monkeypatch):
+    created = []
+    monkeypatch.setattr(publisher, "_create_client", lambda: created.append(1) or publisher.InMemoryPublisher())
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(publisher.get_publisher())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and len({id(client) for client in clients}) == 1
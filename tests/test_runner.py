@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import load_agent_module
+
+runner = load_agent_module("Test_generator", "runner")
+
+posix_only = pytest.mark.skipif(os.name != "posix", reason="process groups and rlimits are POSIX-only")
+
+
+def job_for(tmp_path, test_code, name="test_generated.py"):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir(exist_ok=True)
+    (source_dir / "calc.py").write_text("def add(a, b):\n    return a + b\n")
+    test_file = tmp_path / name
+    test_file.write_text(test_code)
+    return runner.TestJob(str(test_file), str(source_dir), sys.executable)
+
+
+def test_passing_and_failing_tests_get_a_structured_report(tmp_path):
+    test_runner = runner.TestRunner(max_parallel=2, timeout=30)
+    passed = test_runner.run(job_for(tmp_path, "from calc import add\n\ndef test_add():\n    assert add(1, 2) == 3\n"))
+    assert (passed["status"], passed["returncode"]) == ("passed", 0)
+    assert passed["report"]["summary"]["passed"] == 1
+    failed = test_runner.run(job_for(tmp_path, "from calc import add\n\ndef test_add():\n    assert add(1, 2) == 4\n"))
+    assert failed["status"] == "failed" and failed["report"]["tests"][0]["status"] == "failed"
+
+
+def test_each_run_gets_a_throwaway_working_directory(tmp_path):
+    marker = tmp_path / "cwd.txt"
+    result = runner.TestRunner(timeout=30).run(job_for(tmp_path, (
+        "import os\n\n"
+        f"def test_cwd():\n    open({str(marker)!r}, 'w').write(os.getcwd())\n"
+    )))
+    assert result["status"] == "passed"
+    workdir = marker.read_text()
+    assert workdir != str(tmp_path) and not os.path.exists(workdir)
+
+
+@posix_only
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    survivor = tmp_path / "survivor.txt"
+    child = tmp_path / "child.py"
+    child.write_text(f"import time\ntime.sleep(1)\nopen({str(survivor)!r}, 'w').close()\n")
+    code = f"import subprocess, sys, time\nsubprocess.Popen([sys.executable, {str(child)!r}])\ntime.sleep(30)\n"
+    started = time.monotonic()
+    result = runner.TestRunner(timeout=0.5, cpu_seconds=0, memory_mb=0).run(job_for(tmp_path, code))
+    assert time.monotonic() - started < 10
+    assert result["status"] == "timeout" and "timeout" in result["output"]
+    assert result["report"]["tests"][0]["status"] == "timeout"
+    time.sleep(1.5)
+    assert not survivor.exists()  # the child in the same group was killed too
+
+
+@posix_only
+def test_cpu_limit_ends_a_busy_loop_without_a_report(tmp_path):
+    result = runner.TestRunner(timeout=30, cpu_seconds=1).run(job_for(tmp_path, "while True:\n    pass\n"))
+    assert result["status"] == "failed" and result["returncode"] != 0
+    assert result["report"]["status"] == "error" and result["report"]["tests"][0]["status"] == "error"
+
+
+def test_only_the_tail_of_the_output_is_kept(tmp_path):
+    code = "import sys\nsys.stdout.write('x' * 5000 + 'END')\nsys.stdout.flush()\n"
+    result = runner.TestRunner(timeout=30, max_output_bytes=1000).run(job_for(tmp_path, code))
+    output = result["output"]
+    assert output.startswith("[... ") and "bytes of output truncated" in output
+    assert "END" in output and len(output) < 1200
+
+
+def test_a_crash_before_the_report_is_an_error_entry(tmp_path):
+    result = runner.TestRunner(timeout=30).run(job_for(tmp_path, "import os\nprint('dying')\nos._exit(3)\n"))
+    assert (result["status"], result["returncode"]) == ("failed", 3)
+    assert result["report"]["tests"] == [{"id": "test_generated.py", "status": "error", "message": "dying",
+                                          "traceback": "dying"}]
+
+
+def test_at_most_max_parallel_runs_at_once(monkeypatch):
+    test_runner = runner.TestRunner(max_parallel=2)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow_run(job):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return {"status": "passed"}
+
+    monkeypatch.setattr(test_runner, "_run", slow_run)
+    threads = [threading.Thread(target=test_runner.run, args=(None,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
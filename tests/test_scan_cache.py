@@ -0,0 +1,95 @@
+import subprocess
+
+import pytest
+
+from shared.cache import DiskCache, make_key
+from shared.discovery import git_blob_sha
+
+from conftest import load_agent_module
+
+scanner = load_agent_module("SecurityAgent", "scanner")
+
+AWS = b"AKIA" + b"ABCDEFGHIJKLMNOP"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner, "SECURITY_CACHE_ENABLED", True)
+    monkeypatch.setattr(scanner, "secret_cache", DiskCache(str(tmp_path / "cache")))
+    scans = []
+    scan_bytes = scanner.scan_bytes
+
+    def counting_scan(data, file_path=None):
+        scans.append(file_path)
+        return scan_bytes(data, file_path)
+
+    monkeypatch.setattr(scanner, "scan_bytes", counting_scan)
+    return scans
+
+
+def write_repo(root, count=3):
+    root.mkdir()
+    for index in range(count):
+        (root / f"mod{index}.py").write_bytes(b"x = 1\n" * index + AWS + b"\n")
+
+
+def test_same_blob_is_scanned_once_and_relabelled(cache):
+    first = scanner.scan_secrets(b"a\n" + AWS, "a.py")
+    second = scanner.scan_secrets(b"a\n" + AWS, "copy/a.py")
+    assert cache == ["a.py"]
+    assert [f["file"] for f in first + second] == ["a.py", "copy/a.py"]
+    assert [dict(f, file=None) for f in first] == [dict(f, file=None) for f in second]
+    scanner.scan_secrets(b"b\n" + AWS, "a.py")
+    assert cache == ["a.py", "a.py"]  # new contents, new blob SHA
+
+
+def test_a_new_rule_set_version_misses_the_cache(cache, monkeypatch):
+    scanner.scan_secrets(AWS, "a.py")
+    monkeypatch.setattr(scanner, "RULESET_VERSION", "other-rules")
+    scanner.scan_secrets(AWS, "a.py")
+    assert cache == ["a.py", "a.py"]
+
+
+def test_rule_set_version_follows_the_rules():
+    rules = list(scanner.SECRET_RULES)
+    assert scanner.RULESET_VERSION == make_key(scanner.SCANNER_VERSION, [list(rule) for rule in rules])[:16]
+    edited = rules[:-1] + [rules[-1]._replace(pattern=rules[-1].pattern + "?")]
+    assert make_key(scanner.SCANNER_VERSION, [list(rule) for rule in edited])[:16] != scanner.RULESET_VERSION
+
+
+def test_warm_repo_scan_only_scans_changed_blobs(tmp_path, cache, monkeypatch):
+    root = tmp_path / "repo"
+    write_repo(root)
+    cold = scanner.scan_repo(str(root), workers=1)
+    assert (cold["files_scanned"], cold["files_cached"]) == (3, 0)
+
+    warm = scanner.scan_repo(str(root), workers=1)
+    assert (warm["files_scanned"], warm["files_cached"]) == (0, 3)
+    assert warm["findings"] == cold["findings"]
+
+    (root / "mod1.py").write_bytes(b"clean = True\n")
+    changed = scanner.scan_repo(str(root), workers=1)
+    assert (changed["files_scanned"], changed["files_cached"]) == (1, 2)
+    assert [f["file"] for f in changed["findings"]] == ["mod0.py", "mod2.py"]
+
+    monkeypatch.setattr(scanner, "RULESET_VERSION", "other-rules")
+    assert scanner.scan_repo(str(root), workers=1)["files_scanned"] == 3
+
+
+def test_unmodified_tracked_files_are_identified_from_the_git_index(tmp_path, cache, monkeypatch):
+    root = tmp_path / "repo"
+    write_repo(root)
+    git = ["git", "-C", str(root), "-c", "user.name=t", "-c", "user.email=t@example.com"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    subprocess.run(git + ["add", "."], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "init"], check=True)
+    (root / "mod2.py").write_bytes(b"changed = True\n")
+
+    hashed = []
+    file_blob_sha = scanner.file_blob_sha
+    monkeypatch.setattr(scanner, "file_blob_sha", lambda path: hashed.append(path) or file_blob_sha(path))
+    result = scanner.scan_repo(str(root), workers=1)
+    assert [path.rsplit("/", 1)[-1] for path in hashed] == ["mod2.py"]
+    index = scanner._load_blob_index()
+    assert git_blob_sha((root / "mod0.py").read_bytes()) in index
+    assert [f["file"] for f in result["findings"]] == ["mod0.py", "mod1.py"]
@@ -0,0 +1,103 @@
+from conftest import load_agent_module
+
+scanner = load_agent_module("SecurityAgent", "scanner")
+
+AWS = b"AKIA" + b"ABCDEFGHIJKLMNOP"
+GITHUB = b"ghp_" + b"a1" * 18
+ASSIGNMENT = b'password = "abcdefghijklmnopqrstu"'
+
+
+def rules_and_positions(findings):
+    return [(f["rule"], f["line"], f["column"]) for f in findings]
+
+
+def reference_findings(data: bytes):
+    """What the individual patterns find, scanning left to right without overlaps."""
+    text = data.decode("ascii")
+    matches = sorted((m.start(), -m.end(), rule.id)
+                     for rule, pattern in zip(scanner.SECRET_RULES, scanner.SECRET_PATTERNS)
+                     for m in pattern.finditer(text))
+    found, last_end = [], 0
+    for start, negative_end, rule_id in matches:
+        if start >= last_end:
+            line = text.count("\n", 0, start) + 1
+            found.append((rule_id, line, start - (text.rfind("\n", 0, start) + 1) + 1))
+            last_end = -negative_end
+    return found
+
+
+def test_every_rule_is_found_with_its_line_and_column():
+    data = b"x = 1\n" + ASSIGNMENT + b"\n\n   aws = " + AWS + b"\n\tGITHUB = '" + GITHUB + b"'\n"
+    assert rules_and_positions(scanner.scan_bytes(data, "app.py")) == [
+        ("generic-secret-assignment", 2, 1),
+        ("aws-access-key-id", 4, 10),
+        ("github-token", 5, 12),
+    ]
+
+
+def test_case_insensitive_rules_match_any_case_and_others_do_not():
+    assert rules_and_positions(scanner.scan_bytes(b"PassWord: abcdefghijklmnopqrstu")) == [
+        ("generic-secret-assignment", 1, 1)]
+    assert scanner.scan_bytes(b"akia" + AWS[4:].lower()) == []
+
+
+def test_several_findings_on_one_line_and_matches_do_not_overlap():
+    data = AWS + b" " + GITHUB + b" " + AWS
+    assert rules_and_positions(scanner.scan_bytes(data)) == [
+        ("aws-access-key-id", 1, 1), ("github-token", 1, 22), ("aws-access-key-id", 1, 63)]
+
+
+def test_combined_matcher_agrees_with_the_individual_patterns():
+    lines = [b"token: " + b"x" * 20, b"no secrets here", b"api_key = 'abcdefghijklmnopqr'", AWS + GITHUB,
+             b"the key is short", b"  secret=" + b"Z" * 16 + b" and " + AWS, b"KEY" + b"9" * 30]
+    data = b"\n".join(lines * 3)
+    assert rules_and_positions(scanner.scan_bytes(data)) == reference_findings(data)
+
+
+def test_prefilter_anchors_only_at_rule_literals():
+    assert scanner._anchors(b"xx AKIA yy Token zz") == [3, 11]
+    assert scanner._anchors(b"nothing to see") == []
+
+
+def test_literals_across_prefilter_windows_are_found(monkeypatch):
+    monkeypatch.setattr(scanner, "WINDOW_BYTES", 7)
+    data = b"0123456" * 3 + b"xxAKIA" + AWS[4:] + b"\n" + b"yy" + GITHUB
+    assert rules_and_positions(scanner.scan_bytes(data)) == [("aws-access-key-id", 1, 24), ("github-token", 2, 3)]
+
+
+def test_large_files_are_memory_mapped_with_the_same_findings(tmp_path, monkeypatch):
+    data = (b"filler line\n" * 500 + ASSIGNMENT + b"\n") * 3 + AWS
+    path = tmp_path / "big.txt"
+    path.write_bytes(data)
+    in_memory = scanner.scan_file(str(path), "big.txt")
+    monkeypatch.setattr(scanner, "SCAN_MMAP_THRESHOLD_BYTES", 1024)
+    mapped = scanner.scan_file(str(path), "big.txt")
+    assert mapped == in_memory
+    assert rules_and_positions(mapped) == [("generic-secret-assignment", 501, 1), ("generic-secret-assignment", 1002, 1),
+                                           ("generic-secret-assignment", 1503, 1), ("aws-access-key-id", 1504, 1)]
+
+
+def test_binary_and_empty_files_yield_nothing(tmp_path, monkeypatch):
+    (tmp_path / "blob.bin").write_bytes(b"\0\1" + AWS)
+    (tmp_path / "empty.txt").write_bytes(b"")
+    assert scanner.scan_file(str(tmp_path / "blob.bin")) == []
+    assert scanner.scan_file(str(tmp_path / "empty.txt")) == []
+    monkeypatch.setattr(scanner, "SCAN_MMAP_THRESHOLD_BYTES", 1)
+    assert scanner.scan_file(str(tmp_path / "blob.bin")) == []
+
+
+def test_findings_are_redacted():
+    finding = scanner.scan_bytes(AWS)[0]
+    assert finding["match"] == "AKIA******** (20 chars)" and AWS.decode() not in str(finding)
+
+
+def test_repo_scan_is_the_same_serial_and_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner, "SECURITY_CACHE_ENABLED", False)
+    for index in range(6):
+        (tmp_path / f"mod{index}.py").write_bytes(b"import os\n" * index + AWS + b"\n")
+    (tmp_path / "clean.py").write_bytes(b"print('hi')\n")
+    serial = scanner.scan_repo(str(tmp_path), workers=1, batch_size=2)
+    parallel = scanner.scan_repo(str(tmp_path), workers=2, batch_size=2)
+    assert serial == parallel
+    assert [(f["file"], f["line"]) for f in serial["findings"]] == [(f"mod{i}.py", i + 1) for i in range(6)]
+    assert (serial["files_scanned"], serial["files_cached"], serial["errors"]) == (7, 0, [])
@@ -0,0 +1,100 @@
+import sys
+
+import pytest
+
+from conftest import load_agent_module
+
+main = load_agent_module("Test_generator")
+
+
+class FailingRunner:
+    def __init__(self, lease_path):
+        self.lease_path = lease_path
+        self.held_during_run = None
+
+    def run(self, job):
+        self.held_during_run = self.lease_path.exists()
+        raise RuntimeError("runner crashed")
+
+
+def prepared_for(tmp_path, language="python"):
+    source = tmp_path / "app.py"
+    source.write_text("def add(a, b):\n    return a + b\n")
+    return {"source_path": str(source), "language": language, "test_path": str(tmp_path / "test_app.py"),
+            "root_dir": str(tmp_path), "deps": ["requests"], "python_exe": sys.executable, "resolved": []}
+
+
+def test_run_test_releases_the_lease_when_the_run_raises(tmp_path, monkeypatch):
+    lease_path = tmp_path / "lease"
+    lease_path.touch()
+    runner = FailingRunner(lease_path)
+    monkeypatch.setattr(main, "lease_environment", lambda deps: main.EnvLease("/envs/python", str(lease_path)))
+    monkeypatch.setattr(main, "resolved_dependencies", lambda deps, python: ["requests==2.31.0"])
+    monkeypatch.setattr(main, "test_runner", runner)
+    prepared = prepared_for(tmp_path)
+    with pytest.raises(RuntimeError):
+        main.run_test(prepared)
+    assert runner.held_during_run and not lease_path.exists()
+    assert (prepared["python_exe"], prepared["resolved"]) == ("/envs/python", ["requests==2.31.0"])
+
+
+def test_each_batch_lease_ends_with_its_own_run(tmp_path, monkeypatch):
+    leases = {}
+
+    def lease_environment(deps):
+        path = tmp_path / f"lease-{len(leases)}"
+        path.touch()
+        leases[str(path)] = path
+        return main.EnvLease(sys.executable, str(path))
+
+    class Runner:
+        max_parallel = 1
+
+        def run(self, job):
+            # With one slot the runs are sequential: only the current test's lease is still held
+            assert sum(path.exists() for path in leases.values()) == 1
+            return {"status": "passed"}
+
+    monkeypatch.setattr(main, "lease_environment", lease_environment)
+    monkeypatch.setattr(main, "test_runner", Runner())
+    runs = main.run_tests([prepared_for(tmp_path), prepared_for(tmp_path), prepared_for(tmp_path, "go")])
+    assert [run["status"] for run in runs] == ["passed", "passed", "skipped"]
+    assert len(leases) == 2 and not any(path.exists() for path in leases.values())
+
+
+class FakeStore:
+    def __init__(self, stored):
+        self.stored = stored
+        self.generations = 0
+
+    def key(self, rel_path, code, language, review=None):
+        return f"key:{rel_path}"
+
+    def get(self, key):
+        return self.stored
+
+    def record_generation(self):
+        self.generations += 1
+
+
+def test_prepare_test_reuses_a_stored_test_without_generating(tmp_path, monkeypatch):
+    store = FakeStore({"test_code": "def test_add():\n    assert True\n"})
+    monkeypatch.setattr(main, "test_store", store)
+    monkeypatch.setattr(main, "TEST_STORE_ENABLED", True)
+    monkeypatch.setattr(main, "generate_test_code", lambda *args: pytest.fail("stored test was regenerated"))
+    source = prepared_for(tmp_path)["source_path"]
+    prepared = main.prepare_test(source, str(tmp_path / "out"), str(tmp_path), review={})
+    assert (prepared["stored"], prepared["complete"], prepared["generation_seconds"]) == (True, False, 0.0)
+    assert store.generations == 0
+    with open(prepared["test_path"]) as f:
+        assert f.read() == store.stored["test_code"]
+
+
+def test_prepare_test_generates_when_nothing_is_stored(tmp_path, monkeypatch):
+    store = FakeStore(None)
+    monkeypatch.setattr(main, "test_store", store)
+    monkeypatch.setattr(main, "TEST_STORE_ENABLED", True)
+    monkeypatch.setattr(main, "generate_test_code", lambda *args: ("def test_add():\n    assert True\n", True))
+    source = prepared_for(tmp_path)["source_path"]
+    prepared = main.prepare_test(source, str(tmp_path / "out"), str(tmp_path), review={})
+    assert (prepared["stored"], prepared["complete"], store.generations) == (False, True, 1)
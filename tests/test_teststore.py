@@ -0,0 +1,68 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agents", "Test_generator"))
+
+from shared.cache import DiskCache  # noqa: E402
+from teststore import GeneratedTestStore  # noqa: E402
+
+CODE = "def add(a, b):\n    return a + b\n"
+REVIEW = {"issues": [{"type": "bug", "line": 2, "description": "none", "severity": "low"}], "summary": "ok"}
+
+
+def store(tmp_path, **kwargs):
+    options = dict(model_name="model", prompt_version=1, budgets={"tokens": 100})
+    options.update(kwargs)
+    return GeneratedTestStore(DiskCache(str(tmp_path / "store")), **options)
+
+
+def test_key_covers_what_shapes_the_prompt(tmp_path):
+    base = store(tmp_path)
+    key = base.key("app/calc.py", CODE, "python", REVIEW)
+    assert key == store(tmp_path).key("app/calc.py", CODE, "python", REVIEW)
+    assert key != base.key("lib/calc.py", CODE, "python", REVIEW)  # same name, other directory
+    assert key != base.key("app/calc.py", CODE + "\n", "python", REVIEW)
+    assert key != base.key("app/calc.py", CODE, "python", None)
+    assert key != store(tmp_path, prompt_version=2).key("app/calc.py", CODE, "python", REVIEW)
+    assert key != store(tmp_path, model_name="other").key("app/calc.py", CODE, "python", REVIEW)
+    assert key != store(tmp_path, budgets={"tokens": 200}).key("app/calc.py", CODE, "python", REVIEW)
+
+
+def test_key_ignores_review_fields_the_prompt_drops(tmp_path):
+    base = store(tmp_path)
+    other = {"issues": [dict(REVIEW["issues"][0], severity="high")], "summary": "ok", "model": "x"}
+    assert base.key("calc.py", CODE, "python", REVIEW) == base.key("calc.py", CODE, "python", other)
+
+
+def test_get_put_and_stats(tmp_path):
+    tests = store(tmp_path)
+    key = tests.key("calc.py", CODE, "python")
+    assert tests.get(key) is None
+    tests.record_generation()
+    tests.put(key, str(tmp_path / "calc.py"), "import unittest\n", 2.5)
+    assert tests.get(key) == {"test_code": "import unittest\n", "generation_seconds": 2.5}
+    assert tests.stats()["run"] == {"reused": 1, "generated": 1, "stored": 1, "invalidated": 0,
+                                    "seconds_saved": 2.5, "reuse_rate": 0.5}
+
+
+def test_stats_accumulate_across_runs(tmp_path):
+    first = store(tmp_path)
+    first.record_generation()
+    first.save_stats()
+    first.save_stats()  # nothing new to add
+    second = store(tmp_path)
+    second.record_generation()
+    second.save_stats()
+    assert second.load_stats()["generated"] == 2
+    assert second.stats()["run"]["generated"] == 1 and second.stats()["total"]["generated"] == 2
+
+
+def test_invalidate_by_path_or_everything(tmp_path):
+    tests = store(tmp_path)
+    for name in ("a.py", "b.py", "c.py"):
+        tests.put(tests.key(name, name, "python"), str(tmp_path / name), "test", 1.0)
+    assert tests.invalidate([str(tmp_path / "a.py"), str(tmp_path / "missing.py")]) == 1
+    assert tests.get(tests.key("a.py", "a.py", "python")) is None
+    assert tests.get(tests.key("b.py", "b.py", "python")) is not None
+    assert tests.invalidate() == 2
+    assert tests.stats()["run"]["invalidated"] == 3
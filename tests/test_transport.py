@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import pytest
+
+from shared import transport
+from shared.transport import BrokerPublisher, FileBroker, InMemoryBroker, LocalPull, parse_routes
+
+ROUTES = {"reviews": ["tests_sub"], "results": ["cicd_sub", "security_sub"]}
+
+
+@pytest.fixture(params=["memory", "file"])
+def broker(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryBroker(ROUTES)
+    return FileBroker(str(tmp_path / "transport"), ROUTES)
+
+
+def test_parse_routes():
+    assert parse_routes("a=s1, s2; b=s3;") == {"a": ["s1", "s2"], "b": ["s3"]}
+
+
+def test_fan_out_and_ack(broker):
+    broker.publish("results", b"payload", {"run_id": "r1"})
+    assert broker.outstanding() == 2
+    for subscription_id in ("cicd_sub", "security_sub"):
+        message = broker.pull(subscription_id, timeout=1)
+        assert (message.data, message.attributes, message.delivery_attempt) == (b"payload", {"run_id": "r1"}, 1)
+        message.ack()
+        message.ack()  # settling twice is a no-op
+    assert broker.pull("cicd_sub", timeout=0) is None
+    assert broker.wait_idle(timeout=1)
+    assert broker.stats()["acked"] == 2
+
+
+def test_unrouted_topic_is_dropped(broker):
+    broker.publish("nowhere", b"x", {})
+    assert broker.outstanding() == 0
+    assert broker.stats()["unrouted"] == 1
+
+
+def test_nack_redelivers_until_dropped(broker, monkeypatch):
+    monkeypatch.setattr(transport, "MAX_DELIVERY_ATTEMPTS", 2)
+    broker.publish("reviews", b"x", {})
+    first = broker.pull("tests_sub", timeout=1)
+    first.nack()
+    second = broker.pull("tests_sub", timeout=1)
+    assert second.delivery_attempt == 2
+    second.nack()
+    assert broker.pull("tests_sub", timeout=0) is None
+    assert broker.outstanding() == 0
+    assert broker.stats()["dropped"] == 1
+
+
+def test_file_broker_redelivers_expired_claims(tmp_path, monkeypatch):
+    monkeypatch.setattr(transport, "ACK_DEADLINE_SECONDS", 60)
+    broker = FileBroker(str(tmp_path), ROUTES)
+    broker.publish("reviews", b"x", {})
+    assert broker.pull("tests_sub", timeout=1) is not None  # claimed, never settled
+    claimed = broker._dir("tests_sub", "claimed")
+    past = time.time() - 120
+    for name in os.listdir(claimed):
+        os.utime(os.path.join(claimed, name), (past, past))
+
+    other = FileBroker(str(tmp_path), ROUTES)  # another process sharing the directory
+    message = other.pull("tests_sub", timeout=1)
+    assert message is not None and message.data == b"x"
+    message.ack()
+    assert other.outstanding() == 0
+
+
+def test_local_pull_delivers_to_callback(broker, monkeypatch):
+    monkeypatch.setattr(transport, "POLL_SECONDS", 0.01)
+    received, lock = [], threading.Lock()
+
+    def callback(message):
+        with lock:
+            received.append(message.data)
+        message.ack()
+
+    publisher = BrokerPublisher(broker)
+    for i in range(5):
+        assert publisher.publish(publisher.topic_path("p", "reviews"), str(i).encode()).result()
+    pull = LocalPull(broker, "tests_sub", callback, workers=2)
+    assert broker.wait_idle(timeout=5)
+    pull.close()
+    assert sorted(received) == [b"0", b"1", b"2", b"3", b"4"]
+    assert pull.done()
+
+
+def test_local_pull_nacks_unsettled_messages(monkeypatch):
+    monkeypatch.setattr(transport, "POLL_SECONDS", 0.01)
+    monkeypatch.setattr(transport, "MAX_DELIVERY_ATTEMPTS", 3)
+    broker = InMemoryBroker(ROUTES)
+    attempts = []
+    broker.publish("reviews", b"x", {})
+    pull = LocalPull(broker, "tests_sub", lambda message: attempts.append(message.delivery_attempt))
+    assert broker.wait_idle(timeout=5)
+    pull.close()
+    assert attempts == [1, 2, 3]
@@ -0,0 +1,92 @@
+import json
+import os
+
+from conftest import load_agent_module
+
+vulndb = load_agent_module("SecurityAgent", "vulndb")
+
+# A few entries in the safety-db insecure_full.json layout
+FIXTURE_DB = {
+    "$meta": {"advisory": "fixture", "timestamp": 1700000000},
+    "requests": [
+        {"id": "pyup.io-36546", "specs": ["<2.20.0"], "v": "<2.20.0", "cve": "CVE-2018-18074",
+         "advisory": "Requests sends an HTTP Authorization header to an http URI on redirect."},
+    ],
+    "Django": [
+        {"id": "pyup.io-35796", "specs": ["<1.11.11", ">=2.0,<2.0.4"], "v": "<1.11.11,>=2.0,<2.0.4",
+         "cve": "CVE-2018-7536", "advisory": "Regular expression denial of service."},
+        {"id": "pyup.io-1", "specs": ["<3.0", "<2.0"], "v": "<3.0", "cve": None, "advisory": "Overlapping ranges."},
+    ],
+    "Jinja2": [
+        {"id": "pyup.io-2", "specs": ["not a spec", "<2.10.1"], "v": "<2.10.1", "cve": "CVE-2019-10906",
+         "advisory": "Sandbox escape."},
+    ],
+}
+
+
+def load(tmp_path, data=FIXTURE_DB):
+    path = tmp_path / "insecure_full.json"
+    path.write_text(json.dumps(data))
+    return vulndb.VulnDB.load(str(path))
+
+
+def vulnerable_ids(db, requirements):
+    return [(v["package"], v["version"], v["id"]) for v in db.query(requirements)["vulnerable"]]
+
+
+def test_fixture_is_indexed_by_canonical_name(tmp_path):
+    db = load(tmp_path)
+    assert len(db) == 6  # one entry per parseable spec; "not a spec" is skipped
+    assert db.version == "1700000000"
+
+
+def test_version_ranges_are_matched_at_their_boundaries(tmp_path):
+    db = load(tmp_path)
+    assert vulnerable_ids(db, ["requests==2.19.0"]) == [("requests", "2.19.0", "pyup.io-36546")]
+    assert vulnerable_ids(db, ["requests==2.20.0", "jinja2==2.10.1"]) == []
+    # pre-releases inside a range count; PEP 440 keeps those of the bound itself (2.20.0rc1) outside "<2.20.0"
+    assert vulnerable_ids(db, ["requests==2.19.0rc1"]) == [("requests", "2.19.0rc1", "pyup.io-36546")]
+    assert vulnerable_ids(db, ["requests==2.20.0rc1"]) == []
+
+
+def test_several_ranges_of_one_advisory(tmp_path):
+    db = load(tmp_path)
+    assert [v["id"] for v in db.query(["django==2.0.3"])["vulnerable"]] == ["pyup.io-35796", "pyup.io-1"]
+    assert [v["id"] for v in db.query(["django==1.11.11"])["vulnerable"]] == ["pyup.io-1"]
+    assert db.query(["django==3.0"])["vulnerable"] == []
+
+
+def test_an_advisory_matching_several_ranges_is_reported_once(tmp_path):
+    db = load(tmp_path)
+    assert [a.id for a in db.advisories_for("DJANGO", "1.0")] == ["pyup.io-35796", "pyup.io-1"]
+
+
+def test_finding_fields(tmp_path):
+    finding = load(tmp_path).query(["Jinja2==2.10"])["vulnerable"][0]
+    assert finding == {"id": "pyup.io-2", "package": "jinja2", "specs": "<2.10.1", "cve": "CVE-2019-10906",
+                       "advisory": "Sandbox escape.", "version": "2.10"}
+
+
+def test_unpinned_requirements_are_unresolved_not_checked(tmp_path):
+    db = load(tmp_path)
+    result = db.query(["requests", "requests>=2.0", "django==2.*", "Jinja2<3", "not a requirement!"])
+    assert result == {"vulnerable": [], "unresolved": ["requests", "requests", "django", "Jinja2",
+                                                       "not a requirement!"]}
+
+
+def test_pinned_packages_without_advisories_are_neither(tmp_path):
+    assert load(tmp_path).query(["flask==0.1"]) == {"vulnerable": [], "unresolved": []}
+
+
+def test_get_db_is_none_without_a_file_and_reloads_when_it_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(vulndb, "_db", None)
+    path = tmp_path / "insecure_full.json"
+    assert vulndb.get_db(str(path)) is None
+    load(tmp_path)
+    first = vulndb.get_db(str(path))
+    assert vulndb.get_db(str(path)) is first and first.query(["flask==0.1"])["vulnerable"] == []
+
+    path.write_text(json.dumps(dict(FIXTURE_DB, flask=[{"id": "f1", "specs": ["<1.0"], "v": "<1.0"}])))
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert [v["id"] for v in vulndb.get_db(str(path)).query(["flask==0.1"])["vulnerable"]] == ["f1"]